@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+
+class AsyncEngine:
+    """The one asyncio event loop that owns the server processes, their pipes and the MCP server.
+
+    The loop either runs on a background thread (start(), used next to the Qt event loop)
+    or on the calling thread until a main coroutine finishes (run(), used headless).
+    Other threads talk to it through call() and submit(); nothing here polls, so an idle
+    manager has no wakeups at all.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread_id = None
+
+    def start(self):
+        """Run the loop on a background thread."""
+        started = threading.Event()
+
+        def run():
+            self._thread_id = threading.get_ident()
+            asyncio.set_event_loop(self.loop)
+            self.loop.call_soon(started.set)
+            self.loop.run_forever()
+
+        threading.Thread(target=run, name="async-engine", daemon=True).start()
+        started.wait()
+        return self
+
+    def run(self, main):
+        """Run the loop on this thread until the coroutine main is done and return its result."""
+        self._thread_id = threading.get_ident()
+        asyncio.set_event_loop(self.loop)
+        return self.loop.run_until_complete(main)
+
+    def in_loop(self):
+        return threading.get_ident() == self._thread_id
+
+    def call(self, callback, *args):
+        """Schedule callback(*args) on the loop. Safe from any thread."""
+        if self.in_loop():
+            self.loop.call_soon(callback, *args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop from another thread; returns a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def wait(self, coro, timeout=None):
+        """Run a coroutine on the loop and block this (non-loop) thread for its result."""
+        if self.in_loop():
+            coro.close()
+            raise RuntimeError("AsyncEngine.wait() would block the event loop it waits for")
+        return self.submit(coro).result(timeout)
@@ -0,0 +1,318 @@
+"""Stand-in for a Minecraft server, for benchmarks and for trying the manager without a JAR.
+
+Point a server's Java path at a launcher for this script (write_launcher() creates one):
+the manager's JVM arguments, -jar and --nogui are ignored. It boots with the usual
+startup lines, then writes realistic log lines at a steady rate, in bursts, or replays a
+captured latest.log at a multiple of its original speed. It answers list, tps, forge tps,
+mspt, say and stop on stdin, plus join/leave <player>, burst <lines> and lag <mspt> for
+tests, and can simulate crashes and hangs, on request (crash, hang) or after a delay. Options come from the command line or from FAKE_SERVER_* environment variables
+(e.g. FAKE_SERVER_RATE=5000), since the manager builds the command line itself.
+"""
+import argparse
+import gzip
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+
+TICK = 0.05
+LAG_WARNING_INTERVAL = 15.0
+# Distinct generated lines; they repeat after that
+POOL_SIZE = 4096
+PLAYERS = ["Alex", "Steve", "Notch", "jeb_", "Dinnerbone", "Grumm", "Herobrine", "Kai"]
+_TIME_RE = re.compile(r"^\[(?:\d\d[A-Za-z]{3}\d{4} )?(\d\d):(\d\d):(\d\d)(?:\.(\d+))?")
+
+# Weighted kinds of generated lines
+_LINES = [
+    (60, "Server thread/INFO", "minecraft/MinecraftServer", "[{player}: Teleported {player} to {x}.5, 64.0, {z}.5]"),
+    (15, "Server thread/INFO", "minecraft/DedicatedServer", "<{player}> anyone got {n} iron?"),
+    (10, "Server thread/WARN", "minecraft/ServerLevel", "Fetching addPacket for removed entity ItemEntity['Item'/{n}, l='ServerLevel[world]', x={x}.50, y=64.00, z={z}.50]"),
+    (8, "Worker-Main-{n1}/INFO", "minecraft/ChunkMap", "Generated {n} chunks in dimension minecraft:overworld"),
+    (4, "Server thread/INFO", "minecraft/MinecraftServer", "{player} has made the advancement [Stone Age]"),
+    (1, "Server thread/ERROR", "minecraft/ServerLevel", "java.lang.NullPointerException: Cannot invoke \"net.minecraft.world.entity.Entity.tick()\" because \"entity\" is null"),
+]
+_WEIGHTS = [weight for weight, _, _, _ in _LINES]
+_TRACE = ["\tat net.minecraft.server.level.ServerLevel.tickNonPassenger(ServerLevel.java:693)",
+          "\tat net.minecraft.world.level.Level.guardEntityTick(Level.java:479)",
+          "\tat net.minecraft.server.MinecraftServer.tickServer(MinecraftServer.java:900)"]
+
+
+def env_default(name, default, kind=float):
+    value = os.environ.get(f"FAKE_SERVER_{name.upper()}")
+    return kind(value) if value not in (None, "") else default
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0], allow_abbrev=False)
+    parser.add_argument("--boot-seconds", type=float, default=env_default("boot_seconds", 0.5),
+                        help="how long the startup lines take")
+    parser.add_argument("--rate", type=float, default=env_default("rate", 10.0),
+                        help="generated lines per second after startup (0: none)")
+    parser.add_argument("--burst-every", type=float, default=env_default("burst_every", 0.0),
+                        help="seconds between bursts (0: no bursts)")
+    parser.add_argument("--burst-lines", type=int, default=env_default("burst_lines", 1000, int),
+                        help="lines per burst")
+    parser.add_argument("--lines", type=int, default=env_default("lines", 0, int),
+                        help="stop generating after this many lines (0: no limit)")
+    parser.add_argument("--replay", default=env_default("replay", "", str),
+                        help="a captured latest.log (or .log.gz) to replay instead of generated lines")
+    parser.add_argument("--speed", type=float, default=env_default("speed", 10.0),
+                        help="replay speed-up (0: as fast as possible)")
+    parser.add_argument("--timestamps", action="store_true", default=bool(env_default("timestamps", 0, int)),
+                        help="end generated lines with ' t=<unix time>', for latency measurements")
+    parser.add_argument("--crash-after", type=float, default=env_default("crash_after", 0.0),
+                        help="crash this many seconds after startup (0: never)")
+    parser.add_argument("--hang-after", type=float, default=env_default("hang_after", 0.0),
+                        help="stop responding this many seconds after startup (0: never)")
+    parser.add_argument("--hang-on-stop", action="store_true", default=bool(env_default("hang_on_stop", 0, int)),
+                        help="ignore 'stop', so the manager has to terminate the process")
+    parser.add_argument("--stop-seconds", type=float, default=env_default("stop_seconds", 0.2),
+                        help="how long saving the worlds takes on 'stop'")
+    parser.add_argument("-version", action="store_true", dest="version", help=argparse.SUPPRESS)
+    # Everything else (JVM options, -jar server.jar, --nogui) is the manager's and ignored
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+class FakeServer:
+    def __init__(self, args, out=sys.stdout):
+        self.args = args
+        self.out = out
+        self.players = set()
+        self.started = None
+        self.generated = 0
+        self.random = random.Random(1)
+        self.commands = queue.Queue()
+        self.mspt = 12.0
+        self.last_lag = 0.0
+        self.pool = self.render_pool()
+
+    def write(self, lines):
+        self.out.write("".join(f"{line}\n" for line in lines))
+        self.out.flush()
+
+    def line(self, thread, logger, message):
+        return f"[{time.strftime('%H:%M:%S')}] [{thread}] [{logger}]: {message}"
+
+    def read_stdin(self):
+        for command in sys.stdin:
+            self.commands.put(command.strip())
+        self.commands.put(None)  # stdin closed: the manager went away
+
+    def boot(self):
+        started = time.monotonic()
+        steps = [
+            ("main/INFO", "cpw.mods.modlauncher.Launcher/MODLAUNCHER", "ModLauncher running: args [--launchTarget, forgeserver]"),
+            ("main/INFO", "net.minecraftforge.fml.loading.ModSorter/", "Found 1 mod(s)"),
+            ("Server thread/INFO", "minecraft/DedicatedServer", "Starting minecraft server version 1.20.1"),
+            ("Server thread/INFO", "minecraft/DedicatedServer", "Loading properties"),
+            ("Server thread/INFO", "minecraft/DedicatedServer", "Starting Minecraft server on *:25565"),
+            ("Server thread/INFO", "minecraft/DedicatedServer", "Preparing level \"world\""),
+        ] + [("Server thread/INFO", "minecraft/LoggerChunkProgressListener", f"Preparing spawn area: {percent}%")
+             for percent in (0, 25, 50, 75, 100)]
+        for thread, logger, message in steps:
+            self.write([self.line(thread, logger, message)])
+            time.sleep(self.args.boot_seconds / len(steps))
+            self.handle_commands(block=False)
+        seconds = time.monotonic() - started
+        self.write([self.line("Server thread/INFO", "minecraft/DedicatedServer",
+                              f"Done ({seconds:.3f}s)! For help, type \"help\"")])
+        self.started = time.monotonic()
+
+    def generated_lines(self, count):
+        """The next count lines, cycling through a pool of pre-rendered lines so that even
+        very high rates are limited by the manager rather than by this script."""
+        prefix = f"[{time.strftime('%H:%M:%S')}] "
+        suffix = f" t={time.time():.6f}" if self.args.timestamps else ""
+        lines = []
+        for _ in range(count):
+            text, headed = self.pool[self.generated % len(self.pool)]
+            lines.append(f"{prefix}{text}{suffix}" if headed else text)
+            self.generated += 1
+        return lines
+
+    def render_pool(self, size=POOL_SIZE):
+        pool = []
+        for kind in self.random.choices(_LINES, _WEIGHTS, k=size):
+            _, thread, logger, template = kind
+            values = {"player": self.random.choice(PLAYERS), "n": self.random.randint(1, 9999),
+                      "n1": self.random.randint(1, 8), "x": self.random.randint(-5000, 5000),
+                      "z": self.random.randint(-5000, 5000)}
+            pool.append((f"[{thread.format(**values)}] [{logger}]: {template.format(**values)}", True))
+            if kind is _LINES[-1]:
+                pool.extend((frame, False) for frame in _TRACE)
+        return pool
+
+    def run(self):
+        threading.Thread(target=self.read_stdin, daemon=True).start()
+        self.boot()
+        if self.args.replay:
+            self.replay(self.args.replay)
+        budget = 0.0
+        next_burst = time.monotonic() + self.args.burst_every if self.args.burst_every else None
+        next_tick = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if self.args.crash_after and now - self.started >= self.args.crash_after:
+                self.crash()
+            if self.args.hang_after and now - self.started >= self.args.hang_after:
+                self.hang()
+            if self.args.rate and not self.args.replay and not self.limit_reached():
+                budget += self.args.rate * TICK
+                count = self.capped(int(budget))
+                budget -= int(budget)
+                if count:
+                    self.write(self.generated_lines(count))
+            if next_burst and now >= next_burst and not self.limit_reached():
+                self.write(self.generated_lines(self.capped(self.args.burst_lines)))
+                next_burst += self.args.burst_every
+            if self.mspt > 50 and now - self.last_lag >= LAG_WARNING_INTERVAL:
+                # Like vanilla: at most one warning per interval while ticks are too slow
+                behind = int((self.mspt - 50) * 20 * LAG_WARNING_INTERVAL)
+                self.write([self.line("Server thread/WARN", "minecraft/MinecraftServer",
+                                      f"Can't keep up! Is the server overloaded? Running {behind}ms or"
+                                      f" {behind // 50} ticks behind")])
+                self.last_lag = now
+            next_tick += TICK
+            self.handle_commands(timeout=max(0.0, next_tick - time.monotonic()))
+
+    def limit_reached(self):
+        return self.args.lines and self.generated >= self.args.lines
+
+    def capped(self, count):
+        return min(count, self.args.lines - self.generated) if self.args.lines else count
+
+    def replay(self, path):
+        """Write a captured log, keeping its timing (divided by --speed) between lines."""
+        opener = gzip.open if path.endswith(".gz") else open
+        first = None
+        replay_started = time.monotonic()
+        with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+            for text in f:
+                match = _TIME_RE.match(text)
+                if match and self.args.speed:
+                    hours, minutes, seconds, fraction = match.groups()
+                    at = int(hours) * 3600 + int(minutes) * 60 + int(seconds) + float(f"0.{fraction or 0}")
+                    if first is None:
+                        first = at
+                    # Logs roll over at midnight only when the day changes; treat a backwards jump as one
+                    due = replay_started + ((at - first) % 86400) / self.args.speed
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        self.out.flush()
+                        self.handle_commands(timeout=delay)
+                self.out.write(text if text.endswith("\n") else text + "\n")
+        self.out.flush()
+
+    def handle_commands(self, block=True, timeout=None):
+        deadline = time.monotonic() + (timeout or 0)
+        while True:
+            try:
+                remaining = deadline - time.monotonic()
+                command = self.commands.get(block=block and remaining > 0, timeout=remaining if block and remaining > 0 else None)
+            except queue.Empty:
+                return
+            self.handle(command)
+
+    def handle(self, command):
+        if command is None or command == "stop":
+            self.stop()
+            return
+        name, _, rest = command.partition(" ")
+        info = ("Server thread/INFO", "minecraft/DedicatedServer")
+        if command == "list":
+            self.write([self.line(*info, f"There are {len(self.players)} of a max of 20 players online: "
+                                         f"{', '.join(sorted(self.players))}")])
+        elif command == "tps":
+            self.write([self.line(*info, f"TPS from last 1m, 5m, 15m: {min(20.0, 1000 / self.mspt):.1f}, 20.0, 20.0")])
+        elif command == "forge tps":
+            tps = min(20.0, 1000 / self.mspt)
+            self.write([self.line(*info, f"Dim minecraft:overworld (minecraft:overworld): Mean tick time: {self.mspt:.3f} ms. Mean TPS: {tps:.3f}"),
+                        self.line(*info, f"Overall : Mean tick time: {self.mspt:.3f} ms. Mean TPS: {tps:.3f}")])
+        elif command == "mspt":
+            self.write([self.line(*info, "Server tick times (avg/min/max) from last 5s, 10s, 1m:"),
+                        self.line(*info, f"◴ {self.mspt:.1f}/5.0/30.0, {self.mspt:.1f}/5.0/30.0, {self.mspt:.1f}/5.0/30.0")])
+        elif name == "say":
+            self.write([self.line(*info, f"[Server] {rest}")])
+        elif name == "join":
+            player = rest or self.random.choice(PLAYERS)
+            self.players.add(player)
+            self.write([self.line(*info, f"{player} joined the game")])
+        elif name == "leave":
+            self.players.discard(rest)
+            self.write([self.line(*info, f"{rest} left the game")])
+        elif name == "burst":
+            self.write(self.generated_lines(int(rest or self.args.burst_lines)))
+        elif name == "lag":
+            # Ticks take this long from now on ("lag 12" ends it)
+            self.mspt = float(rest or 80.0)
+            self.last_lag = 0.0
+        elif command == "crash":
+            self.crash()
+        elif command == "hang":
+            self.hang()
+        else:
+            self.write([self.line(*info, "Unknown or incomplete command, see below for error"),
+                        self.line(*info, f"{command}<--[HERE]")])
+
+    def stop(self):
+        if self.args.hang_on_stop:
+            self.write([self.line("Server thread/INFO", "minecraft/DedicatedServer", "Stopping server")])
+            self.hang()
+        info = ("Server thread/INFO", "minecraft/MinecraftServer")
+        self.write([self.line(*info, "Stopping the server"), self.line(*info, "Stopping server"),
+                    self.line(*info, "Saving players"), self.line(*info, "Saving worlds")])
+        time.sleep(self.args.stop_seconds)
+        self.write([self.line(*info, "ThreadedAnvilChunkStorage: All dimensions are saved")])
+        sys.exit(0)
+
+    def crash(self):
+        self.write([self.line("Server thread/ERROR", "minecraft/MinecraftServer", "Encountered an unexpected exception"),
+                    "java.lang.IllegalStateException: Simulated crash", *_TRACE,
+                    self.line("Server thread/ERROR", "minecraft/MinecraftServer",
+                              "This crash report has been saved to: crash-reports/crash-fake-server.txt")])
+        os._exit(1)
+
+    def hang(self):
+        # A deadlocked server: alive, but nothing is read or written any more
+        while True:
+            time.sleep(3600)
+
+
+def write_launcher(directory):
+    """Write an executable that runs this script with the current Python, for use as the
+    Java path of a server (the manager launches java_path directly). Returns its path."""
+    script = os.path.abspath(__file__)
+    if os.name == "nt":
+        path = os.path.join(directory, "fake_java.cmd")
+        with open(path, "w") as f:
+            f.write(f'@"{sys.executable}" "{script}" %*\n')
+    else:
+        path = os.path.join(directory, "fake_java")
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+        os.chmod(path, 0o755)
+    return path
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.version:
+        # What jvm_tuning expects from java -version
+        sys.stderr.write('openjdk version "21.0.2" 2024-01-16\nOpenJDK Runtime Environment (build 21.0.2+13)\n'
+                         'OpenJDK 64-Bit Server VM (build 21.0.2+13, mixed mode, sharing)\n')
+        return 0
+    # The manager decodes the output as UTF-8 whatever the console code page is
+    sys.stdout.reconfigure(encoding="utf-8")
+    try:
+        FakeServer(args).run()
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+"""Measure how the manager behaves under load, using benchmarks/fake_server.py as the server.
+
+Runs a Supervisor in this process against the fake server and measures:
+
+  ingest        lines per second from the server's stdout into the log store
+  latency       time from a line being written to reaching the log store and, with the
+                GUI, the output view (which leaves out repeats, see dedup_mode)
+  memory        RSS growth of this process while the server writes for a long time
+  mcp           latency of the get_server_logs and send_minecraft_command tools
+  lifecycle     time to start, stop and restart the server
+
+Results are printed (and with --output written) as JSON. With --baseline, the results
+are compared with an earlier run and the exit code is 1 if a metric got worse by more
+than --threshold percent. The GUI part needs a display (or QT_QPA_PLATFORM=offscreen).
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import psutil  # noqa: E402
+
+from fake_server import write_launcher  # noqa: E402
+from log_store import SOURCE_SERVER  # noqa: E402
+from server_lifecycle import STOPPED, READY, CRASHED  # noqa: E402
+from supervisor import Supervisor  # noqa: E402
+
+BENCHMARKS = ("ingest", "latency", "memory", "mcp", "lifecycle")
+_SENT_RE = re.compile(r" t=(\d+\.\d+)$")
+# Metrics compared against a baseline: True if higher is better
+COMPARED = {
+    "ingest.lines_per_second": True,
+    "latency.store_ms.p50": False,
+    "latency.store_ms.p99": False,
+    "latency.display_ms.p50": False,
+    "latency.display_ms.p99": False,
+    "memory.growth_mb": False,
+    "mcp.get_server_logs_ms.p50": False,
+    "mcp.send_minecraft_command_ms.p50": False,
+    "lifecycle.start_s": False,
+    "lifecycle.stop_s": False,
+    "lifecycle.restart_s": False,
+}
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+
+    def pick(fraction):
+        return round(values[min(len(values) - 1, int(fraction * len(values)))], 3)
+
+    return {"count": len(values), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(values[-1], 3)}
+
+
+class Bench:
+    """One managed server running the fake server, restarted with new options per benchmark."""
+
+    def __init__(self, directory):
+        self.supervisor = Supervisor(os.path.join(directory, "settings.json"))
+        self.supervisor.load_settings()
+        self.supervisor.engine.start()
+        self.server = self.supervisor.get()
+        jar = os.path.join(directory, "server.jar")
+        open(jar, "w").close()
+        self.server.server_jar_file = jar
+        self.server.java_path = write_launcher(directory)
+        self.server.console_mirror = False
+        self.server.probes.configure([], 30, False)
+        self._state_listeners = []
+        self.server.add_state_listener(
+            lambda state, detail: [callback(state) for callback in list(self._state_listeners)])
+
+    def follow(self, callback):
+        """Call callback(records, missed) for lines stored from now on until the returned
+        function is called. The store keeps every line whatever the dedup mode, whereas the
+        output listeners don't get the repeats; missed counts lines evicted before they
+        were read."""
+        store = self.server.log_store
+        stopped = threading.Event()
+
+        def run():
+            cursor = store.last_seq
+            while not stopped.is_set():
+                if store.wait_for(cursor, 0.1) <= cursor:
+                    continue
+                records = store.since(cursor)
+                if records:
+                    callback(records, records[0].seq - cursor - 1)
+                    cursor = records[-1].seq
+
+        thread = threading.Thread(target=run, name="bench-follow", daemon=True)
+        thread.start()
+
+        def stop():
+            stopped.set()
+            thread.join()
+        return stop
+
+    def listen_state(self, callback):
+        """Call callback(state) after every transition until the returned function is called."""
+        self._state_listeners.append(callback)
+        return lambda: self._state_listeners.remove(callback)
+
+    def start(self, timeout=60, **options):
+        """(Re)start the server with the given fake server options; returns the seconds until ready."""
+        self.stop()
+        for name in [name for name in os.environ if name.startswith("FAKE_SERVER_")]:
+            del os.environ[name]
+        for name, value in options.items():
+            os.environ[f"FAKE_SERVER_{name.upper()}"] = str(int(value) if isinstance(value, bool) else value)
+        lifecycle = self.server.lifecycle
+        generation = lifecycle.generation
+        started = time.perf_counter()
+        if not self.server.start():
+            raise RuntimeError("the server did not start; see the manager output")
+        if not lifecycle.wait_for_state((READY,), timeout, generation) or lifecycle.state != READY:
+            raise RuntimeError(f"server not ready after {timeout} s ({lifecycle.state})")
+        return time.perf_counter() - started
+
+    def stop(self, timeout=60):
+        lifecycle = self.server.lifecycle
+        if not lifecycle.is_running():
+            return 0.0
+        generation = lifecycle.generation
+        started = time.perf_counter()
+        self.server.stop()
+        lifecycle.wait_for_state((STOPPED, CRASHED), timeout, generation)
+        return time.perf_counter() - started
+
+    def close(self):
+        self.stop()
+        self.supervisor.close()
+
+
+def bench_ingest(bench, args):
+    bench.start(rate=0)
+    received = [0]
+    done = threading.Event()
+
+    def on_output(records, missed):
+        received[0] += missed + sum(1 for record in records if record.source == SOURCE_SERVER)
+        if received[0] >= args.ingest_lines:
+            done.set()
+
+    remove = bench.follow(on_output)
+    started = time.perf_counter()
+    bench.server.send_command(f"burst {args.ingest_lines}")
+    finished = done.wait(120)
+    elapsed = time.perf_counter() - started
+    remove()
+    # A rate over lines that never all arrived would look like a speedup, so none is reported
+    return {"lines": received[0], "complete": finished, "seconds": round(elapsed, 3),
+            "lines_per_second": round(received[0] / elapsed) if finished else None}
+
+
+def bench_latency(bench, args):
+    bench.start(rate=args.latency_rate, timestamps=True)
+    store_ms = []
+
+    def on_output(records, missed):
+        now = time.time()
+        for record in records:
+            match = _SENT_RE.search(record.text)
+            if match:
+                store_ms.append((now - float(match.group(1))) * 1000)
+
+    remove = bench.follow(on_output)
+    result = {"rate": args.latency_rate}
+    if args.skip_gui:
+        time.sleep(args.latency_seconds)
+    else:
+        result["display_ms"] = percentiles(measure_display(bench, args.latency_seconds))
+    remove()
+    result["store_ms"] = percentiles(store_ms)
+    return result
+
+
+def measure_display(bench, seconds):
+    """Line latency up to the text being in the output view of a server tab."""
+    from PySide6.QtWidgets import QApplication
+    from manager_gui import ServerPanel
+    app = QApplication.instance() or QApplication(sys.argv)
+    panel = ServerPanel(bench.server, bench.supervisor)
+    panel.show()
+    display_ms = []
+    append = panel.output_area.appendPlainText
+
+    def timed_append(text):
+        append(text)
+        now = time.time()
+        display_ms.extend((now - float(sent)) * 1000 for sent in re.findall(r" t=(\d+\.\d+)$", text, re.M))
+
+    panel.output_area.appendPlainText = timed_append
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        app.processEvents()
+        time.sleep(0.001)
+    panel.close()
+    return display_ms
+
+
+def bench_memory(bench, args):
+    bench.start(rate=args.memory_rate)
+    process = psutil.Process()
+    samples = []
+    end = time.monotonic() + args.memory_seconds
+    while time.monotonic() < end:
+        samples.append((time.monotonic(), process.memory_info().rss / (1024 * 1024)))
+        time.sleep(1.0)
+    times = [t - samples[0][0] for t, _ in samples]
+    values = [mb for _, mb in samples]
+    mean_time, mean_value = sum(times) / len(times), sum(values) / len(values)
+    variance = sum((t - mean_time) ** 2 for t in times)
+    slope = sum((t - mean_time) * (v - mean_value) for t, v in zip(times, values)) / variance if variance else 0.0
+    return {"rate": args.memory_rate, "seconds": args.memory_seconds, "start_mb": round(values[0], 1),
+            "end_mb": round(values[-1], 1), "peak_mb": round(max(values), 1),
+            "growth_mb": round(values[-1] - values[0], 1), "slope_mb_per_minute": round(slope * 60, 2),
+            "log_store": bench.server.log_store.stats()}
+
+
+def bench_mcp(bench, args):
+    from mcp_tools import MCP_AVAILABLE, create_mcp_server
+    if not MCP_AVAILABLE:
+        return {"skipped": "the mcp package is not installed"}
+    bench.start(rate=args.mcp_rate)
+    mcp = create_mcp_server(bench.supervisor)
+    engine = bench.supervisor.engine
+    result = {"rate": args.mcp_rate}
+    for tool, arguments in (("get_server_logs", {"max_lines": 500}),
+                            ("send_minecraft_command", {"command": "list"})):
+        timings = []
+        for _ in range(args.mcp_calls):
+            started = time.perf_counter()
+            engine.wait(mcp.call_tool(tool, arguments), timeout=30)
+            timings.append((time.perf_counter() - started) * 1000)
+        result[f"{tool}_ms"] = percentiles(timings)
+    return result
+
+
+def bench_lifecycle(bench, args):
+    starts, stops, restarts = [], [], []
+    for _ in range(args.runs):
+        starts.append(bench.start(rate=100))
+        ready = threading.Event()
+        remove = bench.listen_state(lambda state: state == READY and ready.set())
+        started = time.perf_counter()
+        requested = bench.server.restart()
+        # Through Stopping back to Ready
+        finished = requested and ready.wait(60)
+        elapsed = time.perf_counter() - started
+        remove()
+        if not finished:
+            raise RuntimeError(f"server not ready 60 s after a restart ({bench.server.lifecycle.state})")
+        restarts.append(elapsed)
+        stops.append(bench.stop())
+    return {"runs": args.runs, "start_s": round(statistics.median(starts), 3),
+            "stop_s": round(statistics.median(stops), 3), "restart_s": round(statistics.median(restarts), 3)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def metric(results, path):
+    value = results
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def compare(results, baseline, threshold):
+    """Changes of the compared metrics against a baseline run; regressions beyond threshold percent."""
+    changes = []
+    for path, higher_is_better in COMPARED.items():
+        new, old = metric(results, path), metric(baseline, path)
+        if new is None or not old:
+            continue
+        change = (new - old) / old * 100
+        worse = -change if higher_is_better else change
+        changes.append({"metric": path, "baseline": old, "value": new, "change_percent": round(change, 1),
+                        "regression": worse > threshold})
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", default=",".join(BENCHMARKS),
+                        help=f"comma-separated benchmarks to run ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--ingest-lines", type=int, default=200000)
+    parser.add_argument("--latency-rate", type=float, default=2000, help="lines per second")
+    parser.add_argument("--latency-seconds", type=float, default=10)
+    parser.add_argument("--memory-rate", type=float, default=5000, help="lines per second")
+    parser.add_argument("--memory-seconds", type=float, default=60)
+    parser.add_argument("--mcp-rate", type=float, default=1000, help="lines per second")
+    parser.add_argument("--mcp-calls", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=3, help="start/stop/restart cycles")
+    parser.add_argument("--skip-gui", action="store_true")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent worse that counts as a regression")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    report = {
+        "meta": {"time": time.time(), "commit": git_commit(), "python": platform.python_version(),
+                 "platform": platform.platform(), "cpus": os.cpu_count(),
+                 "options": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}},
+        "results": {},
+        # The manager's own stage timings during each benchmark (see get_manager_diagnostics)
+        "stages": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        bench = Bench(tmp)
+        try:
+            for name in selected:
+                print(f"Running {name}...", file=sys.stderr)
+                bench.supervisor.instruments.reset()
+                report["results"][name] = globals()[f"bench_{name}"](bench, args)
+                report["stages"][name] = bench.supervisor.instruments.snapshot()["stages"]
+        finally:
+            bench.close()
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["comparison"] = compare(report["results"], baseline.get("results", {}), args.threshold)
+        regressions = [change for change in report["comparison"] if change["regression"]]
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    for change in regressions:
+        print(f"REGRESSION {change['metric']}: {change['baseline']} -> {change['value']}"
+              f" ({change['change_percent']:+.1f}%)", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
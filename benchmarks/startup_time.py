@@ -0,0 +1,45 @@
+"""Compare how long the manager takes to become ready in GUI and headless mode.
+
+Runs minecraft_server_manager.py --startup-time a few times per mode and prints the
+median. GUI mode needs a display (or QT_QPA_PLATFORM=offscreen).
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MANAGER = os.path.join(ROOT, "minecraft_server_manager.py")
+STARTUP_RE = re.compile(r"\[STARTUP\] .*?: (\d+) ms")
+
+
+def measure(extra_args, settings_file):
+    result = subprocess.run([sys.executable, MANAGER, "--startup-time", "--settings", settings_file, *extra_args],
+                            capture_output=True, text=True, timeout=120)
+    match = STARTUP_RE.search(result.stderr)
+    if not match:
+        raise RuntimeError(f"no startup report (exit code {result.returncode}): {result.stderr[-500:]}")
+    return int(match.group(1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-gui", action="store_true")
+    args = parser.parse_args()
+
+    modes = [("headless", ["--headless"])]
+    if not args.skip_gui:
+        modes.append(("gui", []))
+    with tempfile.TemporaryDirectory() as tmp:
+        settings_file = os.path.join(tmp, "settings.json")
+        for name, extra_args in modes:
+            times = [measure(extra_args, settings_file) for _ in range(args.runs)]
+            print(f"{name:>8}: median {statistics.median(times)} ms (min {min(times)}, max {max(times)}, runs {len(times)})")
+
+
+if __name__ == "__main__":
+    main()
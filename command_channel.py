@@ -0,0 +1,118 @@
+import locale
+import threading
+import time
+
+from log_store import SOURCE_SERVER
+
+
+# How long a sender waits for the pipe to accept a command before giving up
+WRITE_TIMEOUT = 10.0
+
+
+class CommandChannel:
+    """The single writer for the server's stdin.
+
+    Every command, whether it comes from the GUI, an MCP call or the stop logic, is
+    written to the asyncio StreamWriter on the engine's event loop. Each command is a
+    single write() there, so concurrent senders can never interleave partial lines.
+    execute() additionally correlates a command with the output it produces.
+    """
+
+    def __init__(self, store, engine):
+        self.store = store
+        self.engine = engine
+        self.encoding = locale.getpreferredencoding(False)
+        self._stream = None
+        self._write_lock = threading.Lock()
+        # Only one correlated command at a time, otherwise their replies would mix
+        self._execute_lock = threading.Lock()
+
+    def attach(self, stream, encoding=None):
+        with self._write_lock:
+            self._stream = stream
+            if encoding:
+                self.encoding = encoding
+
+    def detach(self):
+        with self._write_lock:
+            self._stream = None
+
+    def write(self, command):
+        """Write one command line. Raises BrokenPipeError if there is no server to write to.
+
+        On the event loop the line is only buffered; from any other thread this waits
+        until the pipe has taken it.
+        """
+        data = f"{command}\n".encode(self.encoding, errors="replace")
+        with self._write_lock:
+            stream = self._stream
+        if stream is None:
+            raise BrokenPipeError("Server stdin is not available")
+        if self.engine.in_loop():
+            self._write_now(stream, data)
+        else:
+            self.engine.wait(self._write(stream, data), WRITE_TIMEOUT)
+
+    def _write_now(self, stream, data):
+        if stream.is_closing():
+            raise BrokenPipeError("Server stdin is closed")
+        stream.write(data)
+
+    async def _write(self, stream, data):
+        self._write_now(stream, data)
+        await stream.drain()
+
+    def try_reserve(self):
+        """Take the execute() slot without blocking, so no correlated command runs meanwhile.
+        Returns False if it is taken; otherwise release() must be called later."""
+        return self._execute_lock.acquire(blocking=False)
+
+    def release(self):
+        self._execute_lock.release()
+
+    def busy(self):
+        """Whether a command is collecting its reply (execute() or a reservation)."""
+        return self._execute_lock.locked()
+
+    def execute(self, command, quiet_period=0.5, timeout=5.0, max_lines=500):
+        """Send a command and collect the server output it produces.
+
+        Output is collected until no new server line has arrived for quiet_period
+        seconds after the first reply, or until timeout. Returns the reply lines with
+        the measured latency to the first line and the total time spent collecting.
+        """
+        with self._execute_lock:
+            cursor = self.store.last_seq
+            started = time.monotonic()
+            self.write(command)
+            deadline = started + timeout
+            lines = []
+            first_reply = None
+            last_reply = None
+            while True:
+                now = time.monotonic()
+                if last_reply is not None:
+                    wait_until = min(deadline, last_reply + quiet_period)
+                else:
+                    wait_until = deadline
+                if now >= wait_until:
+                    break
+                if self.store.wait_for(cursor, wait_until - now) <= cursor:
+                    continue
+                records = self.store.since(cursor)
+                for record in records:
+                    if record.source == SOURCE_SERVER and len(lines) < max_lines:
+                        lines.append(record.text)
+                        last_reply = time.monotonic()
+                        if first_reply is None:
+                            first_reply = last_reply
+                if records:
+                    cursor = records[-1].seq
+            finished = time.monotonic()
+        return {
+            "command": command,
+            "lines": lines,
+            "latency_ms": round((first_reply - started) * 1000, 1) if first_reply is not None else None,
+            "duration_ms": round((finished - started) * 1000, 1),
+            "timed_out": first_reply is None,
+        }
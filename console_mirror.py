@@ -0,0 +1,64 @@
+import sys
+import threading
+from collections import deque
+
+# Lines waiting for the terminal; when it can't keep up the oldest are dropped
+MAX_PENDING_LINES = 20000
+
+
+class ConsoleMirror:
+    """Writes mirrored output lines to the terminal on a thread of its own.
+
+    Servers only queue their lines, so a slow terminal (or a full stderr pipe) never
+    holds up the output pipeline. The writer sleeps until lines arrive and writes all
+    waiting lines at once. Shared by all servers of a supervisor; the thread is only
+    started once something is mirrored.
+    """
+
+    def __init__(self, stream=None, max_pending=MAX_PENDING_LINES):
+        self.stream = stream
+        self._pending = deque(maxlen=max_pending)
+        self._dropped = 0
+        self._changed = threading.Condition()
+        self._thread = None
+        self._writing = False
+
+    def write(self, lines):
+        with self._changed:
+            overflow = len(self._pending) + len(lines) - self._pending.maxlen
+            if overflow > 0:
+                self._dropped += overflow
+            self._pending.extend(lines)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="console-mirror", daemon=True)
+                self._thread.start()
+            self._changed.notify_all()
+
+    def pending(self):
+        return len(self._pending)
+
+    def flush(self, timeout=2.0):
+        """Wait until the queued lines are written, e.g. before the process exits."""
+        with self._changed:
+            self._changed.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    def _run(self):
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._pending)
+                lines = list(self._pending)
+                self._pending.clear()
+                dropped, self._dropped = self._dropped, 0
+                self._writing = True
+            if dropped:
+                lines.insert(0, f"... {dropped} lines not mirrored (the terminal fell behind) ...")
+            # stderr: stdout may be the MCP stdio transport
+            stream = self.stream or sys.stderr
+            try:
+                stream.write("\n".join(lines) + "\n")
+                stream.flush()
+            except (OSError, ValueError, AttributeError):
+                pass  # no terminal (pythonw) or it went away
+            with self._changed:
+                self._writing = False
+                self._changed.notify_all()
@@ -0,0 +1,265 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from resource_metrics import MetricRing
+
+# Written to the server directory by the JVM when GC logging is on
+GC_LOG_FILE = "gc.log"
+# Unified logging (Java 9+): everything tagged gc, with uptime so pauses can be placed in time.
+# The JVM rotates an existing file away at startup and keeps 5 files of 10 MB.
+GC_LOG_OPTION = f"-Xlog:gc*:file={GC_LOG_FILE}:time,uptime,level,tags:filecount=5,filesize=10M"
+# How often the file is checked for new lines
+POLL_INTERVAL = 1.0
+READ_SIZE = 256 * 1024
+MAX_PAUSES = 20000
+HEAP_CAPACITY = 5000
+MIN_TREND_POINTS = 5
+
+_UPTIME_RE = re.compile(r"\[(\d+(?:\.\d+)?)s\]")
+_PAUSE_RE = re.compile(
+    r"GC\((?P<id>\d+)\) (?P<kind>Pause [A-Za-z0-9 ()._-]+?)\s+"
+    r"(?:(?P<before>\d+)(?P<before_unit>[KMG])->(?P<after>\d+)(?P<after_unit>[KMG])"
+    r"\((?P<capacity>\d+)(?P<capacity_unit>[KMG])\)\s+)?(?P<ms>\d+(?:\.\d+)?)ms\s*$"
+)
+# ZGC/Shenandoah report the heap once per cycle instead of per pause
+_CYCLE_RE = re.compile(
+    r"GC\((?P<id>\d+)\) Garbage Collection \([^)]*\) (?P<before>\d+)(?P<before_unit>[KMG])\(\d+%\)"
+    r"->(?P<after>\d+)(?P<after_unit>[KMG])\(\d+%\)"
+)
+# Kinds of G1 young pauses, which are worth telling apart
+_G1_YOUNG_TYPES = ("Normal", "Mixed", "Prepare Mixed", "Concurrent Start", "Concurrent End")
+_MAX_PAUSE_RE = re.compile(r"-XX:MaxGCPauseMillis=(\d+)")
+_UNIT_MB = {"K": 1 / 1024, "M": 1.0, "G": 1024.0}
+
+
+def pause_target(jvm_args):
+    """The MaxGCPauseMillis goal from a list of JVM arguments, or None."""
+    for arg in jvm_args:
+        match = _MAX_PAUSE_RE.match(arg)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class GcLog:
+    """Tails the JVM's unified GC log and keeps pause and heap statistics.
+
+    begin() is called when a server was started with GC_LOG_OPTION; a task on the
+    engine's event loop then reads whatever was appended to the file every
+    POLL_INTERVAL, starting over when the JVM rotates it. Pause lines give the pause
+    time distribution, counts per kind (young, mixed, remark, full, ...) and the heap
+    before and after each collection, from which the allocation rate and the trend of
+    the heap after GC are derived. Listeners get (timestamp, pause_ms, line) per pause.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.path = None
+        self.started_at = None
+        self.target_ms = None
+        self.pauses = deque(maxlen=MAX_PAUSES)  # (timestamp, ms, kind)
+        self.heap = MetricRing(("before_mb", "after_mb", "capacity_mb"), HEAP_CAPACITY)
+        self.kinds = Counter()
+        self.full_gcs = 0
+        self.lines_read = 0
+        self._allocations = deque(maxlen=MAX_PAUSES)  # (timestamp, MB allocated since the previous GC)
+        self._last_after_mb = None
+        self._task = None
+        self._file = None
+        self._identity = None
+        self._stale_identity = None
+        self._partial = ""
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    # Runs on the event loop
+
+    def begin(self, path, started_at, jvm_args=()):
+        """Start tailing the GC log of a server process launched at started_at."""
+        self.stop()
+        with self._lock:
+            self.path = path
+            self.started_at = started_at
+            self.target_ms = pause_target(jvm_args)
+            self.pauses.clear()
+            self.heap.clear()
+            self.kinds.clear()
+            self.full_gcs = 0
+            self.lines_read = 0
+            self._allocations.clear()
+            self._last_after_mb = None
+        # A log left by the previous run is ignored until the JVM has rotated it away
+        self._stale_identity = self._stat_identity()
+        self._task = self.engine.loop.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+            # The last lines written before the process exited
+            self._poll()
+        self._close_file()
+
+    async def _run(self):
+        while True:
+            self._poll()
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def _stat_identity(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def _close_file(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+            self._identity = None
+            self._partial = ""
+
+    def _poll(self):
+        identity = self._stat_identity()
+        if identity is None or identity == self._stale_identity:
+            return
+        if identity != self._identity:
+            # New file: first one of this run, or the JVM rotated the old one
+            if self._file:
+                self._read_lines()
+            self._close_file()
+            try:
+                self._file = open(self.path, "rb")
+            except OSError:
+                return
+            self._identity = identity
+        elif os.path.getsize(self.path) < self._file.tell():
+            self._file.seek(0)
+            self._partial = ""
+        self._read_lines()
+
+    def _read_lines(self):
+        data = self._file.read(READ_SIZE)
+        if not data:
+            return
+        lines = (self._partial + data.decode("utf-8", errors="replace")).split("\n")
+        self._partial = lines.pop()
+        self.feed(lines)
+
+    def feed(self, lines):
+        pauses = []
+        with self._lock:
+            self.lines_read += len(lines)
+            for line in lines:
+                if "GC(" not in line:
+                    continue
+                match = _PAUSE_RE.search(line) or _CYCLE_RE.search(line)
+                if not match:
+                    continue
+                uptime = _UPTIME_RE.search(line)
+                timestamp = self.started_at + float(uptime.group(1)) if uptime else time.time()
+                if match.re is _PAUSE_RE:
+                    ms = float(match.group("ms"))
+                    kind = match.group("kind")
+                    self.pauses.append((timestamp, ms, kind))
+                    self.kinds[_short_kind(kind)] += 1
+                    if "Full" in kind:
+                        self.full_gcs += 1
+                    pauses.append((timestamp, ms, line))
+                if match.group("before"):
+                    self._record_heap(timestamp, match)
+        for pause in pauses:
+            for callback in self._listeners:
+                callback(*pause)
+
+    def _record_heap(self, timestamp, match):
+        before = int(match.group("before")) * _UNIT_MB[match.group("before_unit")]
+        after = int(match.group("after")) * _UNIT_MB[match.group("after_unit")]
+        capacity = (int(match.group("capacity")) * _UNIT_MB[match.group("capacity_unit")]
+                    if "capacity" in match.re.groupindex else 0.0)
+        if self._last_after_mb is not None:
+            self._allocations.append((timestamp, max(0.0, before - self._last_after_mb)))
+        self._last_after_mb = after
+        self.heap.append(timestamp, {"before_mb": before, "after_mb": after, "capacity_mb": capacity})
+
+    # Safe from any thread
+
+    def stats(self, seconds=None, buckets=60):
+        """Pause percentiles, counts, allocation rate and heap-after-GC trend, over the last
+        seconds (everything since the start without)."""
+        now = time.time()
+        since = now - seconds if seconds else (self.started_at or 0.0)
+        with self._lock:
+            pauses = [(timestamp, ms, kind) for timestamp, ms, kind in self.pauses if timestamp >= since]
+            allocations = [(timestamp, mb) for timestamp, mb in self._allocations if timestamp >= since]
+            kinds = dict(self.kinds)
+            full_gcs = self.full_gcs
+        durations = sorted(ms for _, ms, _ in pauses)
+        elapsed = max(1e-9, now - max(since, self.started_at or since))
+        result = {
+            "tailing": self._task is not None,
+            "log_file": self.path,
+            "lines_read": self.lines_read,
+            "pauses": len(durations),
+            "pause_ms": {
+                "p50": percentile(durations, 0.5),
+                "p90": percentile(durations, 0.9),
+                "p99": percentile(durations, 0.99),
+                "max": durations[-1] if durations else None,
+                "total": round(sum(durations), 1),
+            },
+            "pause_time_percent": round(sum(durations) / 1000 / elapsed * 100, 3),
+            "target_ms": self.target_ms,
+            "pauses_over_target": sum(1 for ms in durations if ms > self.target_ms) if self.target_ms else None,
+            "kinds_since_start": kinds,
+            "full_gcs_since_start": full_gcs,
+            "full_gcs": sum(1 for _, _, kind in pauses if "Full" in kind),
+        }
+        if len(allocations) >= 2:
+            span = allocations[-1][0] - allocations[0][0]
+            # The first allocation ends at its timestamp, so it is not part of the span
+            result["allocation_rate_mb_s"] = round(sum(mb for _, mb in allocations[1:]) / span, 2) if span > 0 else None
+        heap = self.heap.window(since)
+        result["heap_after_gc_mb"] = {
+            "latest": heap["after_mb"][-1] if heap["after_mb"] else None,
+            "min": min(heap["after_mb"]) if heap["after_mb"] else None,
+            "max": max(heap["after_mb"]) if heap["after_mb"] else None,
+            "trend_mb_per_hour": _trend_per_hour(heap["timestamps"], heap["after_mb"]),
+            "capacity_mb": heap["capacity_mb"][-1] if heap["capacity_mb"] else None,
+        }
+        result["heap_series"] = self.heap.downsample(("after_mb", "capacity_mb"), since, buckets)
+        return result
+
+
+def _short_kind(kind):
+    """'Pause Young (Normal) (G1 Evacuation Pause)' -> 'Pause Young (Normal)', 'Pause Full (System.gc())' -> 'Pause Full'"""
+    parts = kind.split(" (")
+    if len(parts) > 1 and parts[1].rstrip(")") in _G1_YOUNG_TYPES:
+        return f"{parts[0]} ({parts[1]}"
+    return parts[0]
+
+
+def _trend_per_hour(times, values):
+    """Least-squares slope of values over times, per hour. Rising heap after GC hints at a leak."""
+    if len(times) < MIN_TREND_POINTS:
+        return None
+    mean_time = sum(times) / len(times)
+    mean_value = sum(values) / len(values)
+    variance = sum((t - mean_time) ** 2 for t in times)
+    if not variance:
+        return None
+    slope = sum((t - mean_time) * (v - mean_value) for t, v in zip(times, values)) / variance
+    return round(slope * 3600, 2)
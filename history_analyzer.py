@@ -0,0 +1,350 @@
+import gzip
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from log_dedup import normalize_message
+from log_parser import LogParser
+from log_store import LogRecord
+
+# Lines handed to the log parser at a time
+PARSE_BATCH = 2000
+# Distinct warnings kept per file in the cache; the rest only count towards the total
+MAX_WARNINGS_PER_FILE = 200
+MAX_CRASH_FRAMES = 8
+# Bump when the per-file results change, so cached results are recomputed
+CACHE_VERSION = 2
+# Below this many files to analyse, a process pool costs more than it saves
+MIN_POOL_FILES = 3
+
+_EXCEPTION_RE = re.compile(r"^((?:[A-Za-z_$][\w$]*\.)+[\w$]*(?:Exception|Error|Throwable)[\w$]*)(?::\s*(.*))?$")
+_FRAME_RE = re.compile(r"^\s+at (.+)$")
+# Mod ids in Forge/NeoForge stack frames: "at TRANSFORMER/create@0.5.1/com.simibubi..."
+_TRANSFORMER_RE = re.compile(r"^(?:TRANSFORMER|MC-BOOTSTRAP|SECURE-BOOTSTRAP)/([\w-]+)@")
+_SUSPECTED_RE = re.compile(r"^Suspected Mods?:\s*(.*)$")
+_NOT_MODS = {"minecraft", "forge", "neoforge", "fml", "java.base", "fmlloader", "fmlcore", "javafmllanguage",
+             "mixin", "eventbus", "modlauncher", "none", "unknown"}
+# Packages of frames that don't point at a mod
+_PLATFORM_PACKAGES = ("java.", "javax.", "jdk.", "sun.", "com.sun.", "net.minecraft.", "com.mojang.",
+                      "net.minecraftforge.", "net.neoforged.", "cpw.mods.", "org.spongepowered.",
+                      "net.fabricmc.", "io.netty.", "it.unimi.", "com.google.", "org.apache.",
+                      "org.bukkit.", "org.spigotmc.", "io.papermc.", "co.aikar.")
+
+
+def process_map(func, calls, workers=None):
+    """[func(*args) for args in calls], in a process pool when there are enough calls.
+    func must be a module-level function so the workers can import it."""
+    if len(calls) >= MIN_POOL_FILES:
+        try:
+            # Spawned rather than forked: the manager's event loop and Qt threads must not be copied
+            with ProcessPoolExecutor(max_workers=workers or min(len(calls), os.cpu_count() or 1),
+                                     mp_context=multiprocessing.get_context("spawn")) as pool:
+                return list(pool.map(func, *zip(*calls)))
+        except (BrokenProcessPool, OSError):
+            pass  # no worker processes here; run in this process instead
+    return [func(*args) for args in calls]
+
+
+def find_history_files(server_dir):
+    """The rotated and current logs and the crash reports of a server directory."""
+    files = []
+    for subdir, suffixes, kind in (("logs", (".log", ".log.gz"), "log"), ("crash-reports", (".txt",), "crash")):
+        directory = os.path.join(server_dir, subdir)
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError:
+            continue
+        for name in names:
+            # debug logs repeat the regular log with a lot more noise
+            if name.endswith(suffixes) and not name.startswith("debug"):
+                files.append((os.path.join(directory, name), kind))
+    return files
+
+
+def analyze_file(path, kind):
+    """Analyse one file; runs in a worker process. Returns a JSON-serialisable summary."""
+    try:
+        if kind == "crash":
+            return analyze_crash_report(path)
+        return analyze_log(path)
+    except (OSError, EOFError, gzip.BadGzipFile) as e:
+        return {"kind": kind, "error": str(e)}
+
+
+def analyze_log(path):
+    """Stream a (possibly gzipped) log through the live log parser."""
+    parser = LogParser(recent_events=1)
+    exceptions = []
+    parser.add_listener(lambda event: exceptions.append(event.data) if event.kind == "exception" else None)
+    levels = Counter()
+    warnings = Counter()
+    lines = 0
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+        batch = []
+        for text in f:
+            batch.append(LogRecord(lines, 0.0, text.rstrip("\r\n")))
+            lines += 1
+            if len(batch) >= PARSE_BATCH:
+                _count_levels(parser.feed(batch), levels, warnings)
+                batch = []
+        if batch:
+            _count_levels(parser.feed(batch), levels, warnings)
+    signatures = {}
+    for data in exceptions:
+        # The frames were appended after the event, so they are complete only now
+        top_frame = next((frame[3:] for frame in data["frames"] if frame.startswith("at ")), "")
+        signature = f"{data['exception']} {top_frame}".strip()
+        entry = signatures.setdefault(signature, {"exception": data["exception"], "top_frame": top_frame,
+                                                  "count": 0, "example": data["message"][:300],
+                                                  "caused_by": data["caused_by"][-1:]})
+        entry["count"] += 1
+    return {
+        "kind": "log",
+        "lines": lines,
+        "levels": dict(levels),
+        "events": dict(parser.counters),
+        "exceptions": signatures,
+        "warnings": dict(warnings.most_common(MAX_WARNINGS_PER_FILE)),
+        "warnings_total": sum(warnings.values()),
+    }
+
+
+def _count_levels(parsed, levels, warnings):
+    for line in parsed:
+        if line.level:
+            levels[line.level] += 1
+            if line.level == "WARN":
+                warnings[normalize_message(line.message)[:200]] += 1
+
+
+def analyze_crash_report(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        lines = f.read().splitlines()
+    report = {"kind": "crash", "time": None, "description": None, "exception": None, "message": None,
+              "top_frames": [], "suspected_mods": []}
+    in_trace = False
+    for index, line in enumerate(lines):
+        if line.startswith("Time: ") and report["time"] is None:
+            report["time"] = line[6:].strip()
+        elif line.startswith("Description: ") and report["description"] is None:
+            report["description"] = line[13:].strip()
+        elif report["exception"] is None and report["description"] is not None:
+            match = _EXCEPTION_RE.match(line.strip())
+            if match:
+                report["exception"], report["message"] = match.group(1), (match.group(2) or "")[:300]
+                in_trace = True
+        elif in_trace:
+            frame = _FRAME_RE.match(line)
+            if frame and len(report["top_frames"]) < MAX_CRASH_FRAMES:
+                report["top_frames"].append(frame.group(1))
+            elif not frame:
+                in_trace = False
+        suspected = _SUSPECTED_RE.match(line.strip())
+        if suspected:
+            report["suspected_mods"].extend(_suspected_mods(suspected.group(1), lines[index + 1:]))
+    if not report["suspected_mods"]:
+        report["suspected_mods"] = _mods_from_frames(report["top_frames"])
+        report["suspected_by"] = "stack frames" if report["suspected_mods"] else None
+    else:
+        report["suspected_by"] = "crash report"
+    report["suspected_mods"] = list(dict.fromkeys(report["suspected_mods"]))
+    top = report["top_frames"][0] if report["top_frames"] else ""
+    report["cause"] = report["exception"] or report["description"] or "unknown"
+    if top:
+        report["cause"] += f" at {_strip_module(top)}"
+    return report
+
+
+def _suspected_mods(rest, following):
+    """'Create (create), Version: 0.5.1' on the same line, or on the indented lines below it."""
+    candidates = [rest] if rest.strip() else []
+    if not candidates:
+        for line in following:
+            if not line.startswith("\t") or line.startswith("\t\t"):
+                if line.startswith("\t\t"):
+                    continue
+                break
+            candidates.append(line.strip())
+    mods = []
+    for candidate in candidates:
+        name = candidate.split(", Version")[0].strip()
+        if name and name.lower() not in _NOT_MODS:
+            mods.append(name)
+    return mods
+
+
+def _mods_from_frames(frames):
+    mods = []
+    for frame in frames:
+        transformer = _TRANSFORMER_RE.match(frame)
+        if transformer:
+            if transformer.group(1).lower() not in _NOT_MODS:
+                mods.append(transformer.group(1))
+            continue
+        method = _strip_module(frame)
+        if method and not method.startswith(_PLATFORM_PACKAGES):
+            # The first two package levels usually name the author and the mod
+            mods.append(".".join(method.split(".")[:2]))
+    return mods
+
+
+def _strip_module(frame):
+    """'TRANSFORMER/minecraft@1.20.1/net.minecraft.world.Foo.bar(Foo.java:12)' -> 'net.minecraft.world.Foo.bar(Foo.java:12)'"""
+    return frame.rsplit("/", 1)[-1] if "/" in frame.split("(")[0] else frame
+
+
+class HistoryAnalyzer:
+    """Bulk analysis of a server's rotated logs and crash reports.
+
+    Files are analysed in a process pool, gzip logs are decompressed while streaming
+    through the same LogParser as the live output, and every file's summary is cached
+    by path, size and mtime, so a re-run only reads new or changed files. analyze()
+    merges the per-file summaries into exception signatures, warning frequencies and
+    crash causes with their suspected mods.
+    """
+
+    def __init__(self, cache_file, workers=None):
+        self.cache_file = cache_file
+        self.workers = workers
+        self.last_result = None
+        self._cache = None
+        self._lock = threading.Lock()
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                cache = json.load(f)
+            if cache.get("version") == CACHE_VERSION:
+                return cache["files"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, AttributeError):
+            pass
+        return {}
+
+    def _save_cache(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(self.cache_file, 'w') as f:
+                json.dump({"version": CACHE_VERSION, "files": self._cache}, f)
+        except IOError:
+            pass
+
+    def analyze(self, server_dir, top=20):
+        """Analyse the server directory's history. Blocks while new files are analysed."""
+        with self._lock:
+            started = time.monotonic()
+            if self._cache is None:
+                self._cache = self._load_cache()
+            files = find_history_files(server_dir)
+            todo = []
+            current = {}
+            for path, kind in files:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                cached = self._cache.get(path)
+                if cached and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime:
+                    current[path] = cached
+                else:
+                    todo.append((path, kind, stat))
+            results = process_map(analyze_file, [(path, kind) for path, kind, _ in todo], self.workers)
+            for (path, kind, stat), result in zip(todo, results):
+                current[path] = {"size": stat.st_size, "mtime": stat.st_mtime, "result": result}
+            # Files that are gone drop out of the cache
+            self._cache = current
+            if todo or len(current) != len(files):
+                self._save_cache()
+            result = aggregate(current, top)
+            result.update({
+                "server_dir": server_dir,
+                "files_analyzed": len(todo),
+                "files_cached": len(current) - len(todo),
+                "duration_s": round(time.monotonic() - started, 3),
+                "analyzed_at": time.time(),
+            })
+            self.last_result = result
+            return result
+
+
+def aggregate(files, top=20):
+    """Merge per-file summaries (path -> cache entry) into one report."""
+    levels = Counter()
+    events = Counter()
+    warnings = Counter()
+    exceptions = {}
+    crashes = []
+    causes = {}
+    lines = warnings_total = logs = errors = 0
+    for path, entry in files.items():
+        result = entry["result"]
+        name = os.path.basename(path)
+        if "error" in result:
+            errors += 1
+            continue
+        if result["kind"] == "log":
+            logs += 1
+            lines += result["lines"]
+            levels.update(result["levels"])
+            events.update(result["events"])
+            warnings.update(result["warnings"])
+            warnings_total += result["warnings_total"]
+            for signature, data in result["exceptions"].items():
+                merged = exceptions.setdefault(signature, {**data, "count": 0, "files": 0, "last_file": name})
+                merged["count"] += data["count"]
+                merged["files"] += 1
+                merged["last_file"] = max(merged["last_file"], name)
+        else:
+            crashes.append({"file": name, **{key: result[key] for key in
+                                            ("time", "description", "exception", "message", "top_frames",
+                                             "suspected_mods", "suspected_by", "cause")}})
+            cause = causes.setdefault(result["cause"], {"cause": result["cause"], "count": 0, "suspected_mods": Counter()})
+            cause["count"] += 1
+            cause["suspected_mods"].update(result["suspected_mods"])
+    crashes.sort(key=lambda crash: crash["file"], reverse=True)
+    return {
+        "logs": logs,
+        "crash_reports": len(crashes),
+        "unreadable_files": errors,
+        "lines": lines,
+        "levels": dict(levels),
+        "events": dict(events),
+        "exceptions": sorted(exceptions.values(), key=lambda entry: -entry["count"])[:top],
+        "distinct_exceptions": len(exceptions),
+        "warnings": [{"message": message, "count": count} for message, count in warnings.most_common(top)],
+        "warnings_total": warnings_total,
+        "crash_causes": [{**cause, "suspected_mods": [mod for mod, _ in cause["suspected_mods"].most_common()]}
+                         for cause in sorted(causes.values(), key=lambda cause: -cause["count"])][:top],
+        "recent_crashes": crashes[:top],
+    }
+
+
+def format_summary(result, top=10):
+    """Plain text version of an analyze() result for the GUI."""
+    lines = [f"{result['logs']} logs ({result['lines']} lines) and {result['crash_reports']} crash reports"
+             f" in {result['server_dir']}",
+             f"Analysed {result['files_analyzed']} new or changed files, {result['files_cached']} from the cache,"
+             f" in {result['duration_s']:.1f} s", ""]
+    if result["crash_causes"]:
+        lines.append("Crash causes:")
+        for cause in result["crash_causes"][:top]:
+            mods = f" (suspected: {', '.join(cause['suspected_mods'])})" if cause["suspected_mods"] else ""
+            lines.append(f"  {cause['count']}x {cause['cause']}{mods}")
+        lines.append("")
+    if result["exceptions"]:
+        lines.append(f"Exceptions ({result['distinct_exceptions']} distinct):")
+        for entry in result["exceptions"][:top]:
+            lines.append(f"  {entry['count']}x {entry['exception']} in {entry['files']} files")
+            if entry["top_frame"]:
+                lines.append(f"      at {entry['top_frame']}")
+        lines.append("")
+    if result["warnings"]:
+        lines.append(f"Most frequent warnings ({result['warnings_total']} in total):")
+        lines.extend(f"  {entry['count']}x {entry['message']}" for entry in result["warnings"][:top])
+    return "\n".join(lines)
@@ -0,0 +1,352 @@
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+
+# Upper bounds (milliseconds) of the latency histogram buckets; one more bucket takes the rest
+BUCKET_BOUNDS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# How often a watched event loop beats, and how late a beat has to be to count as a stall
+STALL_CHECK_INTERVAL = 0.2
+DEFAULT_STALL_THRESHOLD = 0.25
+MAX_STALLS = 20
+STALL_STACK_FRAMES = 12
+DEFAULT_SAMPLE_INTERVAL = 0.005
+DEFAULT_PROFILE_SECONDS = 30
+MAX_PROFILE_SECONDS = 600
+PROFILE_STACK_FRAMES = 8
+# Where threads wait for work, so samples there are idle: (file, function)
+IDLE_FRAMES = {("threading.py", "wait"), ("selectors.py", "select"), ("queue.py", "get"), ("thread.py", "_worker"),
+               ("_asyncio.py", "run"), ("minecraft_server_manager.py", "run_gui")}
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, cheap enough to record every batch."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.calls = 0
+        self.items = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds, items=1):
+        ms = seconds * 1000
+        index = 0
+        while index < len(BUCKET_BOUNDS_MS) and ms > BUCKET_BOUNDS_MS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.calls += 1
+        self.items += items
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the percentile (the maximum for the last bucket)."""
+        rank = fraction * self.calls
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return BUCKET_BOUNDS_MS[index] if index < len(BUCKET_BOUNDS_MS) else round(self.max, 3)
+        return 0.0
+
+    def snapshot(self):
+        return {
+            "calls": self.calls,
+            "items": self.items,
+            "mean_ms": round(self.total / self.calls, 3) if self.calls else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max, 3),
+            "total_ms": round(self.total, 1),
+        }
+
+
+class Instruments:
+    """Counters, latency histograms and queue depths of the manager's own hot paths.
+
+    Stages time themselves with observe(); queues register a function returning their
+    depth with gauge(), which is only called when a snapshot is taken. One instance is
+    shared by everything in the process (the supervisor owns it).
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._histograms = {}
+        self._counters = Counter()
+        self._gauges = {}
+        self._stalls = deque(maxlen=MAX_STALLS)
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, items=1):
+        """Record one call of a stage that took seconds and handled items (lines, records)."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.add(seconds, items)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def gauge(self, name, depth):
+        """Report depth() as the queue depth called name; depth=None removes it."""
+        with self._lock:
+            if depth is None:
+                self._gauges.pop(name, None)
+            else:
+                self._gauges[name] = depth
+
+    def stall(self, name, seconds, stack):
+        with self._lock:
+            self._counters[f"{name}.stalls"] += 1
+            self._stalls.append({"loop": name, "at": time.time() - seconds, "duration_ms": round(seconds * 1000, 1),
+                                 "stack": stack})
+
+    def timed(self, stage, func):
+        """Wrap func (plain or async) so every call is observed as stage and stage.<name>."""
+        name = f"{stage}.{func.__name__}"
+
+        def done(started):
+            elapsed = time.perf_counter() - started
+            self.observe(stage, elapsed)
+            self.observe(name, elapsed)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def timed_call(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    done(started)
+        else:
+            @functools.wraps(func)
+            def timed_call(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    done(started)
+        return timed_call
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._histograms.clear()
+            self._counters.clear()
+            self._stalls.clear()
+
+    def snapshot(self):
+        with self._lock:
+            histograms = {name: histogram.snapshot() for name, histogram in sorted(self._histograms.items())}
+            counters = dict(sorted(self._counters.items()))
+            gauges = dict(self._gauges)
+            stalls = list(self._stalls)
+        queues = {}
+        for name, depth in sorted(gauges.items()):
+            try:
+                queues[name] = depth()
+            except Exception as e:  # a gauge must never break the diagnostics
+                queues[name] = f"error: {e}"
+        return {"since": self.started, "stages": histograms, "counters": counters, "queues": queues,
+                "stalls": stalls}
+
+
+class StallDetector:
+    """Notices when an event loop is blocked for longer than threshold.
+
+    The loop calls beat() every interval (a timer of the loop). How late each beat
+    comes is recorded as the "<name>_loop_lag" stage, and a beat more than threshold
+    late counts as a stall. That part always runs and costs one timer call per
+    interval. Between start_watchdog() and stop_watchdog() (while the SamplingProfiler
+    runs) a watchdog thread also waits for the beats; when one is overdue it takes the
+    stack of the loop thread (thread_id, by default the thread creating the detector),
+    which shows what the loop is stuck in. A stall is recorded with its duration (and
+    stack, if taken) once the loop beats again.
+    """
+
+    def __init__(self, instruments, name="gui", thread_id=None, interval=STALL_CHECK_INTERVAL,
+                 threshold=DEFAULT_STALL_THRESHOLD):
+        self.instruments = instruments
+        self.name = name
+        self.interval = interval
+        self.threshold = threshold
+        self._thread_id = thread_id or threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._beaten = threading.Event()
+        self._stack = None  # taken by the watchdog during the current stall
+        self._watchdog = None
+
+    def beat(self):
+        now = time.perf_counter()
+        late = max(0.0, now - self._last_beat - self.interval)
+        self._last_beat = now
+        self.instruments.observe(f"{self.name}_loop_lag", late)
+        if late >= self.threshold:
+            stack, self._stack = self._stack or [], None
+            self.instruments.stall(self.name, late, stack)
+        self._beaten.set()
+
+    def start_watchdog(self):
+        """Start taking the stacks of stalls; safe from any thread. False if already running."""
+        if self._watchdog is not None:
+            return False
+        self._beaten.clear()
+        self._watchdog = threading.Thread(target=self._watch, name=f"{self.name}-stall-watchdog", daemon=True)
+        self._watchdog.start()
+        return True
+
+    def stop_watchdog(self):
+        watchdog, self._watchdog = self._watchdog, None
+        if watchdog is not None:
+            self._beaten.set()
+            watchdog.join()
+
+    def _watch(self):
+        watchdog = threading.current_thread()
+        while self._watchdog is watchdog:
+            if self._beaten.wait(self.interval + self.threshold):
+                self._beaten.clear()
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._stack = format_stack(frame, STALL_STACK_FRAMES)
+            # Only one stack per stall: wait for the loop to come back (or stop_watchdog())
+            self._beaten.wait()
+            self._beaten.clear()
+
+
+def thread_cpu_time(thread_id):
+    """CPU seconds a thread has used, or None where the platform can't tell (Windows)."""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+    except (AttributeError, OSError, OverflowError):
+        return None
+
+
+def format_stack(frame, limit):
+    """The innermost limit frames as "file:line function" strings, outermost first."""
+    return [f"{os.path.basename(entry.filename)}:{entry.lineno} {entry.name}"
+            for entry in traceback.extract_stack(frame, limit)]
+
+
+class SamplingProfiler:
+    """Statistical profiler for the manager itself: samples the stack of every thread.
+
+    Runs on its own thread for a limited time, so it can be switched on in a live
+    manager and costs nothing when off. A sample is idle when the thread waits in one
+    of IDLE_FRAMES or used no CPU since the previous sample (where the platform has
+    per-thread CPU clocks). The busy samples show where time goes: functions by own
+    time (innermost frame) and by total time, and the most common stacks. While a
+    profile runs the stall_detectors also take the stacks of event loop stalls.
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stall_detectors = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.samples = 0
+        self.started = None
+        self.ended = None
+        self._threads = Counter()
+        self._idle = Counter()
+        self._own = Counter()
+        self._total = Counter()
+        self._stacks = Counter()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds=DEFAULT_PROFILE_SECONDS):
+        """Start a new profile that stops by itself after seconds. False if one is running."""
+        if self.running:
+            return False
+        with self._lock:
+            self._clear()
+            self.started = time.time()
+        self._stop.clear()
+        seconds = min(max(1.0, seconds), MAX_PROFILE_SECONDS)
+        self._thread = threading.Thread(target=self._run, args=(seconds,), name="sampling-profiler", daemon=True)
+        for detector in list(self.stall_detectors):
+            detector.start_watchdog()
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self, seconds):
+        own_id = threading.get_ident()
+        cpu_times = {}
+        end = time.monotonic() + seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < end:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                self.samples += 1
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    used = thread_cpu_time(thread_id)
+                    busy = None if used is None or thread_id not in cpu_times else used > cpu_times[thread_id]
+                    cpu_times[thread_id] = used
+                    self._sample(names.get(thread_id, str(thread_id)), frame, busy)
+        for detector in list(self.stall_detectors):
+            detector.stop_watchdog()
+        with self._lock:
+            self.ended = time.time()
+
+    def _sample(self, thread, frame, busy):
+        self._threads[thread] += 1
+        code = frame.f_code
+        if busy is False or (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+            self._idle[thread] += 1
+            return
+        functions = []
+        while frame is not None:
+            code = frame.f_code
+            functions.append(f"{os.path.basename(code.co_filename)}:{code.co_firstlineno} {code.co_name}")
+            frame = frame.f_back
+        self._own[(thread, functions[0])] += 1
+        # A recursive function still only counts once per sample
+        for function in set(functions):
+            self._total[(thread, function)] += 1
+        self._stacks[(thread, " <- ".join(functions[:PROFILE_STACK_FRAMES]))] += 1
+
+    def report(self, top=20):
+        with self._lock:
+            samples = self.samples
+            threads = {thread: {"samples": count, "idle": self._idle[thread]}
+                       for thread, count in self._threads.most_common()}
+
+            def ranked(counter, key):
+                return [{"thread": thread, key: entry, "samples": count,
+                         "percent": round(100.0 * count / samples, 1) if samples else 0.0}
+                        for (thread, entry), count in counter.most_common(top)]
+
+            return {
+                "running": self.running,
+                "started": self.started,
+                "ended": self.ended,
+                "samples": samples,
+                "interval_ms": self.interval * 1000,
+                "threads": threads,
+                "own_time": ranked(self._own, "function"),
+                "total_time": ranked(self._total, "function"),
+                "stacks": ranked(self._stacks, "stack"),
+            }
@@ -0,0 +1,236 @@
+import os
+import re
+import shutil
+import subprocess
+import threading
+
+import psutil
+
+# Memory left to the operating system (and everything else on the host): at least
+# OS_RESERVE, or OS_RESERVE_FRACTION of the total, whichever is larger
+OS_RESERVE = 1536 * 1024 * 1024
+OS_RESERVE_FRACTION = 0.2
+MIN_HEAP = 1024 * 1024 * 1024
+# Above this G1 loses compressed object pointers, so 32G of heap holds less than 31G
+COMPRESSED_OOPS_LIMIT = 31 * 1024 * 1024 * 1024
+# Aikar's flags switch to their large-heap variant above this
+LARGE_HEAP = 12 * 1024 * 1024 * 1024
+# ZGC is proposed for heaps at least this large on a JDK with generational ZGC
+ZGC_MIN_HEAP = 16 * 1024 * 1024 * 1024
+ZGC_MIN_CORES = 8
+JAVA_VERSION_TIMEOUT = 15
+
+# Aikar's G1 flags (https://docs.papermc.io/paper/aikars-flags), regular and large-heap variant
+AIKAR_FLAGS = (
+    "-XX:+UseG1GC -XX:+ParallelRefProcEnabled -XX:MaxGCPauseMillis=200 -XX:+UnlockExperimentalVMOptions "
+    "-XX:+DisableExplicitGC -XX:+AlwaysPreTouch -XX:G1NewSizePercent=30 -XX:G1MaxNewSizePercent=40 "
+    "-XX:G1HeapRegionSize=8M -XX:G1ReservePercent=20 -XX:G1HeapWastePercent=5 -XX:G1MixedGCCountTarget=4 "
+    "-XX:InitiatingHeapOccupancyPercent=15 -XX:G1MixedGCLiveThresholdPercent=90 "
+    "-XX:G1RSetUpdatingPauseTimePercent=5 -XX:SurvivorRatio=32 -XX:+PerfDisableSharedMem "
+    "-XX:MaxTenuringThreshold=1 -Dusing.aikars.flags=https://mcflags.emc.gs -Daikars.new.flags=true"
+)
+AIKAR_LARGE_HEAP_FLAGS = (AIKAR_FLAGS
+                          .replace("G1NewSizePercent=30", "G1NewSizePercent=40")
+                          .replace("G1MaxNewSizePercent=40", "G1MaxNewSizePercent=50")
+                          .replace("G1HeapRegionSize=8M", "G1HeapRegionSize=16M")
+                          .replace("G1ReservePercent=20", "G1ReservePercent=15")
+                          .replace("InitiatingHeapOccupancyPercent=15", "InitiatingHeapOccupancyPercent=20"))
+ZGC_FLAGS = "-XX:+UseZGC -XX:+AlwaysPreTouch -XX:+DisableExplicitGC -XX:+PerfDisableSharedMem"
+# Generational ZGC has to be asked for on JDK 21 and 22 and is the only mode from 23 on
+ZGC_GENERATIONAL_FLAG = "-XX:+ZGenerational"
+
+_SIZE_RE = re.compile(r"^(\d+)([KkMmGgTt]?)$")
+_VERSION_RE = re.compile(r'version "([^"]+)"')
+_XX_RE = re.compile(r"^-XX:(?:[+-]\w+|\w+=\S+)$")
+_COLLECTORS = ("UseG1GC", "UseZGC", "UseShenandoahGC", "UseParallelGC", "UseSerialGC", "UseConcMarkSweepGC")
+_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+
+# java -version results by (resolved path, mtime), so each Java binary is only run once
+_version_cache = {}
+_version_lock = threading.Lock()
+
+
+def parse_size(text):
+    """'4G' -> bytes, as the JVM reads -Xmx values. Returns None if the JVM would reject it."""
+    match = _SIZE_RE.match((text or "").strip())
+    if not match:
+        return None
+    return int(match.group(1)) * _UNITS[match.group(2).lower()]
+
+
+def format_size(size):
+    """Bytes -> the largest whole JVM size unit ('6G', '1536M')."""
+    for unit in ("T", "G", "M", "K"):
+        if size % _UNITS[unit.lower()] == 0:
+            return f"{size // _UNITS[unit.lower()]}{unit}"
+    return str(size)
+
+
+def format_size_gb(size):
+    return f"{size / _UNITS['g']:.1f}G"
+
+
+def java_version(java_path):
+    """Run java -version once per Java binary (path and mtime) and return what it reports:
+    {"path", "version", "major", "vm", "openj9"}, with "warning" if the output was not
+    understood, or {"path", "error"} if Java could not be run."""
+    resolved = shutil.which(java_path) or java_path
+    try:
+        key = (os.path.realpath(resolved), os.path.getmtime(resolved))
+    except OSError:
+        return {"path": java_path, "error": f"Java not found: {java_path}"}
+    with _version_lock:
+        cached = _version_cache.get(key)
+    if cached:
+        return cached
+    try:
+        result = subprocess.run([resolved, "-version"], capture_output=True, text=True, stdin=subprocess.DEVNULL,
+                                timeout=JAVA_VERSION_TIMEOUT,
+                                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+        output = result.stderr or result.stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        return {"path": java_path, "error": f"Could not run {java_path} -version: {e}"}
+    match = _VERSION_RE.search(output)
+    if not match:
+        info = {"path": java_path, "version": None, "major": 0, "openj9": False,
+                "warning": f"Unrecognised java -version output: {output.strip()[:200]}"}
+    else:
+        version = match.group(1)
+        parts = re.findall(r"\d+", version)
+        # "1.8.0_392" is Java 8, "17.0.9" is Java 17
+        major = int(parts[1]) if parts and parts[0] == "1" and len(parts) > 1 else int(parts[0]) if parts else 0
+        info = {"path": java_path, "version": version, "major": major,
+                "vm": output.strip().splitlines()[-1], "openj9": "OpenJ9" in output}
+    with _version_lock:
+        _version_cache[key] = info
+    return info
+
+
+def host_resources():
+    memory = psutil.virtual_memory()
+    return {
+        "total_memory": memory.total,
+        "available_memory": memory.available,
+        "physical_cores": psutil.cpu_count(logical=False) or psutil.cpu_count() or 1,
+        "logical_cores": psutil.cpu_count() or 1,
+    }
+
+
+def flag_sets(java):
+    """The well-known flag sets that work with this Java."""
+    sets = {"aikar_g1": AIKAR_FLAGS, "aikar_g1_large_heap": AIKAR_LARGE_HEAP_FLAGS}
+    major = java.get("major", 0)
+    if major >= 21 and not java.get("openj9"):
+        sets["zgc_generational"] = ZGC_FLAGS if major >= 23 else f"{ZGC_FLAGS} {ZGC_GENERATIONAL_FLAG}"
+    elif major >= 15 and not java.get("openj9"):
+        sets["zgc"] = ZGC_FLAGS
+    return sets
+
+
+def recommend(java_path, other_heaps=0, host=None):
+    """Propose min_ram, max_ram and extra_args for this host and Java.
+
+    other_heaps is the memory already promised to the other servers of this manager.
+    Returns the proposal with the reasons behind it, the alternatives and any warnings.
+    """
+    host = host or host_resources()
+    java = java_version(java_path)
+    reasons = []
+    warnings = []
+    if "error" in java or "warning" in java:
+        warnings.append(java.get("error") or java["warning"])
+    reserve = max(OS_RESERVE, int(host["total_memory"] * OS_RESERVE_FRACTION))
+    budget = host["total_memory"] - reserve - other_heaps
+    reasons.append(f"{format_size_gb(host['total_memory'])} total memory, {format_size_gb(reserve)} left to the system"
+                   + (f" and {format_size_gb(other_heaps)} to the other servers" if other_heaps else ""))
+    sets = flag_sets(java)
+    use_zgc = ("zgc_generational" in sets and budget >= ZGC_MIN_HEAP
+               and host["physical_cores"] >= ZGC_MIN_CORES)
+    if not use_zgc and budget > COMPRESSED_OOPS_LIMIT:
+        budget = COMPRESSED_OOPS_LIMIT
+        reasons.append("Heap capped at 31G so G1 keeps compressed object pointers")
+    # Whole gigabytes, at least MIN_HEAP
+    heap = max(MIN_HEAP, budget // _UNITS["g"] * _UNITS["g"])
+    if budget < MIN_HEAP:
+        warnings.append(f"Only {format_size_gb(max(0, budget))} can be spared for the heap; using the 1G minimum")
+    if heap > host["available_memory"]:
+        warnings.append(f"Only {format_size_gb(host['available_memory'])} is available right now; "
+                        f"other programs need to close for a {format_size(heap)} heap")
+    if use_zgc:
+        gc, extra_args = "ZGC (generational)", sets["zgc_generational"]
+        reasons.append(f"Java {java['major']} with a {format_size(heap)} heap and {host['physical_cores']} cores: "
+                       f"generational ZGC keeps pauses under a millisecond")
+    elif heap > LARGE_HEAP:
+        gc, extra_args = "G1 (Aikar, large heap)", sets["aikar_g1_large_heap"]
+        reasons.append("G1 with Aikar's flags, large-heap variant for heaps over 12G")
+    else:
+        gc, extra_args = "G1 (Aikar)", sets["aikar_g1"]
+        reasons.append("G1 with Aikar's flags")
+    if java.get("openj9"):
+        warnings.append("OpenJ9 ignores most of these HotSpot flags; consider a HotSpot JDK")
+    reasons.append("Min and max heap are equal, so the heap is reserved (and pre-touched) once at startup")
+    return {
+        "min_ram": format_size(heap),
+        "max_ram": format_size(heap),
+        "gc": gc,
+        "extra_args": extra_args,
+        "reasons": reasons,
+        "warnings": warnings,
+        "flag_sets": sets,
+        "java": java,
+        "host": host,
+    }
+
+
+def validate(java_path, min_ram, max_ram, extra_args, host=None):
+    """Check launch settings for mistakes that would only show up as a failed boot.
+    Returns {"errors": [...], "warnings": [...]}; the server should not start with errors."""
+    host = host or host_resources()
+    errors = []
+    warnings = []
+    java = java_version(java_path)
+    if "error" in java:
+        errors.append(java["error"])
+    elif "warning" in java:
+        warnings.append(java["warning"])
+    major = java.get("major", 0)
+    minimum, maximum = parse_size(min_ram), parse_size(max_ram)
+    if minimum is None:
+        errors.append(f"Min RAM {min_ram!r} is not a size the JVM understands (e.g. 2G or 2048M)")
+    if maximum is None:
+        errors.append(f"Max RAM {max_ram!r} is not a size the JVM understands (e.g. 4G or 4096M)")
+    if minimum is not None and maximum is not None:
+        if minimum > maximum:
+            errors.append(f"Min RAM ({min_ram}) is larger than Max RAM ({max_ram}); the JVM refuses to start")
+        if maximum < MIN_HEAP // 2:
+            warnings.append(f"Max RAM {max_ram} is too small for a Minecraft server")
+        if maximum > host["total_memory"]:
+            errors.append(f"Max RAM ({max_ram}) is more than this machine has ({format_size_gb(host['total_memory'])})")
+        elif maximum > host["available_memory"]:
+            warnings.append(f"Max RAM ({max_ram}) is more than is available right now "
+                            f"({format_size_gb(host['available_memory'])}); expect swapping")
+    args = (extra_args or "").split()
+    collectors = [name for name in _COLLECTORS if f"-XX:+{name}" in args]
+    if len(collectors) > 1:
+        errors.append(f"More than one garbage collector selected ({', '.join(collectors)}); the JVM refuses to start")
+    for arg in args:
+        if not arg.startswith("-"):
+            errors.append(f"Extra argument {arg!r} does not start with '-'; Java would take it as the main class")
+        elif arg.startswith("-XX:") and not _XX_RE.match(arg):
+            errors.append(f"Malformed JVM option {arg!r}")
+        elif arg.startswith(("-Xmx", "-Xms")):
+            warnings.append(f"{arg} in the extra arguments overrides the Min/Max RAM settings")
+    if major:
+        if "-XX:+UseZGC" in args and major < 15 and "-XX:+UnlockExperimentalVMOptions" not in args:
+            errors.append(f"ZGC needs Java 15 or newer (this is Java {major})")
+        if ZGC_GENERATIONAL_FLAG in args and major < 21:
+            errors.append(f"{ZGC_GENERATIONAL_FLAG} needs Java 21 or newer (this is Java {major})")
+        if "-XX:+UseShenandoahGC" in args and major < 12:
+            errors.append(f"Shenandoah needs Java 12 or newer (this is Java {major})")
+        if "-XX:+UseConcMarkSweepGC" in args and major >= 14:
+            errors.append(f"CMS was removed in Java 14 (this is Java {major})")
+        if any(arg.startswith("-Xlog") for arg in args) and major < 9:
+            errors.append(f"-Xlog needs Java 9 or newer (this is Java {major})")
+        if maximum and maximum > COMPRESSED_OOPS_LIMIT and "-XX:+UseZGC" not in args:
+            warnings.append("Heaps over 31G lose compressed object pointers; 31G holds about as much as 40G")
+    return {"errors": errors, "warnings": warnings, "java": java}
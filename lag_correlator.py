@@ -0,0 +1,281 @@
+import bisect
+import math
+import re
+import threading
+import time
+from collections import deque
+
+from gc_log import POLL_INTERVAL as GC_POLL_INTERVAL
+
+# Seconds before a lag warning that are searched for causes (longer if the server fell
+# further behind), and the seconds before that which tell what is normal for this server
+DEFAULT_LOOKBACK = 15.0
+DEFAULT_BASELINE = 120.0
+# Signals older than this are dropped from the rolling window
+HORIZON = 300.0
+MAX_SIGNALS = 20000
+MAX_REPORTS = 50
+MAX_EXAMPLES = 3
+# Lag warnings closer than this to the last explained one only count as its repeats. Vanilla
+# warns at most every 15 s, but modded servers and replays can flood them, and each
+# explanation reads the whole window.
+MIN_REPORT_GAP = 5.0
+# A lag warning is explained this long after it arrives: GC pauses only come in when the
+# GC log is polled, and the pause just before the warning is the one that matters
+EXPLAIN_DELAY = GC_POLL_INTERVAL + 0.5
+
+_LAG_RE = re.compile(r"Can't keep up!.*?Running (\d+)ms or (\d+) ticks behind")
+# Log lines that often go together with a lag spike, matched once per line
+_SIGNAL_RE = re.compile(
+    r"(?P<gc>\[gc[\],]|GC\(\d+\) Pause|Pause (?:Young|Full|Remark))"
+    r"|(?P<worldgen>(?i:chunk)|Preparing spawn area|[Ww]orldgen)"
+    r"|(?P<save>Saving the game|Saved the game|Saving chunks for level|ThreadedAnvilChunkStorage)"
+    r"|(?P<entities>Skipping Entity|Fetching addPacket for removed entity|[Ee]ntity .* (?:removed|ticking))"
+    r"|(?P<command>issued server command|^\[\w+: )"
+)
+# Events the log parser already keeps in its recent events buffer
+_PARSER_KINDS = ("join", "leave", "exception")
+
+# How much a co-occurring signal of each kind counts, and how it is described
+SIGNAL_WEIGHTS = {"gc": 3.0, "worldgen": 2.0, "join": 2.0, "save": 1.5, "entities": 1.5,
+                  "exception": 1.0, "command": 1.0, "leave": 0.5, "warning": 0.5}
+SIGNAL_LABELS = {"gc": "GC pauses", "worldgen": "chunk generation lines", "join": "player joins",
+                 "save": "world save lines", "entities": "entity warnings", "exception": "exceptions",
+                 "command": "commands", "leave": "player leaves", "warning": "other warnings/errors"}
+# Process metrics compared with their baseline; the floor keeps tiny wobbles from scoring
+METRIC_FLOORS = {"cpu_percent": 5.0, "rss": 16 * 1024 * 1024, "threads": 2.0,
+                 "read_bytes": 1024 * 1024, "write_bytes": 1024 * 1024}
+METRIC_LABELS = {"cpu_percent": "CPU", "rss": "memory", "threads": "threads",
+                 "read_bytes": "disk reads", "write_bytes": "disk writes"}
+# A metric counts when its peak is this many standard deviations above its baseline
+MIN_DEVIATIONS = 2.0
+
+
+class LagCorrelator:
+    """Explains "Can't keep up!" warnings with whatever happened just before them.
+
+    feed() gets every parsed server line. Lines that often cause lag (GC, chunk
+    generation, saves, entity warnings, commands, warnings in general) go into a rolling
+    window of timestamped signals; joins, leaves and exceptions come from the log parser's
+    recent events and process metrics from the sampler's ring. When a lag warning
+    arrives, each source is joined on time with the lookback window before it and with
+    the baseline window before that. Only the entries inside the two windows are read,
+    and nothing is rescanned from the log. The signals are ranked by how unusual they
+    were in the lookback window, and the report goes to the listeners.
+
+    With an engine, the explanation waits EXPLAIN_DELAY on its loop, so signals that
+    arrive late (GC pauses) are still counted; without one it happens right away.
+    """
+
+    def __init__(self, log_parser, sampler, probes=None, lookback=DEFAULT_LOOKBACK, baseline=DEFAULT_BASELINE,
+                 engine=None):
+        self.log_parser = log_parser
+        self.sampler = sampler
+        self.probes = probes
+        self.engine = engine
+        self.lookback = lookback
+        self.baseline = baseline
+        self.signals = deque(maxlen=MAX_SIGNALS)  # (timestamp, seq, kind, text), oldest first
+        self.reports = deque(maxlen=MAX_REPORTS)
+        self._pending = []  # lag warnings waiting for EXPLAIN_DELAY, oldest first
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """Call callback(report) for every lag warning that was explained."""
+        self._listeners.append(callback)
+
+    def reset(self):
+        """Forget the signals of a previous run. Reports are kept."""
+        with self._lock:
+            self.signals.clear()
+            self._pending.clear()
+
+    def add_signal(self, timestamp, kind, text):
+        """Add a signal from outside the server output, such as a pause from the GC log.
+        These arrive late, so they are put in time order."""
+        signal = (timestamp, None, kind, text)
+        with self._lock:
+            if len(self.signals) == self.signals.maxlen:
+                self.signals.popleft()
+            if not self.signals or timestamp >= self.signals[-1][0]:
+                self.signals.append(signal)
+            else:
+                bisect.insort(self.signals, signal, key=lambda entry: entry[0])
+
+    def feed(self, parsed):
+        added = 0
+        with self._lock:
+            for line in parsed:
+                message = line.message
+                lag = _LAG_RE.search(message) if "Can't keep up!" in message else None
+                if lag:
+                    last = self._pending[-1] if self._pending else (self.reports[-1] if self.reports else None)
+                    if last and 0 <= line.timestamp - last["timestamp"] < MIN_REPORT_GAP:
+                        last["repeats"] = last.get("repeats", 0) + 1
+                    else:
+                        self._pending.append({"timestamp": line.timestamp, "line": line,
+                                              "behind_ms": int(lag.group(1)), "ticks": int(lag.group(2))})
+                        added += 1
+                    continue
+                match = _SIGNAL_RE.search(message)
+                if match:
+                    self.signals.append((line.timestamp, line.seq, match.lastgroup, line.text))
+                elif line.level in ("WARN", "ERROR"):
+                    self.signals.append((line.timestamp, line.seq, "warning", line.text))
+            if parsed:
+                horizon = parsed[-1].timestamp - HORIZON
+                while self.signals and self.signals[0][0] < horizon:
+                    self.signals.popleft()
+        if not added:
+            return
+        if self.engine is None:
+            self._explain_pending(everything=True)
+        else:
+            for _ in range(added):
+                self.engine.call(self.engine.loop.call_later, EXPLAIN_DELAY, self._explain_pending)
+
+    def _explain_pending(self, everything=False):
+        """Explain the lag warnings that have waited EXPLAIN_DELAY and notify the listeners."""
+        due = time.time() - EXPLAIN_DELAY + 0.05
+        reports = []
+        with self._lock:
+            while self._pending and (everything or self._pending[0]["timestamp"] <= due):
+                lag = self._pending.pop(0)
+                report = self._explain(lag["line"], lag["behind_ms"], lag["ticks"])
+                if lag.get("repeats"):
+                    report["repeats"] = lag["repeats"]
+                reports.append(report)
+            self.reports.extend(reports)
+        for report in reports:
+            for callback in self._listeners:
+                callback(report)
+
+    def recent_reports(self, limit=1):
+        with self._lock:
+            return list(self.reports)[-limit:]
+
+    def _explain(self, line, behind_ms, ticks):
+        lag_time = line.timestamp
+        lookback = max(self.lookback, behind_ms / 1000 + 5)
+        window_start = lag_time - lookback
+        baseline_start = window_start - self.baseline
+        signals = self._log_signals(line.seq, lag_time, window_start, baseline_start, lookback)
+        signals += self._metric_signals(lag_time, window_start, baseline_start)
+        signals.sort(key=lambda signal: -signal["score"])
+        context = {"players_online": len(self.log_parser.players_online)}
+        if self.probes is not None:
+            context["tick"] = self.probes.latest()
+        if signals:
+            summary = "; ".join(signal["description"] for signal in signals[:3])
+        else:
+            summary = "no unusual log activity or resource usage before it"
+        return {
+            "timestamp": lag_time,
+            "seq": line.seq,
+            "behind_ms": behind_ms,
+            "ticks": ticks,
+            "window_seconds": round(lookback, 1),
+            "baseline_seconds": self.baseline,
+            "signals": signals,
+            "context": context,
+            "summary": f"Lag of {behind_ms} ms ({ticks} ticks): {summary}",
+        }
+
+    def _log_signals(self, lag_seq, lag_time, window_start, baseline_start, lookback):
+        in_window = {}
+        in_baseline = {}
+        examples = {}
+
+        def add(timestamp, kind, text):
+            if timestamp >= window_start:
+                in_window[kind] = in_window.get(kind, 0) + 1
+                kind_examples = examples.setdefault(kind, [])
+                if len(kind_examples) < MAX_EXAMPLES:
+                    kind_examples.append(text)
+            else:
+                in_baseline[kind] = in_baseline.get(kind, 0) + 1
+
+        # Both buffers are in time order: walk back from the newest entry until the
+        # baseline window starts, skipping what came after the warning (explained late)
+        for timestamp, seq, kind, text in reversed(self.signals):
+            if timestamp < baseline_start:
+                break
+            if (seq is not None and seq > lag_seq) or (seq is None and timestamp > lag_time):
+                continue
+            add(timestamp, kind, text)
+        # (a copy: manager messages are parsed on other threads)
+        for event in reversed(list(self.log_parser.recent)):
+            if event.timestamp < baseline_start:
+                break
+            if event.seq < lag_seq and event.kind in _PARSER_KINDS:
+                add(event.timestamp, event.kind, _describe_event(event))
+
+        signals = []
+        for kind, count in in_window.items():
+            # What the baseline rate predicts for a window of this length
+            expected = in_baseline.get(kind, 0) * lookback / self.baseline
+            score = SIGNAL_WEIGHTS.get(kind, 1.0) * count / (1.0 + expected)
+            signals.append({
+                "signal": kind,
+                "source": "log",
+                "score": round(score, 2),
+                "count": count,
+                "expected": round(expected, 2),
+                "examples": list(reversed(examples[kind])),
+                "description": f"{count} {SIGNAL_LABELS.get(kind, kind)} in the {lookback:.0f} s before"
+                               f" (usually {expected:.1f})",
+            })
+        return signals
+
+    def _metric_signals(self, lag_time, window_start, baseline_start):
+        samples = self.sampler.series.window(baseline_start, lag_time)
+        times = samples["timestamps"]
+        split = next((i for i, timestamp in enumerate(times) if timestamp >= window_start), len(times))
+        if split < 3 or split == len(times):
+            return []  # not enough samples to tell what is normal
+        signals = []
+        for name, floor in METRIC_FLOORS.items():
+            baseline_values = samples[name][:split]
+            window_values = samples[name][split:]
+            mean = sum(baseline_values) / len(baseline_values)
+            deviation = max(math.sqrt(sum((value - mean) ** 2 for value in baseline_values) / len(baseline_values)),
+                            floor)
+            peak, low = max(window_values), min(window_values)
+            label = METRIC_LABELS[name]
+            if (peak - mean) / deviation >= MIN_DEVIATIONS:
+                score = (peak - mean) / deviation / MIN_DEVIATIONS
+                description = f"{label} peaked at {_format_metric(name, peak)} (usually {_format_metric(name, mean)})"
+            elif name == "rss" and (mean - low) / deviation >= MIN_DEVIATIONS:
+                # Memory suddenly released: typically a full GC
+                score = (mean - low) / deviation / MIN_DEVIATIONS
+                description = f"memory dropped to {_format_metric(name, low)} (usually {_format_metric(name, mean)}),"\
+                              f" likely a full GC"
+            else:
+                continue
+            signals.append({
+                "signal": name,
+                "source": "metrics",
+                "score": round(score, 2),
+                "peak": round(peak, 1),
+                "low": round(low, 1),
+                "baseline_mean": round(mean, 1),
+                "description": description,
+            })
+        return signals
+
+
+def _describe_event(event):
+    if event.kind in ("join", "leave"):
+        return event.data.get("player", "")
+    return f"{event.data.get('exception', '')}: {event.data.get('message', '')}"
+
+
+def _format_metric(name, value):
+    if name == "rss":
+        return f"{value / (1024 * 1024):.0f} MB"
+    if name in ("read_bytes", "write_bytes"):
+        return f"{value / (1024 * 1024):.1f} MB/s"
+    if name == "cpu_percent":
+        return f"{value:.0f}%"
+    return f"{value:.0f}"
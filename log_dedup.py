@@ -0,0 +1,220 @@
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from log_parser import parse_header
+
+# What happens to repeated lines: only hidden from the console, the GUI and get_server_logs
+# (the store, spool and search keep the full stream), dropped before the log store (memory,
+# spool, search, GUI and MCP all see one line plus a summary), or nothing
+DEDUP_DISPLAY = "display"
+DEDUP_COLLAPSE = "collapse"
+DEDUP_OFF = "off"
+DEDUP_MODES = (DEDUP_DISPLAY, DEDUP_COLLAPSE, DEDUP_OFF)
+DEFAULT_DEDUP_MODE = DEDUP_DISPLAY
+# A line repeats while its fingerprint came up less than this many seconds before
+DEFAULT_DEDUP_WINDOW = 60.0
+# Occurrences of a run that are still shown before the rest is collapsed
+DEFAULT_MIN_REPEATS = 3
+# Distinct fingerprints remembered; the least recently seen are forgotten first
+MAX_FINGERPRINTS = 5000
+FINGERPRINT_LENGTH = 300
+
+_UUID_RE = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+_HEX_RE = re.compile(r"\b0x[0-9a-fA-F]+\b|@[0-9a-fA-F]{4,}\b")
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+_LOGGER_RE = re.compile(r"^\[[^\]]+\] \[[^\]]+\] \[([^\]]*?)/?\]: ")
+# Lines other parts of the manager act on; never collapsed
+_KEEP_RE = re.compile(r"Can't keep up!|joined the game|left the game|Done \(")
+
+
+def normalize_message(text):
+    """Replace what differs between otherwise identical lines: numbers (including times and
+    coordinates), UUIDs and hex ids."""
+    return _NUMBER_RE.sub("#", _HEX_RE.sub("#", _UUID_RE.sub("<uuid>", text)))
+
+
+def line_source(text):
+    """The logger of a line, or its thread without numbers for layouts that have no logger."""
+    match = _LOGGER_RE.match(text)
+    if match and match.group(1):
+        return match.group(1)
+    thread, _ = parse_header(text)
+    return _NUMBER_RE.sub("#", thread) if thread else "unknown"
+
+
+class LogDeduplicator:
+    """Collapses log spam into one line with a repeat count.
+
+    Every server line is fingerprinted with its numbers, UUIDs and ids normalised away
+    (timestamps included). While lines with the same fingerprint keep coming less than
+    window seconds apart, the first min_repeats are shown and the rest are counted
+    instead. The counted repeats are reported as one summary line with the count and
+    the first and last time, when the run ends or every window seconds while it lasts.
+    Stack trace lines share the fate of the line they belong to. Per-fingerprint counts
+    are kept for all lines, so the noisiest messages and sources can be ranked.
+    """
+
+    def __init__(self, engine, emit, mode=DEFAULT_DEDUP_MODE, window=DEFAULT_DEDUP_WINDOW,
+                 min_repeats=DEFAULT_MIN_REPEATS):
+        self.engine = engine
+        self.emit = emit  # called with the summary lines
+        self.mode = mode
+        self.window = window
+        self.min_repeats = min_repeats
+        self.lines_seen = 0
+        self.lines_collapsed = 0
+        self._entries = OrderedDict()  # fingerprint -> entry, least recently seen first
+        self._pending = {}  # fingerprint -> entry with repeats not reported yet
+        self._collapsing = False  # whether the last headed line was a repeat
+        self._task = None
+        self._lock = threading.Lock()
+
+    def configure(self, mode, window, min_repeats):
+        self.mode = mode if mode in DEDUP_MODES else DEFAULT_DEDUP_MODE
+        self.window = max(1.0, float(window))
+        self.min_repeats = max(1, int(min_repeats))
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+            self.lines_seen = 0
+            self.lines_collapsed = 0
+            self._collapsing = False
+
+    def classify(self, texts, now=None, allow=True):
+        """Indexes of the lines in texts that are repeats to leave out. With allow False
+        (while booting or while a command collects its reply) lines are only counted."""
+        now = time.time() if now is None else now
+        repeats = []
+        with self._lock:
+            for index, text in enumerate(texts):
+                if text[:1] in (" ", "\t") or text.startswith("Caused by: "):
+                    # Continuation of the line before, such as a stack frame
+                    if self._collapsing:
+                        repeats.append(index)
+                    continue
+                self.lines_seen += 1
+                entry = self._count(text, now)
+                self._collapsing = entry["run"] > self.min_repeats and allow and not _KEEP_RE.search(text)
+                if self._collapsing:
+                    self._collapse(entry, now)
+                    repeats.append(index)
+            self.lines_collapsed += len(repeats)
+        return repeats
+
+    def _count(self, text, now):
+        """Count a line and return its entry; entry["run"] is its place in the current run."""
+        fingerprint = normalize_message(text)[:FINGERPRINT_LENGTH]
+        entry = self._entries.get(fingerprint)
+        if entry is None:
+            entry = self._entries[fingerprint] = {
+                "fingerprint": fingerprint, "sample": text, "source": line_source(text),
+                "level": parse_header(text)[1], "count": 0, "collapsed": 0, "first": now, "last": now,
+                "run": 0, "pending": 0, "pending_first": None, "pending_last": None, "reported": now,
+            }
+            if len(self._entries) > MAX_FINGERPRINTS:
+                _, oldest = self._entries.popitem(last=False)
+                if oldest["pending"]:
+                    self._pending[oldest["fingerprint"]] = oldest
+        else:
+            self._entries.move_to_end(fingerprint)
+        if now - entry["last"] > self.window:
+            entry["run"] = 0
+        entry["count"] += 1
+        entry["run"] += 1
+        entry["last"] = now
+        return entry
+
+    def _collapse(self, entry, now):
+        entry["collapsed"] += 1
+        if not entry["pending"]:
+            entry["pending_first"] = now
+            entry["reported"] = now
+            self._pending[entry["fingerprint"]] = entry
+        entry["pending"] += 1
+        entry["pending_last"] = now
+
+    def flush(self, now=None, everything=False):
+        """Summary lines for the runs that ended or were last reported a window ago."""
+        now = time.time() if now is None else now
+        summaries = []
+        with self._lock:
+            for fingerprint, entry in list(self._pending.items()):
+                if not everything and now - entry["last"] < self.window and now - entry["reported"] < self.window:
+                    continue
+                first = time.strftime("%H:%M:%S", time.localtime(entry["pending_first"]))
+                last = time.strftime("%H:%M:%S", time.localtime(entry["pending_last"]))
+                summaries.append(f"Repeated {entry['pending']} more times ({first} - {last}): {entry['sample']}")
+                entry["pending"] = 0
+                entry["reported"] = now
+                del self._pending[fingerprint]
+        return summaries
+
+    # Runs on the event loop
+
+    def start(self):
+        """Report collapsed runs every few seconds, also when the server has gone quiet."""
+        self.stop()
+        self._task = self.engine.loop.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        summaries = self.flush(everything=True)
+        if summaries:
+            self.emit(summaries)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(min(5.0, self.window / 4))
+            summaries = self.flush()
+            if summaries:
+                self.emit(summaries)
+
+    # Safe from any thread
+
+    def top_spammers(self, limit=10, by="message", seconds=None):
+        """The most frequent messages (or sources: loggers, or threads without a logger)."""
+        now = time.time()
+        since = now - seconds if seconds else 0.0
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values() if entry["last"] >= since]
+        if by == "source":
+            groups = {}
+            for entry in entries:
+                group = groups.setdefault(entry["source"], {"source": entry["source"], "count": 0, "collapsed": 0,
+                                                            "messages": 0, "first": entry["first"],
+                                                            "last": entry["last"], "top_message": entry["sample"],
+                                                            "_top": 0})
+                group["count"] += entry["count"]
+                group["collapsed"] += entry["collapsed"]
+                group["messages"] += 1
+                group["first"] = min(group["first"], entry["first"])
+                group["last"] = max(group["last"], entry["last"])
+                if entry["count"] > group["_top"]:
+                    group["top_message"], group["_top"] = entry["sample"], entry["count"]
+            entries = [{key: value for key, value in group.items() if key != "_top"} for group in groups.values()]
+        else:
+            entries = [{key: entry[key] for key in ("sample", "source", "level", "count", "collapsed", "first", "last")}
+                       for entry in entries]
+        entries.sort(key=lambda entry: -entry["count"])
+        for entry in entries[:limit]:
+            # Per minute over the time the message was seen, but at least a minute
+            entry["per_minute"] = round(entry["count"] * 60 / max(60.0, entry["last"] - entry["first"]), 1)
+        return entries[:limit]
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "window_seconds": self.window,
+            "min_repeats": self.min_repeats,
+            "lines_seen": self.lines_seen,
+            "lines_collapsed": self.lines_collapsed,
+            "distinct_messages": len(self._entries),
+            "pending_summaries": len(self._pending),
+        }
@@ -0,0 +1,241 @@
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from itertools import islice
+
+_TOKEN_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_$]{2,}")
+
+# Lines with more distinct tokens than this are not token-indexed and stay candidates for every text query
+MAX_TOKENS_PER_LINE = 24
+# Drop evicted entries from the posting lists every this many added lines
+PRUNE_INTERVAL = 8192
+# Candidate lines fetched from the store per lock acquisition while searching
+SEARCH_BATCH = 512
+
+
+def tokenize(text):
+    return {token.lower() for token in _TOKEN_RE.findall(text)}
+
+
+def compile_matcher(query, regex=False, case_sensitive=False):
+    """Return a predicate testing a line against a substring or regex query."""
+    if not query:
+        return lambda text: True
+    if regex:
+        pattern = re.compile(query, 0 if case_sensitive else re.IGNORECASE)
+        return lambda text: pattern.search(text) is not None
+    if case_sensitive:
+        return lambda text: query in text
+    needle = query.lower()
+    return lambda text: needle in text.lower()
+
+
+class _Postings:
+    """Sorted sequence numbers in a compact array; evicted entries are skipped by an offset."""
+
+    __slots__ = ("seqs", "start")
+
+    def __init__(self):
+        self.seqs = array("q")
+        self.start = 0
+
+    def prune(self, first_seq):
+        self.start = bisect_left(self.seqs, first_seq, self.start)
+        # Compact once more than half of the array is dead
+        if self.start > 1024 and self.start * 2 > len(self.seqs):
+            del self.seqs[:self.start]
+            self.start = 0
+
+    def __len__(self):
+        return len(self.seqs) - self.start
+
+    def __contains__(self, seq):
+        i = bisect_left(self.seqs, seq, self.start)
+        return i < len(self.seqs) and self.seqs[i] == seq
+
+    def between(self, first_seq, last_seq):
+        seqs = self.seqs
+        low = bisect_left(seqs, first_seq, self.start)
+        high = bisect_left(seqs, last_seq + 1, low)
+        return seqs[low:high]
+
+
+class LogIndex:
+    """Incrementally maintained search index over a LogStore.
+
+    Keeps posting lists of sequence numbers per log level, per thread and per token.
+    A query is a set of constraints, each satisfied by any of a few posting lists.
+    Only the cheapest constraint is expanded into candidate lines; the others are
+    checked by binary search, so the cost follows the number of candidates rather
+    than the number of retained lines. Entries for evicted lines are skipped at
+    query time and pruned every PRUNE_INTERVAL added lines.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._levels = {}
+        self._threads = {}
+        self._tokens = {}
+        # Lines with too many tokens to index; every token query has to look at them
+        self._unindexed = _Postings()
+        self._lock = threading.Lock()
+        self._since_prune = 0
+
+    def add(self, lines):
+        """Index a batch of ParsedLines from the LogParser."""
+        with self._lock:
+            for line in lines:
+                seq = line.seq
+                thread, level = line.thread, line.level
+                if level:
+                    self._posting(self._levels, level).seqs.append(seq)
+                if thread:
+                    self._posting(self._threads, thread).seqs.append(seq)
+                tokens = tokenize(line.text)
+                if len(tokens) > MAX_TOKENS_PER_LINE:
+                    self._unindexed.seqs.append(seq)
+                    continue
+                for token in tokens:
+                    self._posting(self._tokens, token).seqs.append(seq)
+            self._since_prune += len(lines)
+            if self._since_prune >= PRUNE_INTERVAL:
+                self._prune()
+
+    @staticmethod
+    def _posting(table, key):
+        posting = table.get(key)
+        if posting is None:
+            posting = table[key] = _Postings()
+        return posting
+
+    def _prune(self):
+        self._since_prune = 0
+        first_seq = self.store.first_seq
+        self._unindexed.prune(first_seq)
+        for table in (self._levels, self._threads, self._tokens):
+            for key in list(table):
+                posting = table[key]
+                posting.prune(first_seq)
+                if not len(posting):
+                    del table[key]
+
+    def clear(self):
+        with self._lock:
+            self._levels.clear()
+            self._threads.clear()
+            self._tokens.clear()
+            self._unindexed = _Postings()
+            self._since_prune = 0
+
+    @staticmethod
+    def _matching(table, names, exact):
+        """Posting lists whose key matches one of the comma-separated names."""
+        names = [name.strip().lower() for name in names.split(",") if name.strip()]
+        return [posting for key, posting in table.items()
+                if any(key.lower() == name if exact else name in key.lower() for name in names)]
+
+    def _token_constraints(self, query):
+        """One constraint (a list of posting lists) per token of a substring query.
+
+        Interior tokens of the query must appear as whole tokens in a matching line.
+        The first and last token may be cut off, so they match any indexed token that
+        ends / starts with them (or contains it, if the query is a single token).
+        """
+        constraints = []
+        for match in _TOKEN_RE.finditer(query):
+            token = match.group().lower()
+            open_left = match.start() == 0
+            open_right = match.end() == len(query)
+            if not open_left and not open_right:
+                postings = [self._tokens[token]] if token in self._tokens else []
+            elif open_left and open_right:
+                postings = [p for key, p in self._tokens.items() if token in key]
+            elif open_left:
+                postings = [p for key, p in self._tokens.items() if key.endswith(token)]
+            else:
+                postings = [p for key, p in self._tokens.items() if key.startswith(token)]
+            constraints.append(postings + [self._unindexed])
+        return constraints
+
+    def _candidates(self, constraints, first_seq, last_seq):
+        """Sequence numbers in [first_seq, last_seq] satisfying every constraint, newest first."""
+        if not constraints:
+            yield from range(last_seq, first_seq - 1, -1)
+            return
+        constraints.sort(key=lambda postings: sum(len(p) for p in postings))
+        cheapest, rest = constraints[0], constraints[1:]
+        if len(cheapest) == 1:
+            seqs = cheapest[0].between(first_seq, last_seq)
+        else:
+            seqs = sorted(set().union(*(p.between(first_seq, last_seq) for p in cheapest)))
+        for seq in reversed(seqs):
+            if all(any(seq in p for p in postings) for postings in rest):
+                yield seq
+
+    def search(self, query="", regex=False, level=None, thread=None, since=None, until=None,
+               limit=100, context=0, case_sensitive=False):
+        """Find retained lines matching all given filters, newest first.
+
+        level and thread accept comma-separated names (thread names match by substring).
+        since/until are Unix timestamps. context adds that many lines before and after
+        each hit. Returns a dict with the hits and some query statistics.
+        """
+        started = time.perf_counter()
+        matcher = compile_matcher(query, regex, case_sensitive)
+        first_seq, last_seq = self.store.first_seq, self.store.last_seq
+        if since is not None:
+            first_seq = max(first_seq, self.store.seq_at_time(since))
+        if until is not None:
+            last_seq = min(last_seq, self.store.seq_at_time(until) - 1)
+
+        hits = []
+        scanned = 0
+        with self._lock:
+            constraints = []
+            if level:
+                constraints.append(self._matching(self._levels, level, True))
+            if thread:
+                constraints.append(self._matching(self._threads, thread, False))
+            if query and not regex:
+                constraints.extend(self._token_constraints(query))
+            candidates = self._candidates(constraints, first_seq, last_seq)
+            # Candidates are produced lazily, so a query stops as soon as it has enough hits
+            while len(hits) < limit:
+                wanted = max(16, min(SEARCH_BATCH, (limit - len(hits)) * 4))
+                batch = list(islice(candidates, wanted))
+                if not batch:
+                    break
+                scanned += len(batch)
+                for record in self.store.get_many(batch):
+                    if record is not None and matcher(record.text):
+                        hits.append(record)
+                        if len(hits) >= limit:
+                            break
+
+        matches = []
+        for record in hits:
+            hit = {"seq": record.seq, "timestamp": record.timestamp, "text": record.text}
+            if context:
+                seq = record.seq
+                hit["before"] = [r.text for r in self.store.get_many(range(seq - context, seq)) if r]
+                hit["after"] = [r.text for r in self.store.get_many(range(seq + 1, seq + context + 1)) if r]
+            matches.append(hit)
+        return {
+            "matches": matches,
+            "truncated": len(matches) >= limit,
+            "scanned": scanned,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "levels": len(self._levels),
+                "threads": len(self._threads),
+                "tokens": len(self._tokens),
+                "unindexed_lines": len(self._unindexed),
+                "postings": sum(len(p) for table in (self._levels, self._threads, self._tokens)
+                                for p in table.values()),
+            }
@@ -0,0 +1,190 @@
+import re
+import threading
+from collections import Counter, deque, namedtuple
+
+# One output line split into its header fields. Lines without a recognised header only have a message.
+ParsedLine = namedtuple("ParsedLine", ["seq", "timestamp", "time", "thread", "level", "logger", "message", "text"])
+# Something worth knowing about that was recognised in the output
+LogEvent = namedtuple("LogEvent", ["seq", "timestamp", "kind", "data"])
+
+# Covers the common header layouts:
+#   vanilla  [12:34:56] [Server thread/INFO]: message
+#   Forge    [12:34:56] [Server thread/INFO] [minecraft/DedicatedServer]: message
+#   Forge    [17Oct2026 12:34:56.789] [Server thread/INFO] [net.minecraft.server.MinecraftServer/]: message
+#   Paper    [12:34:56 INFO]: message
+_HEADER_RE = re.compile(
+    r"^\[(?:\d\d[A-Za-z]{3}\d{4} )?(?P<time>\d\d:\d\d:\d\d)(?:\.\d+)?(?: (?P<plevel>[A-Z]+))?\]"
+    r"(?: \[(?P<thread>[^\]]+)/(?P<level>[A-Z]+)\])?"
+    r"(?: \[(?P<logger>[^\]]*)\])?: (?P<message>.*)$"
+)
+
+# Cheap literal triggers, matched once per line. Only the handler of the trigger that
+# fired runs its (more expensive) regex, instead of trying every event regex on every line.
+_TRIGGER_RE = re.compile(
+    r"(?P<lag>Can't keep up!)"
+    r"|(?P<join>joined the game)"
+    r"|(?P<leave>left the game)"
+    r"|(?P<done>Done \()"
+    r"|(?P<exception>Exception|Error|Throwable)"
+)
+_LAG_RE = re.compile(r"Running (\d+)ms or (\d+) ticks behind")
+_JOIN_RE = re.compile(r"^(\S+?)(?:\[[^\]]*\])? joined the game")
+_LEAVE_RE = re.compile(r"^(\S+?) left the game")
+_DONE_RE = re.compile(r"Done \((\d+(?:[.,]\d+)?)s\)!")
+_EXCEPTION_RE = re.compile(
+    r"^(?:Exception in thread \"[^\"]*\" )?(?:Caused by: )?"
+    r"((?:[A-Za-z_$][\w$]*\.)+[\w$]*(?:Exception|Error|Throwable))(?::\s*(.*))?$"
+)
+_FRAME_RE = re.compile(r"^\s+(?:at .+|\.\.\. \d+ more)$")
+
+# Keep at most this many stack frames per exception event
+MAX_FRAMES = 40
+RECENT_EVENTS = 1000
+
+
+def parse_header(text):
+    """Return (thread, level) from a log line header, or (None, None)."""
+    match = _HEADER_RE.match(text)
+    if not match:
+        return None, None
+    return match.group("thread"), match.group("level") or match.group("plevel")
+
+
+class LogParser:
+    """Streaming parser for server output.
+
+    Splits each line into its header fields and recognises a few high-value events:
+    lag warnings, player joins/leaves, the "Done (Xs)!" startup line and exceptions
+    together with the stack frames that follow them. Event counters and the most recent
+    events are kept here; listeners are called for every new event.
+    """
+
+    def __init__(self, recent_events=RECENT_EVENTS):
+        self.counters = Counter()
+        self.recent = deque(maxlen=recent_events)
+        self.players_online = set()
+        self.last_lag = None
+        self.last_done = None
+        self._listeners = []
+        self._exception = None  # data of the exception whose stack trace is still being read
+        self._last_thread = None  # headerless lines (e.g. printed stack traces) belong to this thread
+        self._lock = threading.Lock()
+        self._handlers = {
+            "lag": self._on_lag,
+            "join": self._on_join,
+            "leave": self._on_leave,
+            "done": self._on_done,
+            "exception": self._on_exception,
+        }
+
+    def add_listener(self, callback):
+        """Call callback(event) for every recognised event."""
+        self._listeners.append(callback)
+
+    def feed(self, records):
+        """Parse a batch of LogRecords. Returns a ParsedLine per record."""
+        parsed = []
+        events = []
+        with self._lock:
+            for record in records:
+                text = record.text
+                match = _HEADER_RE.match(text)
+                if match:
+                    message = match.group("message")
+                    line = ParsedLine(record.seq, record.timestamp, match.group("time"), match.group("thread"),
+                                      match.group("level") or match.group("plevel"), match.group("logger"),
+                                      message, text)
+                    self._last_thread = line.thread or self._last_thread
+                else:
+                    message = text
+                    line = ParsedLine(record.seq, record.timestamp, None, None, None, None, text, text)
+                parsed.append(line)
+                if self._exception is not None:
+                    # Stack frames belong to the exception before them
+                    if _FRAME_RE.match(message):
+                        frames = self._exception["frames"]
+                        if len(frames) < MAX_FRAMES:
+                            frames.append(message.strip())
+                        continue
+                    if not message.startswith("Caused by: "):
+                        self._exception = None
+                trigger = _TRIGGER_RE.search(message)
+                if trigger:
+                    event = self._handlers[trigger.lastgroup](line, message)
+                    if event is not None:
+                        self.counters[event.kind] += 1
+                        self.recent.append(event)
+                        events.append(event)
+        for event in events:
+            for callback in self._listeners:
+                callback(event)
+        return parsed
+
+    def _on_lag(self, line, message):
+        match = _LAG_RE.search(message)
+        data = {"behind_ms": int(match.group(1)), "ticks": int(match.group(2))} if match else {}
+        self.last_lag = LogEvent(line.seq, line.timestamp, "lag", data)
+        return self.last_lag
+
+    def _on_join(self, line, message):
+        match = _JOIN_RE.match(message)
+        if not match:
+            return None
+        self.players_online.add(match.group(1))
+        return LogEvent(line.seq, line.timestamp, "join", {"player": match.group(1)})
+
+    def _on_leave(self, line, message):
+        match = _LEAVE_RE.match(message)
+        if not match:
+            return None
+        self.players_online.discard(match.group(1))
+        return LogEvent(line.seq, line.timestamp, "leave", {"player": match.group(1)})
+
+    def _on_done(self, line, message):
+        match = _DONE_RE.search(message)
+        if not match:
+            return None
+        # A finished startup means nobody from a previous run is online any more
+        self.players_online.clear()
+        self.last_done = LogEvent(line.seq, line.timestamp, "done",
+                                  {"seconds": float(match.group(1).replace(",", "."))})
+        return self.last_done
+
+    def _on_exception(self, line, message):
+        match = _EXCEPTION_RE.match(message)
+        if not match:
+            return None
+        if message.startswith("Caused by: ") and self._exception is not None:
+            # Part of the trace that is already being collected
+            self._exception["caused_by"].append(match.group(1))
+            return None
+        self._exception = {"exception": match.group(1), "message": match.group(2) or "",
+                           "thread": line.thread or self._last_thread, "frames": [], "caused_by": []}
+        return LogEvent(line.seq, line.timestamp, "exception", self._exception)
+
+    def reset(self):
+        """Forget state from a previous server run. Counters keep accumulating."""
+        with self._lock:
+            self.players_online.clear()
+            self._exception = None
+
+    def recent_events(self, kind=None, limit=50, since_seq=None):
+        """Return the newest events (optionally of one kind, or only those from lines after
+        since_seq) as plain dicts, oldest first."""
+        with self._lock:
+            events = [event for event in self.recent
+                      if (kind is None or event.kind == kind) and (since_seq is None or event.seq > since_seq)][-limit:]
+            # Copy while locked: an exception's frames are still appended by feed()
+            return [dict(seq=event.seq, timestamp=event.timestamp, kind=event.kind,
+                         **{key: list(value) if isinstance(value, list) else value
+                            for key, value in event.data.items()})
+                    for event in events]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "players_online": sorted(self.players_online),
+                "last_lag": self.last_lag._asdict() if self.last_lag else None,
+                "last_done": self.last_done._asdict() if self.last_done else None,
+            }
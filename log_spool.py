@@ -0,0 +1,435 @@
+import mmap
+import os
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+from log_store import LogRecord
+
+DEFAULT_SEGMENT_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # compressed segments kept on disk
+# Closed segments are compressed in independent blocks of about this much text
+BLOCK_SIZE = 64 * 1024
+# The active segment gets a sparse index entry every this many bytes
+INDEX_INTERVAL = 64 * 1024
+# Pending lines are written at least this often, or as soon as this many are waiting
+FLUSH_INTERVAL = 0.5
+FLUSH_LINES = 5000
+# Lines queued while the disk can't keep up (or fails); the oldest are dropped beyond this
+MAX_PENDING_LINES = 100000
+
+ACTIVE_SUFFIX = ".log"
+SEGMENT_SUFFIX = ".zlog"
+INDEX_SUFFIX = ".zidx"
+# Appended to the source field of hidden records
+HIDDEN_MARK = "*"
+
+
+def encode_records(records):
+    """Spool lines for records: seq, timestamp, source and text separated by tabs.
+
+    Lines never contain a newline, and the text is the last field, so tabs in it are
+    harmless. A hidden record has HIDDEN_MARK after its source. A batch shares one
+    timestamp, so that part is only formatted once.
+    """
+    lines = []
+    last = None
+    for seq, timestamp, text, source, hidden in records:
+        if (timestamp, source, hidden) != last:
+            last = (timestamp, source, hidden)
+            middle = f"\t{timestamp:.6f}\t{source}{HIDDEN_MARK if hidden else ''}\t"
+        lines.append(f"{seq}{middle}{text}\n".encode("utf-8", errors="replace"))
+    return lines
+
+
+def edge_records(data):
+    """First and last record of a block of complete lines, without parsing the rest."""
+    first = decode_lines(data[:data.find(b"\n") + 1])
+    last = decode_lines(data[data.rfind(b"\n", 0, len(data) - 1) + 1:])
+    return (first[0], last[-1]) if first and last else None
+
+
+def decode_lines(data):
+    """Parse spooled lines back into LogRecords."""
+    records = []
+    for line in data.decode("utf-8", errors="replace").split("\n"):
+        parts = line.split("\t", 3)
+        if len(parts) == 4:
+            try:
+                source = parts[2]
+                hidden = source.endswith(HIDDEN_MARK)
+                if hidden:
+                    source = source[:-len(HIDDEN_MARK)]
+                records.append(LogRecord(int(parts[0]), float(parts[1]), parts[3], source, hidden))
+            except ValueError:
+                pass  # torn line from a crash
+    return records
+
+
+class Segment:
+    """One spool file. Closed segments are zlib blocks plus an index of
+    (first_seq, first_timestamp_us, offset, length) per block; the active one is plain text."""
+
+    def __init__(self, base, active=False):
+        self.base = base
+        self.active = active
+        self.index = array("q")
+        self.first_seq = self.last_seq = 0
+        self.first_time = self.last_time = 0.0
+        self.size = 0
+
+    @property
+    def path(self):
+        return self.base + (ACTIVE_SUFFIX if self.active else SEGMENT_SUFFIX)
+
+    def add_index(self, seq, timestamp, offset, length=0):
+        self.index.extend((seq, int(timestamp * 1e6), offset, length))
+
+    def entries(self):
+        index = self.index
+        return [tuple(index[i:i + 4]) for i in range(0, len(index), 4)]
+
+    def load_index(self):
+        index = array("q")
+        with open(self.base + INDEX_SUFFIX, "rb") as f:
+            index.frombytes(f.read())
+        # The last entry is a sentinel holding the segment's last seq and timestamp
+        self.index = index[:-4]
+        self.first_seq, self.first_time = index[0], index[1] / 1e6
+        self.last_seq, self.last_time = index[-4], index[-3] / 1e6
+        self.size = os.path.getsize(self.path)
+
+    def covers(self, since_seq, since, until):
+        if since_seq is not None and self.last_seq <= since_seq:
+            return False
+        if since is not None and self.last_time < since:
+            return False
+        if until is not None and self.first_time > until:
+            return False
+        return True
+
+    def start_entry(self, since_seq, since):
+        """Position of the last index entry that starts at or before the requested position."""
+        entries = self.entries()
+        position = 0
+        if since_seq is not None:
+            position = max(position, bisect_right([e[0] for e in entries], since_seq + 1) - 1)
+        if since is not None:
+            # Several blocks can start at the same timestamp, so start before the first of them
+            position = max(position, bisect_left([e[1] for e in entries], int(since * 1e6)) - 1)
+        return max(0, position)
+
+    def blocks(self, since_seq, since):
+        """Yield the raw text of the blocks from the requested position on, read through mmap."""
+        if not self.size:
+            return
+        entries = self.entries()
+        if not entries:
+            return
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            start = self.start_entry(since_seq, since)
+            if self.active:
+                # Plain text: index entries are seek points at line starts
+                offsets = [entry[2] for entry in entries[start:]] + [self.size]
+                for offset, end in zip(offsets, offsets[1:]):
+                    yield view[offset:end]
+                return
+            for _, _, offset, length in entries[start:]:
+                yield zlib.decompress(view[offset:offset + length])
+
+
+class SpoolWriter:
+    """Background thread that writes the queued lines of any number of spools.
+
+    It sleeps until a spool gets lines, then gives the batch up to FLUSH_INTERVAL to
+    grow (less if FLUSH_LINES are waiting) and flushes every spool in one pass.
+    """
+
+    def __init__(self):
+        self._spools = []
+        self._changed = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="log-spool", daemon=True)
+        self._thread.start()
+
+    def add(self, spool):
+        with self._changed:
+            self._spools.append(spool)
+
+    def remove(self, spool):
+        with self._changed:
+            if spool in self._spools:
+                self._spools.remove(spool)
+
+    def wake(self):
+        with self._changed:
+            self._changed.notify()
+
+    def _run(self):
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: any(spool._pending for spool in self._spools))
+                self._changed.wait_for(
+                    lambda: any(len(spool._pending) >= FLUSH_LINES for spool in self._spools), FLUSH_INTERVAL)
+                spools = list(self._spools)
+            for spool in spools:
+                # One spool failing must not stop the writer for the others
+                try:
+                    spool.flush()
+                except Exception as e:
+                    spool.write_failed(e)
+
+
+class LogSpool:
+    """Segmented on-disk copy of every ingested output line.
+
+    Lines are queued by append() and written in batches by a SpoolWriter thread
+    (shared between spools if one is passed in), so the ingest path only pays for a
+    list extend. The active segment is plain text;
+    once it exceeds segment_bytes it is compressed into independent zlib blocks with
+    a sparse seq/timestamp index, which lets read() decompress only the blocks a
+    query touches. Files are read through mmap rather than loaded whole.
+    """
+
+    def __init__(self, directory, segment_bytes=DEFAULT_SEGMENT_BYTES, max_bytes=DEFAULT_MAX_BYTES, writer=None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.segments = []
+        self.active = None
+        self._file = None
+        self._pending = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.RLock()
+        self.lines_written = 0
+        self.batches_written = 0
+        self.write_seconds = 0.0
+        self.lines_dropped = 0
+        self.write_errors = 0
+        self.last_error = None
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+        self.writer = writer or SpoolWriter()
+        self.writer.add(self)
+
+    @property
+    def last_seq(self):
+        """Newest sequence number on disk (0 for an empty spool)."""
+        segments = self.segments + ([self.active] if self.active and self.active.last_seq else [])
+        return segments[-1].last_seq if segments else 0
+
+    def configure(self, segment_bytes=None, max_bytes=None):
+        if segment_bytes:
+            self.segment_bytes = int(segment_bytes)
+        if max_bytes:
+            self.max_bytes = int(max_bytes)
+
+    # Opening and rotation
+
+    def _open(self):
+        names = sorted(os.listdir(self.directory))
+        for name in names:
+            base = os.path.join(self.directory, os.path.splitext(name)[0])
+            if name.endswith(ACTIVE_SUFFIX):
+                # Left over from a run that did not shut down cleanly
+                self._compress(base)
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(SEGMENT_SUFFIX):
+                segment = Segment(os.path.join(self.directory, name[:-len(SEGMENT_SUFFIX)]))
+                try:
+                    segment.load_index()
+                except (OSError, IndexError):
+                    continue
+                self.segments.append(segment)
+
+    def _new_active(self, record):
+        segment = Segment(os.path.join(self.directory, f"{record.seq:012d}"), active=True)
+        segment.first_seq, segment.first_time = record.seq, record.timestamp
+        self._file = open(segment.path, "ab")
+        self.active = segment
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        segment = self._compress(self.active.base)
+        self.active = None
+        if segment:
+            self.segments.append(segment)
+        total = sum(s.size for s in self.segments)
+        while len(self.segments) > 1 and total > self.max_bytes:
+            oldest = self.segments.pop(0)
+            total -= oldest.size
+            for suffix in (SEGMENT_SUFFIX, INDEX_SUFFIX):
+                try:
+                    os.remove(oldest.base + suffix)
+                except OSError:
+                    pass
+
+    def _compress(self, base):
+        """Turn a plain segment into zlib blocks plus index, then delete the plain file."""
+        with open(base + ACTIVE_SUFFIX, "rb") as f:
+            data = f.read()
+        segment = Segment(base)
+        offset = 0
+        with open(base + SEGMENT_SUFFIX, "wb") as out:
+            start = 0
+            while start < len(data):
+                end = data.find(b"\n", start + BLOCK_SIZE)
+                end = len(data) if end < 0 else end + 1
+                edges = edge_records(data[start:end])
+                if edges:
+                    first, last = edges
+                    block = zlib.compress(data[start:end], 6)
+                    out.write(block)
+                    segment.add_index(first.seq, first.timestamp, offset, len(block))
+                    segment.last_seq, segment.last_time = last.seq, last.timestamp
+                    offset += len(block)
+                start = end
+        if not segment.index:
+            os.remove(base + SEGMENT_SUFFIX)
+            os.remove(base + ACTIVE_SUFFIX)
+            return None
+        index = array("q", segment.index)
+        index.extend((segment.last_seq, int(segment.last_time * 1e6), offset, 0))
+        with open(base + INDEX_SUFFIX, "wb") as f:
+            f.write(index.tobytes())
+        os.remove(base + ACTIVE_SUFFIX)
+        segment.load_index()
+        return segment
+
+    # Writing
+
+    def append(self, records):
+        """Queue records for writing. Cheap; the disk work happens on the spool thread."""
+        with self._lock:
+            was_empty = not self._pending
+            self._pending.extend(records)
+            pending = len(self._pending)
+            if pending > MAX_PENDING_LINES:
+                # The writer is stuck or failing: keep the memory bounded, lose the oldest
+                del self._pending[:pending - MAX_PENDING_LINES]
+                self.lines_dropped += pending - MAX_PENDING_LINES
+        # The writer only needs a nudge to start a batch or to cut one short
+        if was_empty or pending >= FLUSH_LINES:
+            self.writer.wake()
+
+    def flush(self):
+        """Write everything queued so far. If writing fails (disk full, directory gone) the
+        batch is dropped and counted, and the next batch starts a new segment."""
+        with self._io_lock:
+            with self._lock:
+                records, self._pending = self._pending, []
+            if not records:
+                return
+            try:
+                self._write(records)
+            except Exception as e:
+                self.write_failed(e, len(records))
+
+    def write_failed(self, error, lines=0):
+        """Count a failed write of lines and drop the active segment, whose state is unknown.
+        Its file is compressed the next time the spool is opened."""
+        with self._io_lock:
+            self.write_errors += 1
+            self.lines_dropped += lines
+            self.last_error = f"{type(error).__name__}: {error}"
+            if self._file:
+                try:
+                    self._file.close()
+                except OSError:
+                    pass
+            self._file = None
+            self.active = None
+
+    def _write(self, records):
+        started = time.perf_counter()
+        lines = encode_records(records)
+        # ends[k] is the byte count of lines[:k], so positions are found by bisection
+        # instead of a Python loop over every line
+        ends = list(accumulate(map(len, lines), initial=0))
+        count = len(lines)
+        pos = 0
+        while pos < count:
+            if self.active is None:
+                self._new_active(records[pos])
+            segment = self.active
+            shift = segment.size - ends[pos]  # file offset of line k is ends[k] + shift
+            # Lines up to and including the one that fills the segment go into it
+            end = min(count, bisect_left(ends, self.segment_bytes - shift, pos + 1))
+            # Sparse index: the first line starting at or after each INDEX_INTERVAL boundary
+            mark = 0 if segment.size == 0 else (segment.size // INDEX_INTERVAL + 1) * INDEX_INTERVAL
+            k = pos
+            while True:
+                k = bisect_left(ends, mark - shift, k, end)
+                if k >= end:
+                    break
+                segment.add_index(records[k].seq, records[k].timestamp, ends[k] + shift)
+                mark = ((ends[k] + shift) // INDEX_INTERVAL + 1) * INDEX_INTERVAL
+                k += 1
+            self._file.write(b"".join(lines[pos:end]))
+            segment.size = ends[end] + shift
+            segment.last_seq, segment.last_time = records[end - 1].seq, records[end - 1].timestamp
+            if segment.size >= self.segment_bytes:
+                self._rotate()
+            pos = end
+        if self._file:
+            self._file.flush()
+        self.lines_written += len(records)
+        self.batches_written += 1
+        self.write_seconds += time.perf_counter() - started
+
+    def close(self):
+        """Write what is pending and compress the active segment."""
+        self.writer.remove(self)
+        self.flush()
+        with self._io_lock:
+            if self.active:
+                self._rotate()
+
+    # Reading
+
+    def read(self, since=None, until=None, since_seq=None, limit=1000):
+        """Return up to limit spooled records after since_seq and between the since/until
+        timestamps, oldest first, and whether more were available."""
+        self.flush()
+        result = []
+        with self._io_lock:
+            segments = self.segments + ([self.active] if self.active else [])
+            for segment in segments:
+                if not segment.covers(since_seq, since, until):
+                    continue
+                for block in segment.blocks(since_seq, since):
+                    for record in decode_lines(block):
+                        if since_seq is not None and record.seq <= since_seq:
+                            continue
+                        if since is not None and record.timestamp < since:
+                            continue
+                        if until is not None and record.timestamp > until:
+                            return result, False
+                        if len(result) >= limit:
+                            return result, True
+                        result.append(record)
+        return result, False
+
+    def pending(self):
+        """Lines queued for the writer thread."""
+        return len(self._pending)
+
+    def stats(self):
+        with self._io_lock:
+            segments = self.segments + ([self.active] if self.active else [])
+            return {
+                "segments": len(segments),
+                "disk_bytes": sum(s.size for s in segments),
+                "first_seq": segments[0].first_seq if segments else 0,
+                "last_seq": self.last_seq,
+                "lines_written": self.lines_written,
+                "batches_written": self.batches_written,
+                "write_ms": round(self.write_seconds * 1000, 1),
+                "pending": len(self._pending),
+                "lines_dropped": self.lines_dropped,
+                "write_errors": self.write_errors,
+                "last_error": self.last_error,
+            }
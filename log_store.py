@@ -0,0 +1,213 @@
+import threading
+import time
+from collections import namedtuple
+
+# Where a line came from: the server process itself or the manager's own messages
+SOURCE_SERVER = "server"
+SOURCE_MANAGER = "manager"
+
+# One retained output line. Kept as a plain tuple so a few hundred thousand of them stay cheap.
+# hidden lines (collapsed repeats, probe replies) are kept and searchable, but not shown.
+LogRecord = namedtuple("LogRecord", ["seq", "timestamp", "text", "source", "hidden"],
+                       defaults=(SOURCE_SERVER, False))
+
+# Rough per-record cost on top of the text itself (tuple, float, int and str headers)
+RECORD_OVERHEAD = 160
+
+DEFAULT_MAX_LINES = 100000
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def format_record(record):
+    """Format a record the way it is shown in the output area."""
+    return f"[{time.strftime('%H:%M:%S', time.localtime(record.timestamp))}] {record.text}"
+
+
+class LogStore:
+    """Bounded ring buffer holding the server output.
+
+    Every line gets a monotonically increasing sequence number. When either the line
+    budget or the byte budget is exceeded the oldest lines are evicted, so memory use
+    stays flat no matter how long the server has been running. Records live in a
+    preallocated circular list, so looking one up by sequence number is O(1).
+    first_seq lets numbering continue from an earlier run (see LogSpool).
+    """
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, max_bytes=DEFAULT_MAX_BYTES, first_seq=1):
+        self.max_bytes = max(RECORD_OVERHEAD, int(max_bytes))
+        self._ring = [None] * max(1, int(max_lines))
+        self._head = 0  # ring slot of the oldest record
+        self._count = 0
+        self._bytes = 0
+        self._next_seq = first_seq
+        self._evicted = 0
+        self._lock = threading.Lock()
+        # Notified whenever lines are added, for readers waiting on new output
+        self._appended = threading.Condition(self._lock)
+
+    @property
+    def max_lines(self):
+        return len(self._ring)
+
+    def resize(self, max_lines=None, max_bytes=None):
+        """Change the budgets, keeping the newest lines that still fit."""
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max(RECORD_OVERHEAD, int(max_bytes))
+            if max_lines is not None and int(max_lines) != len(self._ring):
+                records = self._ordered()
+                self._ring = [None] * max(1, int(max_lines))
+                self._head, self._count, self._bytes = 0, 0, 0
+                for record in records[-len(self._ring):]:
+                    self._ring[self._count] = record
+                    self._count += 1
+                    self._bytes += len(record.text) + RECORD_OVERHEAD
+                self._evicted += len(records) - self._count
+            self._evict()
+
+    def append(self, text, timestamp=None, source=SOURCE_SERVER):
+        """Store a single line and return its record."""
+        return self.extend([text], timestamp, source)[0]
+
+    def extend(self, lines, timestamp=None, source=SOURCE_SERVER, hidden=()):
+        """Store a batch of lines under one lock acquisition and return their records.
+        hidden holds the indexes (in lines) of the lines to store as hidden."""
+        if timestamp is None:
+            timestamp = time.time()
+        hidden = set(hidden)
+        added = []
+        with self._lock:
+            ring = self._ring
+            capacity = len(ring)
+            seq = self._next_seq
+            for index, text in enumerate(lines):
+                record = LogRecord(seq, timestamp, text, source, index in hidden)
+                if self._count == capacity:
+                    # Full: overwrite the oldest slot
+                    old = ring[self._head]
+                    self._bytes -= len(old.text) + RECORD_OVERHEAD
+                    self._evicted += 1
+                    ring[self._head] = record
+                    self._head = (self._head + 1) % capacity
+                else:
+                    ring[(self._head + self._count) % capacity] = record
+                    self._count += 1
+                self._bytes += len(text) + RECORD_OVERHEAD
+                added.append(record)
+                seq += 1
+            self._next_seq = seq
+            self._evict()
+            self._appended.notify_all()
+        return added
+
+    def hide(self, records, seqs):
+        """Mark the records whose seq is in seqs as hidden, also where the store keeps them.
+        Returns records with those replaced."""
+        result = []
+        with self._lock:
+            first = self._first_seq()
+            for record in records:
+                if record.seq in seqs and not record.hidden:
+                    record = record._replace(hidden=True)
+                    index = record.seq - first
+                    if 0 <= index < self._count and self._at(index).seq == record.seq:
+                        self._ring[(self._head + index) % len(self._ring)] = record
+                result.append(record)
+        return result
+
+    def _evict(self):
+        ring = self._ring
+        while self._count and (self._count > len(ring) or self._bytes > self.max_bytes):
+            old = ring[self._head]
+            ring[self._head] = None
+            self._bytes -= len(old.text) + RECORD_OVERHEAD
+            self._head = (self._head + 1) % len(ring)
+            self._count -= 1
+            self._evicted += 1
+
+    def _first_seq(self):
+        return self._next_seq - self._count
+
+    def _at(self, index):
+        return self._ring[(self._head + index) % len(self._ring)]
+
+    def _ordered(self):
+        return [self._at(i) for i in range(self._count)]
+
+    @property
+    def first_seq(self):
+        """Sequence number of the oldest retained line (next_seq if the store is empty)."""
+        with self._lock:
+            return self._first_seq()
+
+    @property
+    def last_seq(self):
+        """Sequence number of the newest line ever stored (0 before the first line)."""
+        with self._lock:
+            return self._next_seq - 1
+
+    def wait_for(self, seq, timeout):
+        """Block until a line newer than seq exists or timeout expires. Returns the newest seq."""
+        with self._appended:
+            self._appended.wait_for(lambda: self._next_seq - 1 > seq, timeout)
+            return self._next_seq - 1
+
+    def get(self, seq):
+        """Return the record with the given sequence number, or None if it was evicted."""
+        with self._lock:
+            index = seq - self._first_seq()
+            if 0 <= index < self._count:
+                return self._at(index)
+            return None
+
+    def get_many(self, seqs):
+        """Look up several sequence numbers under one lock. Evicted ones come back as None."""
+        with self._lock:
+            first, count = self._first_seq(), self._count
+            return [self._at(seq - first) if 0 <= seq - first < count else None for seq in seqs]
+
+    def seq_at_time(self, timestamp):
+        """Return the sequence number of the first retained line stored at or after timestamp."""
+        with self._lock:
+            low, high = 0, self._count
+            while low < high:
+                mid = (low + high) // 2
+                if self._at(mid).timestamp < timestamp:
+                    low = mid + 1
+                else:
+                    high = mid
+            return self._first_seq() + low
+
+    def since(self, seq, limit=None):
+        """Return records with a sequence number greater than seq, oldest first."""
+        with self._lock:
+            start = max(0, seq + 1 - self._first_seq())
+            stop = self._count if limit is None else min(self._count, start + limit)
+            return [self._at(i) for i in range(start, stop)]
+
+    def snapshot(self):
+        """Return a list copy of every retained record."""
+        with self._lock:
+            return self._ordered()
+
+    def text(self):
+        """Return all retained lines formatted as they appear in the GUI (without hidden ones)."""
+        return "\n".join(format_record(record) for record in self.snapshot() if not record.hidden)
+
+    def clear(self):
+        """Drop all retained lines. Sequence numbers keep counting up."""
+        with self._lock:
+            self._ring = [None] * len(self._ring)
+            self._head, self._count, self._bytes = 0, 0, 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "lines": self._count,
+                "bytes": self._bytes,
+                "max_lines": len(self._ring),
+                "max_bytes": self.max_bytes,
+                "first_seq": self._first_seq(),
+                "last_seq": self._next_seq - 1,
+                "evicted": self._evicted,
+            }
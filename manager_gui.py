@@ -0,0 +1,808 @@
+import threading
+import time
+import re
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit, QPlainTextEdit, QFileDialog, QMessageBox,
+                              QGroupBox, QCheckBox, QComboBox, QTabWidget, QInputDialog)
+from PySide6.QtCore import Qt, QTimer, Signal, QPointF
+from PySide6.QtGui import QPainter, QPen, QColor
+
+from log_store import format_record
+from output_queue import OutputQueue, RateMeter
+from log_index import compile_matcher
+from log_parser import parse_header
+from server_lifecycle import STOPPED, STARTING, READY, STOPPING, CRASHED
+import jvm_tuning
+from history_analyzer import format_summary
+from instrumentation import StallDetector
+
+# Lines kept in the output widget and how often queued output is flushed to it
+MAX_DISPLAY_LINES = 5000
+OUTPUT_FLUSH_INTERVAL_MS = 50
+STATUS_COLORS = {STOPPED: "red", STARTING: "orange", READY: "green", STOPPING: "orange", CRASHED: "darkred"}
+
+
+class Sparkline(QWidget):
+    """Tiny line chart of the most recent values of one metric."""
+
+    def __init__(self, color="#2a82da"):
+        super().__init__()
+        self.values = []
+        self.color = QColor(color)
+        self.setMinimumHeight(28)
+
+    def set_values(self, values):
+        self.values = values
+        self.update()
+
+    def paintEvent(self, event):
+        if len(self.values) < 2:
+            return
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(QPen(self.color, 1.5))
+        low, high = min(self.values), max(self.values)
+        span = (high - low) or 1.0
+        width, height = self.width() - 2, self.height() - 4
+        step = width / (len(self.values) - 1)
+        points = [QPointF(1 + i * step, 2 + height - (value - low) / span * height)
+                  for i, value in enumerate(self.values)]
+        painter.drawPolyline(points)
+        painter.end()
+
+class ServerPanel(QWidget):
+    """Control panel for one ServerInstance, shown as a tab of the main window."""
+    output_signal = Signal()
+    state_signal = Signal(str, str)
+    clear_signal = Signal()
+    lag_signal = Signal(dict)
+    settings_signal = Signal()
+    history_signal = Signal(dict)
+    recommend_signal = Signal(dict)
+    launch_done_signal = Signal()
+
+    def __init__(self, server, supervisor=None):
+        super().__init__()
+        self.server = server
+        self.supervisor = supervisor
+        # Predicate applied to live output while the filter box is in use
+        self.display_filter = None
+        # Lines waiting to be rendered; flushed to the widget in batches by flush_timer
+        self.output_queue = OutputQueue(MAX_DISPLAY_LINES)
+        self.render_rate = RateMeter()
+        self.last_flush = 0.0
+        # When the oldest queued batch was queued, for the gui_wait stage
+        self.output_waiting_since = None
+        # A start or restart or a recommendation is checking Java on a worker thread
+        self.launching = False
+        self.recommending = False
+        self.server.instruments.gauge(f"{server.server_id}.gui_queue_records", self.output_queue.__len__)
+        self.init_ui()
+        self.flush_timer = QTimer()
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.timeout.connect(self._flush_output_gui)
+        self.output_signal.connect(self._schedule_output_flush)
+        self.state_signal.connect(self._on_state_gui)
+        self.clear_signal.connect(self._clear_output_gui)
+        self.lag_signal.connect(self._on_lag_report_gui)
+        self.settings_signal.connect(self.load_settings)
+        self.history_signal.connect(self._on_history_result)
+        self.recommend_signal.connect(self._on_recommendation)
+        self.launch_done_signal.connect(self._on_launch_done)
+        # Listeners run on the server's threads, so they only queue work and emit signals
+        self.server.add_output_listener(self._on_output)
+        self.server.add_state_listener(lambda state, detail: self.state_signal.emit(state, detail))
+        self.server.add_clear_listener(self.clear_signal.emit)
+        self.server.lag_correlator.add_listener(self.lag_signal.emit)
+        self.server.add_settings_listener(self.settings_signal.emit)
+        self.load_settings()
+        # Keep the server settings in sync with the UI, so starts requested over MCP use them too
+        for widget in (self.java_path_input, self.min_ram_input, self.max_ram_input, self.args_input):
+            widget.editingFinished.connect(self.apply_ui_settings)
+        self.nogui_checkbox.toggled.connect(self.apply_ui_settings)
+        self.gc_logging_checkbox.toggled.connect(self.apply_ui_settings)
+        self.console_mirror_checkbox.toggled.connect(self.apply_ui_settings)
+
+    def init_ui(self):
+        main_layout = QVBoxLayout()
+        self.setup_ui(main_layout)
+        self.setLayout(main_layout)
+        self.update_buttons()
+    
+    def setup_ui(self, main_layout):
+        # Server JAR file selection
+        jar_layout = QHBoxLayout()
+        jar_label = QLabel("Server JAR File:")
+        self.jar_input = QLineEdit()
+        self.jar_input.setReadOnly(True)
+        browse_jar_btn = QPushButton("Browse")
+        browse_jar_btn.clicked.connect(self.browse_jar_file)
+        jar_layout.addWidget(jar_label)
+        jar_layout.addWidget(self.jar_input)
+        jar_layout.addWidget(browse_jar_btn)
+        main_layout.addLayout(jar_layout)
+        
+        # Java settings
+        java_settings = QGroupBox("Java Settings")
+        java_layout = QVBoxLayout()
+        
+        # Java path
+        java_path_layout = QHBoxLayout()
+        java_path_label = QLabel("Java Path:")
+        self.java_path_input = QLineEdit(self.server.java_path)
+        java_path_layout.addWidget(java_path_label)
+        java_path_layout.addWidget(self.java_path_input)
+        java_layout.addLayout(java_path_layout)
+        
+        # Memory settings
+        memory_layout = QHBoxLayout()
+        min_ram_label = QLabel("Min RAM:")
+        self.min_ram_input = QLineEdit(self.server.min_ram)
+        max_ram_label = QLabel("Max RAM:")
+        self.max_ram_input = QLineEdit(self.server.max_ram)
+        memory_layout.addWidget(min_ram_label)
+        memory_layout.addWidget(self.min_ram_input)
+        memory_layout.addWidget(max_ram_label)
+        memory_layout.addWidget(self.max_ram_input)
+        java_layout.addLayout(memory_layout)
+        
+        # Extra arguments
+        args_layout = QHBoxLayout()
+        args_label = QLabel("Extra JVM Args:")
+        self.args_input = QLineEdit(self.server.extra_args)
+        args_layout.addWidget(args_label)
+        args_layout.addWidget(self.args_input)
+        java_layout.addLayout(args_layout)
+        
+        # GUI option
+        gui_layout = QHBoxLayout()
+        self.nogui_checkbox = QCheckBox("Run with --nogui")
+        self.nogui_checkbox.setChecked(self.server.nogui)
+        gui_layout.addWidget(self.nogui_checkbox)
+        self.gc_logging_checkbox = QCheckBox("Write and analyse a GC log (-Xlog:gc*, Java 9+)")
+        self.gc_logging_checkbox.setChecked(self.server.gc_logging)
+        gui_layout.addWidget(self.gc_logging_checkbox)
+        java_layout.addLayout(gui_layout)
+        
+        # Heap size and flags for this machine and Java version
+        recommend_layout = QHBoxLayout()
+        self.recommend_btn = QPushButton("Recommend")
+        self.recommend_btn.setToolTip("Propose RAM and JVM flags for this machine and Java version")
+        self.recommend_btn.clicked.connect(self.recommend_java_settings)
+        recommend_layout.addStretch()
+        recommend_layout.addWidget(self.recommend_btn)
+        java_layout.addLayout(recommend_layout)
+
+        java_settings.setLayout(java_layout)
+        main_layout.addWidget(java_settings)
+
+        # Resource usage of the server process tree
+        metrics_group = QGroupBox("Server Resources")
+        metrics_layout = QHBoxLayout()
+        self.sparklines = {}
+        self.sparkline_labels = {}
+        for name, title, color in (("cpu_percent", "CPU", "#d9534f"), ("rss", "Memory", "#2a82da"),
+                                   ("threads", "Threads", "#5cb85c")):
+            column = QVBoxLayout()
+            self.sparkline_labels[name] = QLabel(f"{title}: -")
+            self.sparklines[name] = Sparkline(color)
+            column.addWidget(self.sparkline_labels[name])
+            column.addWidget(self.sparklines[name])
+            metrics_layout.addLayout(column)
+        # GC pauses and heap after GC, from the GC log
+        gc_column = QVBoxLayout()
+        self.gc_label = QLabel("GC: -")
+        self.gc_sparkline = Sparkline("#f0ad4e")
+        gc_column.addWidget(self.gc_label)
+        gc_column.addWidget(self.gc_sparkline)
+        metrics_layout.addLayout(gc_column)
+        # Latest answers to the TPS/MSPT/list probes
+        self.tick_label = QLabel("TPS: -")
+        metrics_layout.addWidget(self.tick_label)
+        metrics_group.setLayout(metrics_layout)
+        main_layout.addWidget(metrics_group)
+
+        # Server status
+        status_layout = QHBoxLayout()
+        status_label = QLabel("Server Status:")
+        self.status_value = QLabel("Stopped")
+        self.status_value.setStyleSheet("color: red;")
+        status_layout.addWidget(status_label)
+        status_layout.addWidget(self.status_value)
+        status_layout.addStretch()
+        # Boot time of the last run against earlier runs
+        self.startup_label = QLabel(self.server.startup_profiler.summary())
+        startup_btn = QPushButton("Startup Report")
+        startup_btn.clicked.connect(self.show_startup_report)
+        status_layout.addWidget(self.startup_label)
+        status_layout.addWidget(startup_btn)
+        # Summary of the old logs and crash reports next to the JAR
+        self.history_btn = QPushButton("History")
+        self.history_btn.clicked.connect(self.analyze_history)
+        status_layout.addWidget(self.history_btn)
+        main_layout.addLayout(status_layout)
+
+        # Alert for the latest explained lag warning; hidden until there is one
+        self.lag_alert = QWidget()
+        lag_layout = QHBoxLayout()
+        lag_layout.setContentsMargins(0, 0, 0, 0)
+        self.lag_alert_label = QLabel()
+        self.lag_alert_label.setWordWrap(True)
+        self.lag_alert_label.setStyleSheet("color: darkred; font-weight: bold;")
+        lag_details_btn = QPushButton("Details")
+        lag_details_btn.clicked.connect(self.show_lag_report)
+        lag_dismiss_btn = QPushButton("Dismiss")
+        lag_dismiss_btn.clicked.connect(self.lag_alert.hide)
+        lag_layout.addWidget(self.lag_alert_label, 1)
+        lag_layout.addWidget(lag_details_btn)
+        lag_layout.addWidget(lag_dismiss_btn)
+        self.lag_alert.setLayout(lag_layout)
+        self.lag_alert.hide()
+        main_layout.addWidget(self.lag_alert)
+
+        # Control buttons
+        btn_layout = QHBoxLayout()
+        self.start_btn = QPushButton("Start Server")
+        self.stop_btn = QPushButton("Stop Server")
+        self.restart_btn = QPushButton("Restart Server")
+        self.check_btn = QPushButton("Check Status")
+        self.start_btn.clicked.connect(self.start_server)
+        self.stop_btn.clicked.connect(self.stop_server)
+        self.restart_btn.clicked.connect(self.restart_server)
+        self.check_btn.clicked.connect(self.check_status)
+        btn_layout.addWidget(self.start_btn)
+        btn_layout.addWidget(self.stop_btn)
+        btn_layout.addWidget(self.restart_btn)
+        btn_layout.addWidget(self.check_btn)
+        main_layout.addLayout(btn_layout)
+
+        # Output area
+        output_label = QLabel("Server Output:")
+        main_layout.addWidget(output_label)
+
+        # Output filter, served from the log index
+        filter_layout = QHBoxLayout()
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Filter output...")
+        self.filter_regex_checkbox = QCheckBox("Regex")
+        self.filter_level_combo = QComboBox()
+        self.filter_level_combo.addItems(["All levels", "INFO", "WARN", "ERROR", "WARN,ERROR"])
+        self.filter_timer = QTimer()
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.timeout.connect(self.apply_output_filter)
+        self.filter_input.textChanged.connect(lambda _: self.filter_timer.start(250))
+        self.filter_regex_checkbox.toggled.connect(lambda _: self.filter_timer.start(0))
+        self.filter_level_combo.currentIndexChanged.connect(lambda _: self.filter_timer.start(0))
+        filter_layout.addWidget(self.filter_input)
+        filter_layout.addWidget(self.filter_regex_checkbox)
+        filter_layout.addWidget(self.filter_level_combo)
+        main_layout.addLayout(filter_layout)
+
+        self.output_area = QPlainTextEdit()
+        self.output_area.setReadOnly(True)
+        self.output_area.setUndoRedoEnabled(False)
+        self.output_area.setMaximumBlockCount(MAX_DISPLAY_LINES)
+        main_layout.addWidget(self.output_area)
+        pipeline_layout = QHBoxLayout()
+        self.pipeline_label = QLabel("Rendered: 0 lines/s")
+        pipeline_layout.addWidget(self.pipeline_label)
+        pipeline_layout.addStretch()
+        self.console_mirror_checkbox = QCheckBox("Mirror to terminal")
+        self.console_mirror_checkbox.setToolTip("Also write the output to the terminal the manager runs in")
+        self.console_mirror_checkbox.setChecked(self.server.console_mirror)
+        pipeline_layout.addWidget(self.console_mirror_checkbox)
+        main_layout.addLayout(pipeline_layout)
+        
+        # Command input
+        cmd_layout = QHBoxLayout()
+        self.cmd_input = QLineEdit()
+        self.cmd_input.setPlaceholderText("Type server command here...")
+        self.cmd_input.returnPressed.connect(self.send_command_from_input)
+        send_cmd_btn = QPushButton("Send")
+        send_cmd_btn.clicked.connect(self.send_command_from_input)
+        cmd_layout.addWidget(self.cmd_input)
+        cmd_layout.addWidget(send_cmd_btn)
+        main_layout.addLayout(cmd_layout)
+
+        # Bottom buttons
+        bottom_layout = QHBoxLayout()
+        clear_btn = QPushButton("Clear Output")
+        clear_btn.clicked.connect(self.clear_output)
+        bottom_layout.addWidget(clear_btn)
+        main_layout.addLayout(bottom_layout)
+
+    def load_settings(self):
+        """Show the server's settings in the UI."""
+        self.jar_input.setText(self.server.server_jar_file)
+        self.java_path_input.setText(self.server.java_path)
+        self.min_ram_input.setText(self.server.min_ram)
+        self.max_ram_input.setText(self.server.max_ram)
+        self.args_input.setText(self.server.extra_args)
+        self.nogui_checkbox.setChecked(self.server.nogui)
+        self.gc_logging_checkbox.setChecked(self.server.gc_logging)
+        self.console_mirror_checkbox.setChecked(self.server.console_mirror)
+
+    def apply_ui_settings(self):
+        """Copy the values from the UI into the server settings."""
+        self.server.java_path = self.java_path_input.text().strip()
+        self.server.min_ram = self.min_ram_input.text().strip()
+        self.server.max_ram = self.max_ram_input.text().strip()
+        self.server.extra_args = self.args_input.text().strip()
+        self.server.nogui = self.nogui_checkbox.isChecked()
+        self.server.gc_logging = self.gc_logging_checkbox.isChecked()
+        self.server.console_mirror = self.console_mirror_checkbox.isChecked()
+
+    def recommend_java_settings(self):
+        """Propose RAM and JVM flags for this host; java -version runs on a background thread."""
+        self.apply_ui_settings()
+        self.recommending = True
+        self.recommend_btn.setText("Checking Java...")
+        self.update_buttons()
+
+        def recommend():
+            if self.supervisor:
+                result = self.supervisor.recommend_java_settings(self.server.server_id)
+            else:
+                result = jvm_tuning.recommend(self.server.java_path)
+            self.recommend_signal.emit(result)
+
+        threading.Thread(target=recommend, name=f"recommend-{self.server.server_id}", daemon=True).start()
+
+    def _on_recommendation(self, result):
+        """Show the recommendation and offer to use it."""
+        self.recommending = False
+        self.recommend_btn.setText("Recommend")
+        self.update_buttons()
+        java = result["java"]
+        lines = [f"Java: {java.get('version') or 'unknown'}" + (f" ({java['vm']})" if java.get("vm") else ""),
+                 f"Min RAM: {result['min_ram']}    Max RAM: {result['max_ram']}    GC: {result['gc']}", ""]
+        lines.extend(f"- {reason}" for reason in result["reasons"])
+        if result["warnings"]:
+            lines.append("")
+            lines.extend(f"Warning: {warning}" for warning in result["warnings"])
+        lines += ["", "Use these settings?"]
+        answer = QMessageBox.question(self, "Recommended Java Settings", "\n".join(lines),
+                                      QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        self.min_ram_input.setText(result["min_ram"])
+        self.max_ram_input.setText(result["max_ram"])
+        self.args_input.setText(result["extra_args"])
+        self.save_settings()
+
+    def save_settings(self):
+        """Save current settings to the settings file."""
+        self.apply_ui_settings()
+        self.server.save_settings()
+
+    def update_status(self, status_text, color):
+        self.status_value.setText(status_text)
+        self.status_value.setStyleSheet(f"color: {color};")
+
+    def update_buttons(self):
+        is_running = self.server.lifecycle.is_running()
+        jar_file_selected = self.server.jar_file_valid()
+        self.start_btn.setEnabled(not is_running and jar_file_selected and not self.launching)
+        self.stop_btn.setEnabled(self.server.lifecycle.state in (STARTING, READY))
+        self.restart_btn.setEnabled(jar_file_selected and not self.launching)
+        
+        # Disable configuration fields while the server is running
+        self.java_path_input.setEnabled(not is_running)
+        self.min_ram_input.setEnabled(not is_running)
+        self.max_ram_input.setEnabled(not is_running)
+        self.args_input.setEnabled(not is_running)
+        self.nogui_checkbox.setEnabled(not is_running)
+        self.gc_logging_checkbox.setEnabled(not is_running)
+        self.recommend_btn.setEnabled(not is_running and not self.recommending)
+        
+        # Enable/disable command input based on server status
+        if hasattr(self, 'cmd_input'):
+            self.cmd_input.setEnabled(is_running)
+
+        render = self.render_rate.stats()
+        pipeline_text = f"Rendered: {render['rate']:.0f} lines/s (peak {render['peak']:.0f})"
+        if self.server.output_reader:
+            ingest = self.server.output_reader.stats()
+            pipeline_text += f" | Ingest: {ingest['lines_per_second']:.0f} lines/s"
+            if ingest["backlog_bytes"] is not None:
+                pipeline_text += (f", backlog {ingest['backlog_bytes'] // 1024} KB"
+                                  f" (max {ingest['max_backlog_bytes'] // 1024} KB)")
+        self.pipeline_label.setText(pipeline_text)
+        self.update_metrics_panel()
+
+    def update_metrics_panel(self):
+        """Refresh the sparklines with the last few minutes of samples."""
+        series = self.server.sampler.series
+        latest = series.latest()
+        since = time.time() - 300
+        for name, sparkline in self.sparklines.items():
+            sparkline.set_values(series.values(name, since))
+        if latest:
+            self.sparkline_labels["cpu_percent"].setText(f"CPU: {latest['cpu_percent']:.0f}%")
+            self.sparkline_labels["rss"].setText(f"Memory: {latest['rss'] / (1024 * 1024):.0f} MB")
+            self.sparkline_labels["threads"].setText(f"Threads: {latest['threads']:.0f}")
+        if self.server.gc_log.pauses:
+            gc = self.server.gc_log.stats(300)
+            heap = gc["heap_after_gc_mb"]
+            text = f"GC: {gc['pauses']} pauses/5 min"
+            if gc["pauses"]:
+                text += f", p99 {gc['pause_ms']['p99']:.0f} ms"
+            if gc["full_gcs_since_start"]:
+                text += f", {gc['full_gcs_since_start']} full"
+            if heap["latest"] is not None:
+                text += f"\nHeap after GC: {heap['latest']:.0f} MB"
+            self.gc_label.setText(text)
+            self.gc_sparkline.set_values(self.server.gc_log.heap.values("after_mb", since))
+        tick = self.server.probes.latest()
+        if tick:
+            parts = []
+            if "overall.tps" in tick:
+                parts.append(f"TPS: {tick['overall.tps']:.1f}")
+            if "overall.mspt" in tick:
+                parts.append(f"MSPT: {tick['overall.mspt']:.1f}")
+            if "players.online" in tick:
+                parts.append(f"Players: {tick['players.online']:.0f}/{tick.get('players.max', 0):.0f}")
+            self.tick_label.setText("\n".join(parts) or "TPS: -")
+            color = "red" if self.server.probes.is_lagging() else "black"
+            self.tick_label.setStyleSheet(f"color: {color};")
+
+    def log_output(self, message):
+        self.server.log_output(message)
+
+    def browse_jar_file(self):
+        file_dialog = QFileDialog(self)
+        file_dialog.setNameFilter("JAR Files (*.jar)")
+        if file_dialog.exec():
+            selected_files = file_dialog.selectedFiles()
+            if selected_files:
+                self.server.server_jar_file = selected_files[0]
+                self.jar_input.setText(self.server.server_jar_file)
+                self.log_output(f"Selected server JAR: {self.server.server_jar_file}")
+                self.save_settings()
+        self.update_buttons()
+
+    def start_server(self):
+        """Start the server with the settings from the UI. Returns True if a start was requested."""
+        if not self.server.jar_file_valid():
+            QMessageBox.critical(self, "Error", "Please select a valid JAR file first!")
+            return False
+        self.apply_ui_settings()
+        self.launch_in_background(self.server.start)
+        return True
+
+    def stop_server(self):
+        return self.server.stop()
+
+    def restart_server(self):
+        if not self.server.jar_file_valid():
+            QMessageBox.critical(self, "Error", "Please select a valid JAR file first!")
+            return False
+        self.apply_ui_settings()
+        self.launch_in_background(self.server.restart)
+        return True
+
+    def launch_in_background(self, launch):
+        """Run start() or restart() on a background thread: checking the Java settings can run
+        java -version, which must not freeze the window. Their messages go to the output."""
+        self.launching = True
+        self.update_buttons()
+
+        def run():
+            try:
+                launch()
+            finally:
+                self.launch_done_signal.emit()
+
+        threading.Thread(target=run, name=f"launch-{self.server.server_id}", daemon=True).start()
+
+    def _on_launch_done(self):
+        self.launching = False
+        self.update_buttons()
+
+    def _on_state_gui(self, state, detail):
+        self.update_status(state, STATUS_COLORS.get(state, "black"))
+        self.update_buttons()
+        if state in (READY, STOPPED, CRASHED):
+            self.startup_label.setText(self.server.startup_profiler.summary())
+        if state == CRASHED:
+            QMessageBox.warning(self, "Server Ended",
+                f"{detail}. Check the output for details.")
+
+    def _on_output(self, records):
+        # Only the first batch after a flush needs to wake up the GUI thread
+        if self.output_queue.put(records):
+            self.output_waiting_since = time.perf_counter()
+            self.output_signal.emit()
+
+    def _schedule_output_flush(self):
+        """Flush queued output at most once per OUTPUT_FLUSH_INTERVAL_MS."""
+        if self.flush_timer.isActive():
+            return
+        if not self.isVisible():
+            # Background tab: lines wait in the bounded queue until the tab is shown
+            return
+        elapsed_ms = (time.monotonic() - self.last_flush) * 1000
+        self.flush_timer.start(max(0, int(OUTPUT_FLUSH_INTERVAL_MS - elapsed_ms)))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.output_waiting_since is not None:
+            # Time spent in a background tab isn't a GUI delay
+            self.output_waiting_since = time.perf_counter()
+        self._schedule_output_flush()
+
+    def _flush_output_gui(self):
+        started = time.perf_counter()
+        records, dropped = self.output_queue.drain()
+        self.last_flush = time.monotonic()
+        if self.output_waiting_since is not None:
+            self.server.instruments.observe("gui_wait", started - self.output_waiting_since, len(records))
+            self.output_waiting_since = None
+        if self.display_filter:
+            records = [record for record in records if self.display_filter(record)]
+            dropped = 0
+        if not records:
+            return
+        scrollbar = self.output_area.verticalScrollBar()
+        # Only follow the output if the user hasn't scrolled up to read something
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 2
+        lines = [format_record(record) for record in records]
+        if dropped:
+            lines.insert(0, f"... {dropped} lines skipped in the view (still kept in the log store) ...")
+        self.output_area.blockSignals(True)
+        self.output_area.appendPlainText("\n".join(lines))
+        self.output_area.blockSignals(False)
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+        self.render_rate.add(len(records))
+        self.server.instruments.observe("render", time.perf_counter() - started, len(records))
+
+    def _on_lag_report_gui(self, report):
+        when = time.strftime("%H:%M:%S", time.localtime(report["timestamp"]))
+        self.lag_alert_label.setText(f"[{when}] {report['summary']}")
+        self.lag_alert.show()
+
+    def show_lag_report(self):
+        """Show every signal of the latest lag report, most likely cause first."""
+        reports = self.server.lag_correlator.recent_reports(1)
+        if not reports:
+            return
+        report = reports[0]
+        lines = [report["summary"], "",
+                 f"Signals in the {report['window_seconds']:.0f} s before the warning,"
+                 f" against the {report['baseline_seconds']:.0f} s before that:"]
+        for signal in report["signals"]:
+            lines.append(f"  [{signal['score']:.1f}] {signal['description']}")
+            lines.extend(f"        {example}" for example in signal.get("examples", []))
+        if not report["signals"]:
+            lines.append("  none")
+        QMessageBox.information(self, "Lag Report", "\n".join(lines))
+
+    def show_startup_report(self):
+        """Show the phases of the last boot next to the median of earlier boots."""
+        report = self.server.startup_profiler.compare()
+        if report["latest"] is None:
+            QMessageBox.information(self, "Startup Report", report["message"])
+            return
+        lines = [self.server.startup_profiler.summary(), ""]
+        if "phases" in report:
+            lines.append(f"Phase changes against the median of {report['baseline_runs']} earlier runs:")
+            for phase in report["phases"]:
+                change = phase["change_seconds"]
+                change_text = f"{change:+.2f} s" if change is not None else "new"
+                lines.append(f"  {phase['phase']}: {phase['seconds']:.2f} s ({change_text})")
+            changes = report["changes_since_previous_run"]
+            if changes["jar_changed"]:
+                lines.append("\nThe server JAR changed since the previous run.")
+            if changes["jvm_args_added"] or changes["jvm_args_removed"]:
+                lines.append(f"\nJVM args added: {' '.join(changes['jvm_args_added']) or '-'}")
+                lines.append(f"JVM args removed: {' '.join(changes['jvm_args_removed']) or '-'}")
+        else:
+            for name, seconds in report["latest"]["phases"].items():
+                lines.append(f"  {name}: {seconds:.2f} s")
+        QMessageBox.information(self, "Startup Report", "\n".join(lines))
+
+    def analyze_history(self):
+        """Analyse the server's old logs and crash reports on a background thread."""
+        self.history_btn.setEnabled(False)
+        self.history_btn.setText("Analysing...")
+        threading.Thread(target=lambda: self.history_signal.emit(self.server.analyze_history()),
+                         name=f"history-{self.server.server_id}", daemon=True).start()
+
+    def _on_history_result(self, result):
+        self.history_btn.setEnabled(True)
+        self.history_btn.setText("History")
+        if "error" in result:
+            QMessageBox.warning(self, "Log History", result["error"])
+            return
+        dialog = QMessageBox(self)
+        dialog.setWindowTitle("Log History")
+        dialog.setText(f"{result['logs']} logs and {result['crash_reports']} crash reports analysed")
+        # The full summary is long, so it goes in the scrollable details area
+        dialog.setDetailedText(format_summary(result))
+        dialog.exec()
+
+    def check_status(self):
+        lifecycle = self.server.lifecycle
+        if lifecycle.is_running():
+            self.log_output(f"Server is currently {lifecycle.state.lower()}")
+            
+            # Send help command to test console output
+            self.server.send_command("help")
+        else:
+            self.log_output("Server is not running")
+        self.update_status(lifecycle.state, STATUS_COLORS.get(lifecycle.state, "black"))
+
+    def apply_output_filter(self):
+        """Re-render the output area from the log store using the current filter settings."""
+        query = self.filter_input.text()
+        regex = self.filter_regex_checkbox.isChecked()
+        level = self.filter_level_combo.currentText() if self.filter_level_combo.currentIndex() > 0 else None
+        self.output_area.clear()
+        self.output_queue.clear()
+        if not query and not level:
+            self.display_filter = None
+            store = self.server.log_store
+            records = [record for record in store.since(store.last_seq - MAX_DISPLAY_LINES) if not record.hidden]
+        else:
+            try:
+                matcher = compile_matcher(query, regex)
+            except re.error as e:
+                self.display_filter = None
+                self.output_area.appendPlainText(f"Invalid filter regex: {e}")
+                return
+            levels = set(level.split(",")) if level else None
+
+            def display_filter(record):
+                return matcher(record.text) and (levels is None or parse_header(record.text)[1] in levels)
+
+            self.display_filter = display_filter
+            result = self.server.log_index.search(query, regex=regex, level=level, limit=MAX_DISPLAY_LINES)
+            records = [self.server.log_store.get(hit["seq"]) for hit in reversed(result["matches"])]
+            records = [record for record in records if record]
+        if records:
+            self.output_area.appendPlainText("\n".join(format_record(record) for record in records))
+        scrollbar = self.output_area.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+
+    def clear_output(self):
+        self.server.clear_output()
+
+    def _clear_output_gui(self):
+        self.output_queue.clear()
+        self.output_area.clear()
+
+    def send_command_from_input(self):
+        """Send command from the input box to the server"""
+        command = self.cmd_input.text().strip()
+        if command:
+            success = self.server.send_command(command)
+            if success:
+                self.cmd_input.clear()  # Clear input box after sending
+
+
+
+# Qt6 version
+class MinecraftServerManager(QWidget):
+    """Main window: one ServerPanel tab per server of the Supervisor."""
+
+    def __init__(self, supervisor):
+        super().__init__()
+        self.supervisor = supervisor
+        self.panels = {}
+        self.init_ui()
+        for server in supervisor.servers.values():
+            self.add_panel(server)
+        # One timer refreshes the visible panel and the tab titles, however many servers there are
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(1000)
+        # Reports times the GUI thread was blocked (get_manager_diagnostics); the stacks of
+        # the stalls are only taken while a profile runs
+        self.stall_detector = StallDetector(supervisor.instruments)
+        self.stall_timer = QTimer()
+        self.stall_timer.timeout.connect(self.stall_detector.beat)
+        self.stall_timer.start(int(self.stall_detector.interval * 1000))
+        supervisor.profiler.stall_detectors.append(self.stall_detector)
+
+    def init_ui(self):
+        self.setWindowTitle("Minecraft Server Manager")
+        # Set default window size
+        self.resize(800, 600)
+        main_layout = QVBoxLayout()
+
+        # Title
+        title = QLabel("Minecraft Server Control Panel")
+        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        title.setStyleSheet("font-size: 20px; font-weight: bold;")
+        main_layout.addWidget(title)
+
+        self.tabs = QTabWidget()
+        self.tabs.currentChanged.connect(lambda _: self.refresh())
+        main_layout.addWidget(self.tabs)
+
+        # Bottom buttons
+        bottom_layout = QHBoxLayout()
+        add_btn = QPushButton("Add Server")
+        remove_btn = QPushButton("Remove Server")
+        exit_btn = QPushButton("Exit")
+        add_btn.clicked.connect(self.add_server)
+        remove_btn.clicked.connect(self.remove_server)
+        exit_btn.clicked.connect(self.close)
+        bottom_layout.addWidget(add_btn)
+        bottom_layout.addWidget(remove_btn)
+        bottom_layout.addStretch()
+        bottom_layout.addWidget(exit_btn)
+        main_layout.addLayout(bottom_layout)
+
+        # MCP Activity indicator
+        mcp_layout = QHBoxLayout()
+        mcp_label = QLabel("MCP Activity:")
+        self.mcp_indicator = QLabel()
+        self.mcp_indicator.setFixedSize(20, 20)
+        self.mcp_indicator.setStyleSheet("background-color: gray; border-radius: 10px; border: 1px solid #888;")
+        mcp_layout.addWidget(mcp_label)
+        mcp_layout.addWidget(self.mcp_indicator)
+        mcp_layout.addStretch()
+        main_layout.addLayout(mcp_layout)
+        self.setLayout(main_layout)
+
+    def add_panel(self, server):
+        panel = ServerPanel(server, self.supervisor)
+        self.panels[server.server_id] = panel
+        self.tabs.addTab(panel, server.server_id)
+        return panel
+
+    def current_panel(self):
+        return self.tabs.currentWidget()
+
+    def refresh(self):
+        for index in range(self.tabs.count()):
+            panel = self.tabs.widget(index)
+            self.tabs.setTabText(index, f"{panel.server.server_id} ({panel.server.lifecycle.state})")
+        panel = self.current_panel()
+        if panel:
+            panel.update_buttons()
+
+    def add_server(self):
+        server_id, ok = QInputDialog.getText(self, "Add Server", "Server id (letters, digits, '.', '_', '-'):")
+        if not ok or not server_id.strip():
+            return
+        try:
+            server = self.supervisor.add_server(server_id.strip())
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        self.supervisor.save_settings()
+        self.tabs.setCurrentWidget(self.add_panel(server))
+
+    def remove_server(self):
+        panel = self.current_panel()
+        if not panel:
+            return
+        server_id = panel.server.server_id
+        if QMessageBox.question(self, "Remove Server",
+                                f"Remove server '{server_id}'? Its logs stay on disk.") != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            self.supervisor.remove_server(server_id)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        self.tabs.removeTab(self.tabs.indexOf(panel))
+        del self.panels[server_id]
+        self.supervisor.instruments.gauge(f"{server_id}.gui_queue_records", None)
+        panel.deleteLater()
+
+    def closeEvent(self, event):
+        """Override close event to save settings before exiting."""
+        for panel in self.panels.values():
+            panel.apply_ui_settings()
+        try:
+            self.supervisor.save_settings()
+        except IOError:
+            pass
+        event.accept()
+
+    def blink_mcp_indicator(self):
+        self.mcp_indicator.setStyleSheet("background-color: green; border-radius: 10px; border: 1px solid #888;")
+        QTimer.singleShot(300, lambda: self.mcp_indicator.setStyleSheet("background-color: gray; border-radius: 10px; border: 1px solid #888;"))
@@ -0,0 +1,393 @@
+import json
+import re
+import threading
+from typing import Optional
+
+import jvm_tuning
+from log_store import format_record
+from resource_metrics import METRIC_NAMES
+from server_lifecycle import STOPPED, READY, CRASHED, STATES
+
+# Lines (or events) returned by the log resources
+RESOURCE_LINES = 200
+
+# Add MCP server import
+try:
+    import anyio
+    from mcp.server.fastmcp import FastMCP
+    from pydantic import Field
+    from typing import Annotated
+    # Every server tool takes one of these; described once here instead of in every docstring
+    ServerId = Annotated[str, Field(description="Id of the server to act on (see list_servers); empty for the default server")]
+    MCP_AVAILABLE = True
+except ImportError:
+    ServerId = str
+    MCP_AVAILABLE = False
+
+
+def create_mcp_server(supervisor, on_call=None):
+    """Create the FastMCP server exposing the tools for the servers of a Supervisor."""
+    mcp = FastMCP("minecraft-server-manager")
+    register_tools(mcp, supervisor, on_call)
+    return mcp
+
+
+def register_tools(mcp, supervisor, on_call=None):
+    """Register the Minecraft tools on mcp. on_call() runs at the start of every tool call.
+
+    Unknown server ids raise ValueError, which FastMCP reports as a tool error.
+    The tools run on the engine's event loop, so anything that waits is async and
+    does its waiting on a worker thread.
+    """
+    on_call = on_call or (lambda: None)
+
+    def tool():
+        """mcp.tool(), with every call timed as the "mcp" stage (see get_manager_diagnostics)."""
+        register = mcp.tool()
+        return lambda func: register(supervisor.instruments.timed("mcp", func))
+
+    def resource(uri):
+        register = mcp.resource(uri)
+        return lambda func: register(supervisor.instruments.timed("mcp", func))
+
+    @tool()
+    def list_servers() -> dict:
+        """List the managed Minecraft servers with their id, JAR, lifecycle state and pid.
+        Every other tool takes a server_id; an empty one means the default server."""
+        on_call()
+        return {"servers": supervisor.list_servers()}
+
+    async def await_lifecycle(server, requested, states, wait, timeout, generation):
+        """Common result of the lifecycle tools, optionally waiting for the request's outcome."""
+        result = {"requested": requested}
+        if requested and wait:
+            result["reached"] = await anyio.to_thread.run_sync(server.lifecycle.wait_for_state, states, timeout, generation)
+        result.update(server.lifecycle.status())
+        return result
+
+    @tool()
+    async def start_minecraft_server(wait: bool = True, timeout: float = 300, server_id: ServerId = "") -> dict:
+        """Start the Minecraft server with the current settings (JAR, Java path, RAM, JVM args, nogui).
+        With wait, returns once the server logged 'Done (...)!' (state Ready), failed, or timeout passed."""
+        on_call()
+        server = supervisor.get(server_id)
+        generation = server.lifecycle.generation
+        # start() validates the Java settings, which may run java -version
+        requested = await anyio.to_thread.run_sync(server.start)
+        return await await_lifecycle(server, requested, (READY, STOPPED, CRASHED), wait, timeout, generation)
+
+    @tool()
+    async def stop_minecraft_server(wait: bool = True, timeout: float = 120, server_id: ServerId = "") -> dict:
+        """Stop the running Minecraft server gracefully (terminated if it does not stop in time).
+        With wait, returns once the process has exited or timeout passed."""
+        on_call()
+        server = supervisor.get(server_id)
+        generation = server.lifecycle.generation
+        requested = server.stop()
+        return await await_lifecycle(server, requested, (STOPPED, CRASHED), wait, timeout, generation)
+
+    @tool()
+    async def restart_minecraft_server(wait: bool = True, timeout: float = 420, server_id: ServerId = "") -> dict:
+        """Restart the Minecraft server: stop it if running and start it again once the process exited.
+        With wait, returns once the new server is Ready, crashed, or timeout passed."""
+        on_call()
+        server = supervisor.get(server_id)
+        generation = server.lifecycle.generation
+        requested = await anyio.to_thread.run_sync(server.restart)
+        return await await_lifecycle(server, requested, (READY, CRASHED), wait, timeout, generation)
+
+    @tool()
+    async def wait_for_server_state(state: str = READY, timeout: float = 60, server_id: ServerId = "") -> dict:
+        """Wait until the server reaches a lifecycle state: Stopped, Starting, Ready, Stopping or Crashed.
+        Returns immediately if it is already in that state."""
+        on_call()
+        server = supervisor.get(server_id)
+        if state not in STATES:
+            return {"error": f"Unknown state '{state}'. Expected one of {', '.join(STATES)}"}
+        reached = await anyio.to_thread.run_sync(server.lifecycle.wait_for_state, state, max(0.0, timeout))
+        return {"reached": reached, **server.lifecycle.status()}
+
+    @tool()
+    def send_minecraft_command(command: str, server_id: ServerId = "") -> dict:
+        """Send a command string to the running Minecraft server console (e.g., 'say Hello')."""
+        on_call()
+        server = supervisor.get(server_id)
+        success = server.send_command(command)
+        return {"success": success}
+
+    @tool()
+    async def execute_minecraft_command(command: str, quiet_period: float = 0.5, timeout: float = 5.0,
+                                        server_id: ServerId = "") -> dict:
+        """Send a command to the server console and return only the output lines it produced
+        (e.g. the replies to 'list' or 'forge tps'). Collection stops once no new line has arrived
+        for quiet_period seconds, or after timeout seconds. Includes the round-trip latency."""
+        on_call()
+        server = supervisor.get(server_id)
+        return await anyio.to_thread.run_sync(server.execute_command, command, max(0.05, quiet_period), max(0.1, timeout))
+
+    @tool()
+    def get_server_status(server_id: ServerId = "") -> dict:
+        """Get the current status of the Minecraft server: running (True/False), the lifecycle state
+        (Stopped, Starting, Ready, Stopping or Crashed) and the latest probed TPS/MSPT values."""
+        on_call()
+        server = supervisor.get(server_id)
+        running = server.is_server_running()
+        return {"running": running, **server.lifecycle.status(), "tick": server.probes.latest()}
+
+    @tool()
+    def get_tick_health(series: str = "", seconds: int = 600, buckets: int = 60, server_id: ServerId = "") -> dict:
+        """Get the server's tick health as measured by the periodic probe commands (tps, forge tps,
+        mspt, list): per-dimension TPS and milliseconds per tick ('minecraft:overworld.tps',
+        'overall.mspt', ...) and player counts ('players.online'), downsampled over the last seconds
+        into buckets with min/max/avg. series is a comma-separated subset of the names; latest has
+        the most recent value of each. lagging is True below 19 TPS or above 50 ms per tick, and
+        then the probes run more often."""
+        on_call()
+        server = supervisor.get(server_id)
+        names = [name.strip() for name in series.split(",") if name.strip()]
+        return server.probes.query(names, max(1, seconds), max(1, buckets))
+
+    @tool()
+    async def get_server_logs(cursor: Optional[int] = None, since: Optional[float] = None,
+                              until: Optional[float] = None, max_lines: int = 500, server_id: ServerId = "") -> dict:
+        """Get the text output (logs) from the Minecraft server.
+        To follow the log cheaply, pass the next_cursor from the previous call as cursor (0 for the
+        beginning): only up to max_lines newer lines are returned, and more is True if there are
+        further lines. With since and/or until (Unix timestamps), reads up to max_lines lines of
+        that range from the on-disk log spool, which also covers earlier runs.
+        Without any of these, returns all retained lines of the current run."""
+        on_call()
+        server = supervisor.get(server_id)
+
+        def read():
+            # Formatting the whole store or reading the spool must not hold up the event loop
+            if cursor is not None:
+                return server.logs_after(cursor, max_lines)
+            if since is None and until is None:
+                return {"logs": server.log_store.text(), "next_cursor": server.log_store.last_seq,
+                        "stats": server.log_store.stats()}
+            records, truncated = server.log_spool.read(since=since, until=until, limit=max(1, max_lines))
+            records = [record for record in records if not record.hidden]
+            return {
+                "logs": "\n".join(format_record(record) for record in records),
+                "lines": len(records),
+                "truncated": truncated,
+                "stats": server.log_spool.stats(),
+            }
+
+        return await anyio.to_thread.run_sync(read)
+
+    @tool()
+    async def wait_for_server_logs(cursor: int = 0, timeout: float = 30, max_lines: int = 500,
+                                   include_events: bool = True, server_id: ServerId = "") -> dict:
+        """Long-poll for new output: returns as soon as there are lines after cursor (or after timeout
+        seconds with none). Pass next_cursor back as cursor on the next call. With include_events,
+        also returns the recognised log events (lag, joins, leaves, exceptions, ...) of those lines."""
+        on_call()
+        server = supervisor.get(server_id)
+        # Wait on a worker thread so other tool calls are served in the meantime
+        result = await anyio.to_thread.run_sync(server.wait_for_logs, cursor, min(max(0.0, timeout), 300.0), max_lines)
+        if include_events:
+            events = server.log_parser.recent_events(limit=max(1, max_lines), since_seq=cursor)
+            result["events"] = [event for event in events if event["seq"] <= result["next_cursor"]]
+        return result
+
+    @resource("minecraft://servers")
+    def servers_resource() -> str:
+        """The managed servers and their lifecycle state as JSON."""
+        return json.dumps(supervisor.list_servers())
+
+    @resource("minecraft://{server_id}/logs/latest")
+    def latest_logs_resource(server_id: str) -> str:
+        """The most recent output lines of a server."""
+        store = supervisor.get(server_id).log_store
+        return "\n".join(format_record(record) for record in store.since(store.last_seq - RESOURCE_LINES)
+                         if not record.hidden)
+
+    @resource("minecraft://{server_id}/logs/after/{cursor}")
+    async def logs_after_resource(server_id: str, cursor: str) -> str:
+        """A server's output after the given cursor (sequence number), as JSON with next_cursor."""
+        # An old cursor is read from the spool
+        result = await anyio.to_thread.run_sync(supervisor.get(server_id).logs_after, int(cursor), RESOURCE_LINES)
+        return json.dumps(result)
+
+    @resource("minecraft://{server_id}/events/recent")
+    def recent_events_resource(server_id: str) -> str:
+        """The most recent recognised log events of a server as JSON."""
+        return json.dumps(supervisor.get(server_id).log_parser.recent_events(limit=RESOURCE_LINES))
+
+    @tool()
+    async def search_server_logs(query: str = "", regex: bool = False, level: str = "", thread: str = "",
+                                 since: Optional[float] = None, until: Optional[float] = None,
+                                 limit: int = 50, context: int = 0, server_id: ServerId = "") -> dict:
+        """Search the retained server logs instead of downloading all of them.
+        query is a substring (or a regular expression if regex is True), level a comma-separated
+        list such as 'WARN,ERROR', thread a thread name fragment such as 'Server thread'.
+        since/until are Unix timestamps. Returns up to limit matches, newest first, each with
+        context lines before and after."""
+        on_call()
+        server = supervisor.get(server_id)
+        try:
+            # A regex scan of the whole store runs on a worker thread, like the spool reads
+            return await anyio.to_thread.run_sync(
+                lambda: server.log_index.search(query, regex=regex, level=level or None, thread=thread or None,
+                                                since=since, until=until, limit=max(1, limit),
+                                                context=max(0, context)))
+        except re.error as e:
+            return {"error": f"Invalid regular expression: {e}"}
+
+    @tool()
+    def get_server_metrics(metrics: str = "", seconds: int = 600, buckets: int = 60, server_id: ServerId = "") -> dict:
+        """Get resource usage of the Java server process tree over the last seconds, downsampled into
+        buckets with min/max/avg each. metrics is a comma-separated subset of cpu_percent, rss, vms,
+        threads, open_files, read_bytes, write_bytes (memory in bytes, I/O in bytes per second)."""
+        on_call()
+        server = supervisor.get(server_id)
+        names = [name.strip() for name in metrics.split(",") if name.strip()] or list(METRIC_NAMES)
+        result = server.sampler.query(names, max(1, seconds), max(1, buckets))
+        result["sampler_cpu_seconds"] = round(server.sampler.sample_cost, 3)
+        return result
+
+    @tool()
+    def get_log_event_counters(server_id: ServerId = "") -> dict:
+        """Get counters of recognised log events (lag warnings, player joins/leaves, startup 'Done' lines,
+        exceptions), the players currently online and the most recent lag warning and startup time."""
+        on_call()
+        server = supervisor.get(server_id)
+        return server.log_parser.stats()
+
+    @tool()
+    def get_recent_log_events(kind: str = "", limit: int = 50, server_id: ServerId = "") -> dict:
+        """Get the most recent recognised log events, oldest first. kind filters to one of
+        'lag', 'join', 'leave', 'done' or 'exception' (exceptions include their stack frames)."""
+        on_call()
+        server = supervisor.get(server_id)
+        return {"events": server.log_parser.recent_events(kind or None, max(1, limit))}
+
+    @tool()
+    def get_startup_profile(runs: int = 10, include_history: bool = False, server_id: ServerId = "") -> dict:
+        """Get how long each boot phase (JVM launch, mod loading stages, level and dimension preparation,
+        up to the 'Done' line) took in the last completed startup, compared with the median of the
+        previous runs, biggest regressions first, plus JVM argument and JAR changes since the previous
+        run. With include_history, also returns every recorded run (including crashed or stopped ones)."""
+        on_call()
+        server = supervisor.get(server_id)
+        result = server.startup_profiler.compare(max(1, runs))
+        if include_history:
+            result["history"] = server.startup_profiler.history
+        return result
+
+    @tool()
+    def explain_recent_lag(limit: int = 1, server_id: ServerId = "") -> dict:
+        """Explain the most recent "Can't keep up!" lag warnings. For each warning, the log signals
+        (GC pauses, chunk generation, world saves, entity warnings, player joins, exceptions,
+        commands, other warnings) and the process metrics (CPU, memory, threads, disk I/O) of the
+        seconds before it are compared with the two minutes before that, and returned ranked by
+        how unusual they were (score), with example lines and a one-line summary.
+        Returns up to limit reports, newest last."""
+        on_call()
+        server = supervisor.get(server_id)
+        reports = server.lag_correlator.recent_reports(max(1, limit))
+        if not reports:
+            return {"reports": [], "message": "No lag warning recorded yet"}
+        return {"reports": reports}
+
+    @tool()
+    def get_gc_stats(seconds: int = 0, buckets: int = 60, server_id: ServerId = "") -> dict:
+        """Get garbage collection analytics from the JVM's GC log (needs the gc_logging setting, which
+        adds -Xlog:gc* to the command line): pause time percentiles (p50/p90/p99/max) against the
+        MaxGCPauseMillis target, pause counts per kind, full GCs, the share of time spent paused,
+        the allocation rate and the heap after GC (latest, min/max, trend in MB per hour and a
+        downsampled series). Covers the last seconds, or everything since the server started with 0."""
+        on_call()
+        server = supervisor.get(server_id)
+        result = server.gc_log.stats(max(0, seconds) or None, max(1, buckets))
+        result["gc_logging"] = server.gc_logging
+        return result
+
+    @tool()
+    async def recommend_java_settings(apply: bool = False, server_id: ServerId = "") -> dict:
+        """Recommend Min/Max RAM and JVM flags for this machine (total and available memory, physical
+        cores, minus the heaps of the other servers) and the server's Java version: Aikar's G1 flags,
+        or generational ZGC for large heaps on Java 21+. Also validates the current settings
+        (errors there would make the JVM refuse to start). With apply, the recommendation is saved
+        as the server's settings (only while the server is stopped)."""
+        on_call()
+        server = supervisor.get(server_id)
+        result = await anyio.to_thread.run_sync(supervisor.recommend_java_settings, server_id)
+        current = await anyio.to_thread.run_sync(
+            jvm_tuning.validate, server.java_path, server.min_ram, server.max_ram, server.extra_args)
+        result["current"] = {"min_ram": server.min_ram, "max_ram": server.max_ram, "extra_args": server.extra_args,
+                             "errors": current["errors"], "warnings": current["warnings"]}
+        if apply:
+            if server.lifecycle.is_running():
+                return {"error": "Stop the server before applying new Java settings", **result}
+            server.min_ram, server.max_ram, server.extra_args = result["min_ram"], result["max_ram"], result["extra_args"]
+            server.save_settings()
+            result["applied"] = True
+        return result
+
+    @tool()
+    async def analyze_server_history(top: int = 20, server_id: ServerId = "") -> dict:
+        """Analyse the rotated logs (logs/*.log.gz) and crash reports (crash-reports/) in the server
+        directory: the most frequent exception signatures (class and top stack frame), warnings with
+        numbers normalised away, and crash causes with the suspected mods. Files are analysed in
+        parallel and cached by size and mtime, so repeated calls only read new files."""
+        on_call()
+        server = supervisor.get(server_id)
+        return await anyio.to_thread.run_sync(server.analyze_history, max(1, top))
+
+    @tool()
+    async def scan_region_files(top: int = 20, count_entities: bool = False, dimension: str = "",
+                                server_id: ServerId = "") -> dict:
+        """Find oversized chunks in the server's worlds (world*/region/*.mca and the other dimensions),
+        ranked by compressed size, with chunk and block coordinates. count_entities also decompresses
+        every chunk to rank chunks by entities and block entities (slower, runs in worker processes).
+        dimension limits the scan to labels containing it, e.g. "DIM-1". Read-only, so it is safe
+        while the server runs; regions unchanged since the last scan come from a cache."""
+        on_call()
+        server = supervisor.get(server_id)
+        return await anyio.to_thread.run_sync(server.scan_regions, max(1, top), count_entities, dimension or None)
+
+    @tool()
+    async def get_top_spammers(limit: int = 10, by: str = "message", seconds: int = 0,
+                               server_id: ServerId = "") -> dict:
+        """Rank the noisiest log output of the server since it started: by "message" (lines with
+        numbers, coordinates and ids normalised away) or by "source" (logger, or thread for layouts
+        without one). Each entry has its count, how many repeats were collapsed, the first and last
+        time it was seen and its rate per minute. seconds limits the ranking to messages seen that
+        recently. Also reports the dedup settings and totals."""
+        on_call()
+        server = supervisor.get(server_id)
+        if by not in ("message", "source"):
+            return {"error": "by must be \"message\" or \"source\""}
+        return {**server.log_dedup.stats(),
+                "spammers": server.log_dedup.top_spammers(max(1, limit), by, max(0, seconds))}
+
+    @tool()
+    def get_manager_diagnostics(profile: str = "", seconds: float = 30, top: int = 20, reset: bool = False) -> dict:
+        """How the manager itself is doing, for when the manager (not the Minecraft server) is slow.
+        stages has call counts and latency percentiles of the output pipeline: read (decoding the
+        pipe), parse, dispatch (GUI/listener hand-off), pipeline (all of it, per batch), render
+        (writing to the GUI view), gui_wait (line batch waiting for the GUI thread) and mcp (every
+        tool call, also per tool) and gui_loop_lag (how late the GUI event loop answers).
+        queues has the current depth of the hand-off queues, stalls the recent GUI event loop
+        stalls. profile="start" starts a sampling profiler of all manager threads for seconds (up to
+        600), during which stalls also get the stack the GUI thread was stuck in; profile="stop"
+        stops it early; the latest profile is included in every result. reset
+        clears the counters after reporting them."""
+        on_call()
+        profiler = supervisor.profiler
+        if profile not in ("", "start", "stop"):
+            return {"error": "profile must be \"start\", \"stop\" or empty"}
+        result = {}
+        if profile == "start":
+            result["profile_started"] = profiler.start(seconds)
+        elif profile == "stop":
+            profiler.stop()
+        result.update(supervisor.instruments.snapshot())
+        if reset:
+            supervisor.instruments.reset()
+        result["threads"] = sorted(thread.name for thread in threading.enumerate())
+        result["profiler"] = profiler.report(max(1, top)) if profiler.started else {"running": False}
+        return result
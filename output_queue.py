@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import deque
+
+
+class OutputQueue:
+    """Hand-off queue between the threads producing output and the GUI thread.
+
+    Producers put records, the GUI drains everything that is pending once per frame.
+    Only the newest max_pending records are kept: anything older would scroll out of
+    the capped output view before it could be seen anyway.
+    """
+
+    def __init__(self, max_pending=5000):
+        self.max_pending = max_pending
+        self._pending = deque(maxlen=max_pending)
+        self._lock = threading.Lock()
+        self._dropped = 0
+
+    def put(self, records):
+        """Queue records. Returns True if the queue was empty, i.e. a flush needs scheduling."""
+        with self._lock:
+            was_empty = not self._pending
+            overflow = len(self._pending) + len(records) - self.max_pending
+            if overflow > 0:
+                self._dropped += overflow
+            self._pending.extend(records)
+            return was_empty
+
+    def drain(self):
+        """Take every pending record. Returns (records, dropped_since_last_drain)."""
+        with self._lock:
+            records = list(self._pending)
+            self._pending.clear()
+            dropped, self._dropped = self._dropped, 0
+            return records, dropped
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._dropped = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+
+class RateMeter:
+    """Counts events into one-second buckets and reports the rate over a short window."""
+
+    def __init__(self, window=5):
+        self.window = window
+        self._buckets = deque(maxlen=window + 1)
+        self._lock = threading.Lock()
+        self.total = 0
+        self.peak = 0.0
+
+    def add(self, count=1, now=None):
+        second = int(now if now is not None else time.monotonic())
+        with self._lock:
+            self.total += count
+            if self._buckets and self._buckets[-1][0] == second:
+                self._buckets[-1][1] += count
+            else:
+                if self._buckets:
+                    # The previous bucket is complete, so it is a fair sample for the peak
+                    self.peak = max(self.peak, float(self._buckets[-1][1]))
+                self._buckets.append([second, count])
+
+    def rate(self, now=None):
+        """Average events per second over the completed buckets in the window."""
+        second = int(now if now is not None else time.monotonic())
+        with self._lock:
+            complete = [count for bucket_second, count in self._buckets
+                        if second - self.window <= bucket_second < second]
+        if not complete:
+            return 0.0
+        return sum(complete) / float(self.window)
+
+    def stats(self):
+        return {"rate": round(self.rate(), 1), "peak": self.peak, "total": self.total}
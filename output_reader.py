@@ -0,0 +1,116 @@
+import codecs
+import locale
+import os
+import threading
+import time
+
+from output_queue import RateMeter
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def pipe_backlog(fd=None, handle=None):
+    """Return the number of bytes written to the pipe but not read yet, or None if unknown.
+    The pipe is a file descriptor, or on Windows either that or the pipe's handle."""
+    try:
+        if os.name == 'nt':
+            import ctypes
+            import msvcrt
+            available = ctypes.c_ulong(0)
+            if handle is None:
+                handle = msvcrt.get_osfhandle(fd)
+            if ctypes.windll.kernel32.PeekNamedPipe(handle, None, 0, None, ctypes.byref(available), None):
+                return available.value
+            return None
+        import fcntl
+        import struct
+        import termios
+        buf = fcntl.ioctl(fd, termios.FIONREAD, b"\0\0\0\0")
+        return struct.unpack("i", buf)[0]
+    except (OSError, ValueError, ImportError, AttributeError):
+        return None
+
+
+class OutputReader:
+    """Reads a process' stdout in large binary chunks and hands off complete lines in batches.
+
+    Decoding and line splitting happen incrementally, so a multi-byte character or a
+    line split across two chunks is reassembled correctly. The loop only ends at EOF,
+    which is also how the end of the process is noticed - there is no per-line poll().
+
+    stream is an asyncio StreamReader, read by run_async() on the event loop. backlog()
+    returns the bytes waiting in the pipe; without it the backlog is unknown (None).
+    With instruments, decoding and splitting each chunk is timed as the "read" stage.
+    """
+
+    def __init__(self, stream, on_lines, encoding=None, chunk_size=DEFAULT_CHUNK_SIZE, backlog=None,
+                 instruments=None):
+        self.stream = stream
+        self.backlog = backlog
+        self.on_lines = on_lines
+        self.instruments = instruments
+        self.chunk_size = chunk_size
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self._decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+        self._partial = ""
+        self._lock = threading.Lock()
+        self.line_rate = RateMeter()
+        self.bytes_read = 0
+        self.chunks_read = 0
+        self.lines_read = 0
+        self.backlog_bytes = None if backlog is None else 0
+        self.max_backlog_bytes = self.backlog_bytes
+
+    def feed(self, data, final=False):
+        """Decode a chunk and return the complete lines it finishes (without line endings)."""
+        text = self._partial + self._decoder.decode(data, final)
+        lines = text.split("\n")
+        self._partial = "" if final else lines.pop()
+        result = []
+        for line in lines:
+            line = line.rstrip()
+            if line:
+                result.append(line)
+        return result
+
+    async def run_async(self):
+        """Read the StreamReader until EOF. Waits without a thread or any polling."""
+        while True:
+            data = await self.stream.read(self.chunk_size)
+            if not data:
+                break
+            self._process(data)
+        self._finish()
+
+    def _process(self, data, final=False):
+        started = time.perf_counter()
+        backlog = self.backlog() if self.backlog is not None and not final else None
+        lines = self.feed(data, final)
+        if self.instruments:
+            self.instruments.observe("read", time.perf_counter() - started, len(lines))
+        with self._lock:
+            self.bytes_read += len(data)
+            self.chunks_read += 1 if data else 0
+            self.lines_read += len(lines)
+            if backlog is not None:
+                self.backlog_bytes = backlog
+                self.max_backlog_bytes = max(self.max_backlog_bytes, backlog)
+        if lines:
+            self.line_rate.add(len(lines))
+            self.on_lines(lines)
+
+    def _finish(self):
+        # Whatever is left after EOF is the last line, even without a trailing newline
+        self._process(b"", final=True)
+
+    def stats(self):
+        """Ingest counters. backlog_bytes is how far reading lags behind what the process wrote."""
+        with self._lock:
+            return {
+                "bytes_read": self.bytes_read,
+                "chunks_read": self.chunks_read,
+                "lines_read": self.lines_read,
+                "lines_per_second": round(self.line_rate.rate(), 1),
+                "backlog_bytes": self.backlog_bytes,
+                "max_backlog_bytes": self.max_backlog_bytes,
+            }
@@ -0,0 +1,191 @@
+import asyncio
+import re
+import time
+
+from resource_metrics import MetricRing
+
+# Commands sent by default; the ones a server doesn't know are dropped after their first reply
+DEFAULT_PROBE_COMMANDS = ("tps", "forge tps", "mspt", "list")
+DEFAULT_PROBE_INTERVAL = 30.0
+# Never probe more often than this, even while the server is lagging
+MIN_PROBE_INTERVAL = 5.0
+# While lagging the interval is divided by this, for a closer look at the problem
+LAG_INTERVAL_DIVISOR = 4
+# How long the replies to one probe command are collected, and the pause between commands
+REPLY_WINDOW = 1.0
+COMMAND_GAP = 0.5
+# A server is lagging below this TPS or above this tick time
+LAG_TPS = 19.0
+LAG_MSPT = 50.0
+# Two hours of samples at the lagging interval
+SERIES_CAPACITY = 1440
+
+# Minecraft colour codes, which Paper puts into its tps/mspt replies
+_COLOR_RE = re.compile(r"§.")
+# One reply line of any probe command. Which groups are set tells what was measured:
+#   Forge (old)  Dim minecraft:overworld (minecraft:overworld): Mean tick time: 0.542 ms. Mean TPS: 20.000
+#                Overall : Mean tick time: 0.612 ms. Mean TPS: 20.000
+#   Forge (new)  minecraft:overworld: 20.000 TPS (0.542 ms/tick)
+#   Paper tps    TPS from last 1m, 5m, 15m: 20.0, 20.0, 20.0
+#   Paper mspt   Server tick times (avg/min/max) from last 5s, 10s, 1m:  /  1.2/0.5/3.4, 1.1/0.4/3.9, ...
+#   vanilla      Average time per tick: 3.2ms (Target: 50.0ms)
+#   list         There are 3 of a max of 20 players online: ...
+_REPLY_RE = re.compile(
+    r"^(?:Dim\s+(?P<dim_old>\S+?)(?: \([^)]*\))?|(?P<overall_old>Overall))\s*: "
+    r"Mean tick time: (?P<mspt_old>[\d.]+) ms\. Mean TPS: (?P<tps_old>[\d.]+)"
+    r"|^(?P<dim_new>[\w:./-]+)\s*: (?P<tps_new>[\d.]+) TPS \((?P<mspt_new>[\d.]+) ms/tick\)"
+    r"|^TPS from last 1m, 5m, 15m: \*?(?P<paper_tps>[\d.]+)"
+    r"|^(?P<paper_mspt_header>Server tick times)"
+    r"|^\W*(?P<paper_mspt>[\d.]+)/[\d.]+/[\d.]+,"
+    r"|^Average time per tick: (?P<vanilla_mspt>[\d.]+)ms"
+    r"|^There are (?P<players>\d+)(?: of a max of | out of maximum |/)(?P<max_players>\d+) players online"
+    r"|(?P<unknown>Unknown (?:or incomplete )?command|<--\[HERE\])"
+)
+
+
+class ProbeScheduler:
+    """Periodically asks the server for its tick health and keeps the answers as time series.
+
+    While the server is ready, the probe commands (tps, forge tps, mspt, list, ...) are
+    written one at a time to the command channel on the event loop, with a pause between
+    them. Replies arriving within the reply window are parsed into per-dimension TPS and
+    tick time (MSPT) series plus the player count, and filtered out of the output shown
+    to the GUI; they stay in the log store and spool. Commands the server answers with
+    "Unknown command" are not sent again during this run. While the server lags, the
+    interval shrinks down to MIN_PROBE_INTERVAL.
+    """
+
+    def __init__(self, engine, command_channel, log_parser, commands=DEFAULT_PROBE_COMMANDS,
+                 interval=DEFAULT_PROBE_INTERVAL, enabled=True):
+        self.engine = engine
+        self.command_channel = command_channel
+        self.log_parser = log_parser
+        self.commands = list(commands)
+        self.interval = interval
+        self.enabled = enabled
+        self.series = {}
+        self.unsupported = set()
+        self.probes_sent = 0
+        self.lines_hidden = 0
+        self._task = None
+        self._pending = None  # command whose reply window is open
+
+    def configure(self, commands, interval, enabled):
+        self.commands = [command.strip() for command in commands if command.strip()]
+        self.interval = max(MIN_PROBE_INTERVAL, float(interval))
+        self.enabled = enabled
+
+    # Runs on the event loop
+
+    def start(self):
+        """Start probing a server that just became ready."""
+        self.stop()
+        self.series = {}
+        self.unsupported = set()
+        if self.enabled and self.commands:
+            self._task = self.engine.loop.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self._close_window()
+
+    async def _run(self):
+        while True:
+            for command in list(self.commands):
+                if command in self.unsupported:
+                    continue
+                # Don't mix probe replies into a command someone is executing right now
+                if not self.command_channel.try_reserve():
+                    continue
+                try:
+                    self._pending = command
+                    self.command_channel.write(command)
+                    self.probes_sent += 1
+                    await asyncio.sleep(REPLY_WINDOW)
+                except BrokenPipeError:
+                    return
+                finally:
+                    self._close_window()
+                await asyncio.sleep(COMMAND_GAP)
+            await asyncio.sleep(self.current_interval())
+
+    def _close_window(self):
+        if self._pending is not None:
+            self._pending = None
+            self.command_channel.release()
+
+    def feed(self, parsed):
+        """Take the replies to the open probe out of a batch of ParsedLines.
+        Returns the set of sequence numbers that were probe replies."""
+        if self._pending is None:
+            return ()
+        hidden = set()
+        for line in parsed:
+            match = _REPLY_RE.search(_COLOR_RE.sub("", line.message).strip())
+            if not match:
+                continue
+            hidden.add(line.seq)
+            self._record(match, line.timestamp)
+        self.lines_hidden += len(hidden)
+        return hidden
+
+    def _record(self, match, timestamp):
+        kind = match.lastgroup
+        if kind in ("tps_old", "mspt_new"):
+            dimension = match.group("dim_old") or match.group("dim_new") or "overall"
+            if match.group("overall_old") or dimension.lower() == "overall":
+                dimension = "overall"
+            self._add(f"{dimension}.tps", timestamp, match.group("tps_old") or match.group("tps_new"))
+            self._add(f"{dimension}.mspt", timestamp, match.group("mspt_old") or match.group("mspt_new"))
+        elif kind == "paper_tps":
+            self._add("overall.tps", timestamp, match.group(kind))
+        elif kind == "paper_mspt" and self._pending == "mspt":
+            self._add("overall.mspt", timestamp, match.group(kind))
+        elif kind == "vanilla_mspt":
+            self._add("overall.mspt", timestamp, match.group(kind))
+        elif kind == "max_players":
+            self._add("players.online", timestamp, match.group("players"))
+            self._add("players.max", timestamp, match.group("max_players"))
+        elif kind == "unknown":
+            self.unsupported.add(self._pending)
+
+    def _add(self, name, timestamp, value):
+        ring = self.series.get(name)
+        if ring is None:
+            ring = self.series[name] = MetricRing(("value",), SERIES_CAPACITY)
+        ring.append(timestamp, {"value": float(value)})
+
+    # Safe from any thread
+
+    def latest(self):
+        return {name: ring.latest()["value"] for name, ring in list(self.series.items()) if ring.count}
+
+    def is_lagging(self):
+        latest = self.latest()
+        if latest.get("overall.tps", 20.0) < LAG_TPS or latest.get("overall.mspt", 0.0) > LAG_MSPT:
+            return True
+        last_lag = self.log_parser.last_lag
+        return last_lag is not None and time.time() - last_lag.timestamp < self.interval
+
+    def current_interval(self):
+        if self.is_lagging():
+            return max(MIN_PROBE_INTERVAL, self.interval / LAG_INTERVAL_DIVISOR)
+        return self.interval
+
+    def query(self, names=None, seconds=600, buckets=60):
+        """Downsampled series (see MetricRing.downsample) for the given names, or all of them."""
+        since = time.time() - seconds
+        series = {name: ring.downsample(since=since, buckets=buckets)
+                  for name, ring in list(self.series.items()) if not names or name in names}
+        return {
+            "series": {name: {"timestamps": data["timestamps"], **data["value"]} for name, data in series.items()},
+            "latest": self.latest(),
+            "lagging": self.is_lagging(),
+            "interval": self.current_interval() if self._task else None,
+            "commands": self.commands,
+            "unsupported_commands": sorted(self.unsupported),
+            "probes_sent": self.probes_sent,
+            "lines_hidden": self.lines_hidden,
+        }
@@ -0,0 +1,417 @@
+import glob
+import gzip
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+
+from history_analyzer import process_map
+
+# Anvil region files: 32x32 chunks, a header of 1024 locations (3-byte sector offset and a
+# sector count) followed by 1024 save timestamps, and the chunks in 4 KiB sectors
+SECTOR = 4096
+HEADER_SIZE = 2 * SECTOR
+CHUNKS_PER_REGION = 1024
+COMPRESSION_NAMES = {1: "gzip", 2: "zlib", 3: "none", 4: "lz4"}
+# Set on the compression byte when the chunk did not fit and lives in c.<x>.<z>.mcc instead
+EXTERNAL_FLAG = 128
+# Chunks kept per region (and ranking) in the cache; a scan's top can't exceed it
+TOP_PER_REGION = 64
+MAX_ERRORS = 20
+# Bump when the cached region summaries change
+CACHE_VERSION = 1
+
+# Region directories of all dimensions, relative to a world directory
+_REGION_PATTERNS = ("region", "DIM*/region", "dimensions/*/*/region")
+# NBT lists counted per chunk. Entities moved to entities/*.mca in 1.17, "Level" went away in 1.18
+_ENTITY_LISTS = {b"Entities": "entities", b"block_entities": "block_entities", b"TileEntities": "block_entities"}
+_FIXED_SIZES = {1: 1, 2: 2, 3: 4, 4: 8, 5: 4, 6: 8}
+_ARRAY_SIZES = {7: 1, 11: 4, 12: 8}
+_INT = struct.Struct(">i")
+_USHORT = struct.Struct(">H")
+
+
+def find_region_dirs(server_dir):
+    """(label, region directory) for every dimension of every world in the server directory."""
+    dirs = []
+    for world in sorted(os.listdir(server_dir)):
+        world_dir = os.path.join(server_dir, world)
+        if not os.path.isdir(world_dir) or not (world.startswith("world")
+                                                or os.path.exists(os.path.join(world_dir, "level.dat"))):
+            continue
+        for pattern in _REGION_PATTERNS:
+            for region_dir in sorted(glob.glob(os.path.join(world_dir, pattern))):
+                label = os.path.relpath(os.path.dirname(region_dir), server_dir).replace(os.sep, "/")
+                dirs.append((label, region_dir))
+    return dirs
+
+
+def region_coords(path):
+    """'r.-1.2.mca' -> (-1, 2), or None for other files."""
+    parts = os.path.basename(path).split(".")
+    if len(parts) != 4 or parts[0] != "r" or parts[3] != "mca":
+        return None
+    try:
+        return int(parts[1]), int(parts[2])
+    except ValueError:
+        return None
+
+
+def _chunk_locations(mm):
+    """(index, byte offset, sectors, timestamp) of every chunk present in a mapped region file."""
+    for index in range(CHUNKS_PER_REGION):
+        entry = mm[index * 4:index * 4 + 4]
+        sectors = entry[3]
+        offset = int.from_bytes(entry[:3], "big") * SECTOR
+        if not sectors and not offset:
+            continue
+        timestamp = _INT.unpack_from(mm, SECTOR + index * 4)[0]
+        yield index, offset, sectors, timestamp
+
+
+def _open_region(path):
+    """Read-only memory map of a region file, or None if it has no complete header yet."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER_SIZE:
+            return None, size
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), size
+
+
+def read_region_header(path):
+    """Sizes of all chunks in a region file, from the header and each chunk's length field.
+
+    Only the header and the 5 bytes in front of each chunk are touched, so this is cheap
+    even for large files. The server may be writing the file meanwhile, so chunks
+    pointing past the end of the file are counted as corrupt rather than failing the scan.
+    """
+    rx, rz = region_coords(path)
+    mm, size = _open_region(path)
+    chunks = []
+    corrupt = 0
+    if mm is None:
+        return {"chunks": chunks, "corrupt": corrupt, "size": size}
+    with mm:
+        for index, offset, sectors, timestamp in _chunk_locations(mm):
+            if offset < HEADER_SIZE or offset + 5 > size:
+                corrupt += 1
+                continue
+            length = _INT.unpack_from(mm, offset)[0]
+            compression = mm[offset + 4]
+            x, z = rx * 32 + index % 32, rz * 32 + index // 32
+            external = bool(compression & EXTERNAL_FLAG)
+            if external:
+                try:
+                    compressed = os.path.getsize(os.path.join(os.path.dirname(path), f"c.{x}.{z}.mcc"))
+                except OSError:
+                    corrupt += 1
+                    continue
+            elif length < 1 or offset + 4 + length > size:
+                corrupt += 1
+                continue
+            else:
+                compressed = length - 1
+            chunks.append({"x": x, "z": z, "bytes": compressed, "sectors": sectors, "timestamp": timestamp,
+                           "compression": COMPRESSION_NAMES.get(compression & ~EXTERNAL_FLAG, "unknown"),
+                           "external": external})
+    return {"chunks": chunks, "corrupt": corrupt, "size": size}
+
+
+def _chunk_nbt(mm, path, offset, size, x, z):
+    """Decompressed NBT of one chunk, or None for compressions this can't read (lz4)."""
+    length = _INT.unpack_from(mm, offset)[0]
+    compression = mm[offset + 4]
+    if compression & EXTERNAL_FLAG:
+        with open(os.path.join(os.path.dirname(path), f"c.{x}.{z}.mcc"), "rb") as f:
+            data = f.read()
+    else:
+        if length < 1 or offset + 4 + length > size:
+            raise ValueError("chunk extends past the end of the file")
+        data = mm[offset + 5:offset + 4 + length]
+    compression &= ~EXTERNAL_FLAG
+    if compression == 2:
+        return zlib.decompress(data)
+    if compression == 1:
+        return gzip.decompress(data)
+    if compression == 3:
+        return data
+    return None
+
+
+def _count_region_file(path, chunks, types, errors):
+    """Add the entity and block entity counts of every chunk in a region file to chunks[(x, z)]."""
+    rx, rz = region_coords(path)
+    mm, size = _open_region(path)
+    if mm is None:
+        return
+    with mm:
+        for index, offset, sectors, timestamp in _chunk_locations(mm):
+            x, z = rx * 32 + index % 32, rz * 32 + index // 32
+            try:
+                data = _chunk_nbt(mm, path, offset, size, x, z)
+                if data is None:
+                    errors["unsupported_compression"] += 1
+                    continue
+                counts = {"entities": 0, "block_entities": 0, "types": Counter()}
+                # Root compound: type byte, name, payload
+                _scan_compound(data, 3 + _USHORT.unpack_from(data, 1)[0], counts, 0)
+            except (OSError, ValueError, IndexError, struct.error, zlib.error, EOFError):
+                errors["unreadable_chunks"] += 1
+                continue
+            chunk = chunks.setdefault((x, z), {"x": x, "z": z, "entities": 0, "block_entities": 0, "types": Counter()})
+            chunk["entities"] += counts["entities"]
+            chunk["block_entities"] += counts["block_entities"]
+            chunk["types"].update(counts["types"])
+            types.update(counts["types"])
+
+
+def count_region_entities(region_path, entities_path):
+    """Entities and block entities per chunk of one region; runs in a worker process.
+    entities_path is the matching entities/*.mca file of 1.17+ worlds, if there is one."""
+    chunks = {}
+    types = Counter()
+    errors = Counter()
+    for path in (region_path, entities_path):
+        if path:
+            try:
+                _count_region_file(path, chunks, types, errors)
+            except OSError:
+                errors["unreadable_files"] += 1
+    for chunk in chunks.values():
+        chunk["types"] = dict(chunk["types"].most_common(5))
+    by_entities = sorted(chunks.values(), key=lambda chunk: -chunk["entities"])[:TOP_PER_REGION]
+    by_block_entities = sorted(chunks.values(), key=lambda chunk: -chunk["block_entities"])[:TOP_PER_REGION]
+    return {
+        "entities": sum(chunk["entities"] for chunk in chunks.values()),
+        "block_entities": sum(chunk["block_entities"] for chunk in chunks.values()),
+        "types": dict(types),
+        "top_chunks": list({(chunk["x"], chunk["z"]): chunk for chunk in by_entities + by_block_entities}.values()),
+        "errors": dict(errors),
+    }
+
+
+def _skip(data, pos, tag):
+    """Position after the payload of a tag starting at pos."""
+    if tag in _FIXED_SIZES:
+        return pos + _FIXED_SIZES[tag]
+    if tag in _ARRAY_SIZES:
+        return pos + 4 + _INT.unpack_from(data, pos)[0] * _ARRAY_SIZES[tag]
+    if tag == 8:
+        return pos + 2 + _USHORT.unpack_from(data, pos)[0]
+    if tag == 9:
+        item = data[pos]
+        count = _INT.unpack_from(data, pos + 1)[0]
+        pos += 5
+        if item in _FIXED_SIZES:
+            return pos + count * _FIXED_SIZES[item]
+        for _ in range(count):
+            pos = _skip(data, pos, item)
+        return pos
+    if tag == 10:
+        while True:
+            child = data[pos]
+            if child == 0:
+                return pos + 1
+            pos = _skip(data, pos + 3 + _USHORT.unpack_from(data, pos + 1)[0], child)
+    raise ValueError(f"unknown NBT tag {tag}")
+
+
+def _scan_compound(data, pos, counts, depth):
+    """Count the entity lists of a chunk compound (and of its "Level" compound before 1.18),
+    skipping everything else without building Python objects for it."""
+    while True:
+        tag = data[pos]
+        if tag == 0:
+            return pos + 1
+        name_length = _USHORT.unpack_from(data, pos + 1)[0]
+        name = data[pos + 3:pos + 3 + name_length]
+        pos += 3 + name_length
+        if tag == 9 and name in _ENTITY_LISTS and data[pos] == 10:
+            count = _INT.unpack_from(data, pos + 1)[0]
+            counts[_ENTITY_LISTS[name]] += count
+            pos += 5
+            for _ in range(count):
+                pos = _entity_id(data, pos, counts["types"])
+        elif tag == 10 and name == b"Level" and depth == 0:
+            pos = _scan_compound(data, pos, counts, 1)
+        else:
+            pos = _skip(data, pos, tag)
+
+
+def _entity_id(data, pos, types):
+    """Count the "id" of one entity compound; returns the position after it."""
+    while True:
+        tag = data[pos]
+        if tag == 0:
+            return pos + 1
+        name_length = _USHORT.unpack_from(data, pos + 1)[0]
+        name = data[pos + 3:pos + 3 + name_length]
+        pos += 3 + name_length
+        if tag == 8 and name == b"id":
+            length = _USHORT.unpack_from(data, pos)[0]
+            types[data[pos + 2:pos + 2 + length].decode("utf-8", errors="replace")] += 1
+            pos += 2 + length
+        else:
+            pos = _skip(data, pos, tag)
+
+
+class RegionScanner:
+    """Finds oversized chunks and entity hotspots in a server's region files.
+
+    The headers of world*/region/*.mca (and of the other dimensions) are read through
+    read-only memory maps, which gives every chunk's compressed size without reading the
+    chunks themselves. With count_entities, every chunk is also decompressed and its
+    entities and block entities counted, one region file per worker process. Only files
+    are opened for reading, so the scan is safe while the server runs. Region summaries
+    are cached by mtime and size, so a rescan only reads the regions saved since.
+    """
+
+    def __init__(self, cache_file, workers=None):
+        self.cache_file = cache_file
+        self.workers = workers
+        self.last_result = None
+        self._cache = None
+        self._lock = threading.Lock()
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                cache = json.load(f)
+            if cache.get("version") == CACHE_VERSION:
+                return cache["regions"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, AttributeError):
+            pass
+        return {}
+
+    def _save_cache(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(self.cache_file, 'w') as f:
+                json.dump({"version": CACHE_VERSION, "regions": self._cache}, f)
+        except IOError:
+            pass
+
+    def scan(self, server_dir, top=20, count_entities=False, dimension=None):
+        """Rank the chunks of every dimension (or those whose label contains dimension).
+        Blocks while changed regions are read."""
+        top = min(top, TOP_PER_REGION)
+        with self._lock:
+            started = time.monotonic()
+            if self._cache is None:
+                self._cache = self._load_cache()
+            current = {}
+            header_todo = 0
+            entity_todo = []
+            errors = []
+            for label, region_dir in find_region_dirs(server_dir):
+                if dimension and dimension not in label:
+                    continue
+                entities_dir = os.path.join(os.path.dirname(region_dir), "entities")
+                for path in sorted(glob.glob(os.path.join(region_dir, "r.*.*.mca"))):
+                    if region_coords(path) is None:
+                        continue
+                    entities_path = os.path.join(entities_dir, os.path.basename(path))
+                    try:
+                        stat = os.stat(path)
+                        entities_stat = os.stat(entities_path) if os.path.exists(entities_path) else None
+                    except OSError:
+                        continue
+                    stamp = [stat.st_mtime, stat.st_size,
+                             entities_stat.st_mtime if entities_stat else None]
+                    entry = self._cache.get(path)
+                    if not entry or entry["stamp"][:2] != stamp[:2]:
+                        try:
+                            header = read_region_header(path)
+                        except (OSError, ValueError) as e:
+                            if len(errors) < MAX_ERRORS:
+                                errors.append(f"{path}: {e}")
+                            continue
+                        header_todo += 1
+                        chunks = sorted(header["chunks"], key=lambda chunk: -chunk["bytes"])
+                        entry = {"stamp": stamp, "label": label, "chunks": len(chunks), "corrupt": header["corrupt"],
+                                 "bytes": sum(chunk["bytes"] for chunk in chunks),
+                                 "largest": chunks[:TOP_PER_REGION], "entities": None}
+                    elif entry["stamp"] != stamp:
+                        # Only the entities file changed
+                        entry = {**entry, "stamp": stamp, "entities": None}
+                    current[path] = entry
+                    if count_entities and entry["entities"] is None:
+                        entity_todo.append((path, entities_path if entities_stat else None))
+            results = process_map(count_region_entities, entity_todo, self.workers)
+            for (path, _), counts in zip(entity_todo, results):
+                current[path]["entities"] = counts
+            # Regions of the dimensions not scanned stay cached; deleted regions drop out
+            for path, entry in self._cache.items():
+                if path not in current and dimension and dimension not in entry["label"]:
+                    current[path] = entry
+            self._cache = current
+            if header_todo or entity_todo:
+                self._save_cache()
+            selected = {path: entry for path, entry in current.items() if not dimension or dimension in entry["label"]}
+            result = summarize(selected, top, count_entities)
+            result.update({
+                "server_dir": server_dir,
+                "regions_scanned": header_todo,
+                "regions_counted": len(entity_todo),
+                "regions_cached": len(selected) - header_todo,
+                "errors": errors,
+                "duration_s": round(time.monotonic() - started, 3),
+                "scanned_at": time.time(),
+            })
+            self.last_result = result
+            return result
+
+
+def summarize(regions, top=20, count_entities=False):
+    """Rank the chunks of the cached region summaries (path -> entry)."""
+    dimensions = {}
+    largest = []
+    hotspots = []
+    types = Counter()
+    entity_errors = Counter()
+    for path, entry in regions.items():
+        region = os.path.basename(path)
+        dim = dimensions.setdefault(entry["label"], {"regions": 0, "chunks": 0, "bytes": 0, "corrupt_chunks": 0})
+        dim["regions"] += 1
+        dim["chunks"] += entry["chunks"]
+        dim["bytes"] += entry["bytes"]
+        dim["corrupt_chunks"] += entry["corrupt"]
+        largest.extend({**chunk, "dimension": entry["label"], "region": region} for chunk in entry["largest"][:top])
+        if count_entities and entry["entities"]:
+            counts = entry["entities"]
+            dim["entities"] = dim.get("entities", 0) + counts["entities"]
+            dim["block_entities"] = dim.get("block_entities", 0) + counts["block_entities"]
+            types.update(counts["types"])
+            entity_errors.update(counts["errors"])
+            hotspots.extend({**chunk, "dimension": entry["label"], "region": region} for chunk in counts["top_chunks"])
+    largest.sort(key=lambda chunk: -chunk["bytes"])
+    for chunk in largest[:top]:
+        _add_location(chunk)
+    result = {
+        "regions": len(regions),
+        "chunks": sum(dim["chunks"] for dim in dimensions.values()),
+        "bytes": sum(dim["bytes"] for dim in dimensions.values()),
+        "dimensions": dimensions,
+        "largest_chunks": largest[:top],
+    }
+    if count_entities:
+        entity_hotspots = sorted(hotspots, key=lambda chunk: -chunk["entities"])[:top]
+        block_entity_hotspots = sorted(hotspots, key=lambda chunk: -chunk["block_entities"])[:top]
+        for chunk in entity_hotspots + block_entity_hotspots:
+            _add_location(chunk)
+        result.update({
+            "entity_hotspots": entity_hotspots,
+            "block_entity_hotspots": block_entity_hotspots,
+            "entity_types": dict(types.most_common(top)),
+            "entity_errors": dict(entity_errors),
+        })
+    return result
+
+
+def _add_location(chunk):
+    # Block coordinates of the chunk's centre, e.g. for /tp
+    chunk["block"] = [chunk["x"] * 16 + 8, chunk["z"] * 16 + 8]
@@ -0,0 +1,259 @@
+import os
+import threading
+import time
+from array import array
+
+import psutil
+
+# Everything recorded per sample. I/O values are bytes per second over the last interval.
+METRIC_NAMES = ("cpu_percent", "rss", "vms", "threads", "open_files", "read_bytes", "write_bytes")
+DEFAULT_CAPACITY = 3600  # one hour at the default 1 s interval
+# Look for new or exited child processes every this many samples
+CHILD_REFRESH_INTERVAL = 10
+
+
+class MetricRing:
+    """Fixed-size time series stored in preallocated arrays of doubles.
+
+    One array holds the timestamps and one per metric holds the values, so memory use
+    is capacity * (metrics + 1) * 8 bytes regardless of how long sampling runs.
+    """
+
+    def __init__(self, names, capacity=DEFAULT_CAPACITY):
+        self.names = tuple(names)
+        self.capacity = capacity
+        self.times = array("d", [0.0]) * capacity
+        self.columns = {name: array("d", [0.0]) * capacity for name in self.names}
+        self.count = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def append(self, timestamp, values):
+        with self._lock:
+            slot = self._next
+            self.times[slot] = timestamp
+            for name in self.names:
+                self.columns[name][slot] = values.get(name, 0.0)
+            self._next = (slot + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def clear(self):
+        with self._lock:
+            self.count = 0
+            self._next = 0
+
+    def _slots(self, since=None):
+        """Ring slots in chronological order, optionally only those at or after since."""
+        start = (self._next - self.count) % self.capacity
+        slots = [(start + i) % self.capacity for i in range(self.count)]
+        if since is not None:
+            slots = [slot for slot in slots if self.times[slot] >= since]
+        return slots
+
+    def latest(self):
+        with self._lock:
+            if not self.count:
+                return None
+            slot = (self._next - 1) % self.capacity
+            values = {name: self.columns[name][slot] for name in self.names}
+            values["timestamp"] = self.times[slot]
+            return values
+
+    def values(self, name, since=None):
+        with self._lock:
+            column = self.columns[name]
+            return [column[slot] for slot in self._slots(since)]
+
+    def window(self, since, until=None):
+        """Samples taken between since and until as {"timestamps": [...], name: [...]}.
+
+        Timestamps grow along the ring, so the edges are found by binary search and only
+        the samples inside the window are touched.
+        """
+        with self._lock:
+            start = (self._next - self.count) % self.capacity
+
+            def first_at_or_after(timestamp):
+                low, high = 0, self.count
+                while low < high:
+                    middle = (low + high) // 2
+                    if self.times[(start + middle) % self.capacity] < timestamp:
+                        low = middle + 1
+                    else:
+                        high = middle
+                return low
+
+            end = self.count if until is None else first_at_or_after(until + 1e-9)
+            slots = [(start + i) % self.capacity for i in range(first_at_or_after(since), end)]
+            result = {"timestamps": [self.times[slot] for slot in slots]}
+            for name in self.names:
+                column = self.columns[name]
+                result[name] = [column[slot] for slot in slots]
+            return result
+
+    def downsample(self, names=None, since=None, buckets=60):
+        """Split the samples since the given time into equal time buckets.
+
+        Returns {"timestamps": [...], metric: {"min": [...], "max": [...], "avg": [...]}}
+        with one entry per non-empty bucket.
+        """
+        names = [name for name in (names or self.names) if name in self.columns]
+        with self._lock:
+            slots = self._slots(since)
+            if not slots:
+                return {"timestamps": [], **{name: {"min": [], "max": [], "avg": []} for name in names}}
+            first, last = self.times[slots[0]], self.times[slots[-1]]
+            width = max((last - first) / max(1, buckets), 1e-9)
+            groups = {}
+            for slot in slots:
+                bucket = min(int((self.times[slot] - first) / width), buckets - 1)
+                groups.setdefault(bucket, []).append(slot)
+            result = {"timestamps": [round(first + bucket * width, 3) for bucket in sorted(groups)]}
+            for name in names:
+                column = self.columns[name]
+                series = {"min": [], "max": [], "avg": []}
+                for bucket in sorted(groups):
+                    values = [column[slot] for slot in groups[bucket]]
+                    series["min"].append(min(values))
+                    series["max"].append(max(values))
+                    series["avg"].append(round(sum(values) / len(values), 3))
+                result[name] = series
+            return result
+
+
+class ProcessSampler:
+    """Samples resource usage of the server process and all of its children.
+
+    psutil.Process objects are kept between samples (cpu_percent() needs the previous
+    call as its reference) and the child list is only refreshed every few samples,
+    which keeps one sample down to a handful of system calls.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.series = MetricRing(METRIC_NAMES, capacity)
+        self.root_pid = None
+        self._processes = {}
+        self._samples = 0
+        self._last_io = None
+        self._last_time = None
+        self._lock = threading.Lock()
+        self.sample_cost = 0.0  # CPU seconds spent sampling, to keep an eye on our own overhead
+
+    def attach(self, pid):
+        """Start sampling a new server process tree."""
+        with self._lock:
+            self.root_pid = pid
+            self._processes = {}
+            self._samples = 0
+            self._last_io = None
+            self._last_time = None
+            try:
+                self._track(psutil.Process(pid))
+            except psutil.Error:
+                pass
+
+    def detach(self):
+        with self._lock:
+            self.root_pid = None
+            self._processes = {}
+
+    def _track(self, process):
+        if process.pid not in self._processes:
+            process.cpu_percent(None)  # prime the CPU counter
+            self._processes[process.pid] = process
+
+    def _refresh_children(self):
+        root = self._processes.get(self.root_pid)
+        if root is None:
+            return
+        try:
+            for child in root.children(recursive=True):
+                self._track(child)
+        except psutil.Error:
+            pass
+
+    def sample(self):
+        """Take one sample of the tracked process tree. Returns the values or None if nothing is attached."""
+        started = time.thread_time()
+        with self._lock:
+            if self.root_pid is None:
+                return None
+            if self._samples % CHILD_REFRESH_INTERVAL == 0:
+                self._refresh_children()
+            self._samples += 1
+            now = time.time()
+            totals = dict.fromkeys(METRIC_NAMES, 0.0)
+            io_read = io_write = 0
+            for pid, process in list(self._processes.items()):
+                try:
+                    with process.oneshot():
+                        totals["cpu_percent"] += process.cpu_percent(None)
+                        memory = process.memory_info()
+                        totals["rss"] += memory.rss
+                        totals["vms"] += memory.vms
+                        totals["threads"] += process.num_threads()
+                        totals["open_files"] += process.num_handles() if os.name == 'nt' else process.num_fds()
+                        if hasattr(process, "io_counters"):
+                            io = process.io_counters()
+                            io_read += io.read_bytes
+                            io_write += io.write_bytes
+                except psutil.Error:
+                    # Exited (or not accessible any more)
+                    del self._processes[pid]
+            if not self._processes:
+                self.root_pid = None
+                return None
+            if self._last_io is not None and now > self._last_time:
+                elapsed = now - self._last_time
+                totals["read_bytes"] = max(0, io_read - self._last_io[0]) / elapsed
+                totals["write_bytes"] = max(0, io_write - self._last_io[1]) / elapsed
+            self._last_io = (io_read, io_write)
+            self._last_time = now
+            self.series.append(now, totals)
+        self.sample_cost += time.thread_time() - started
+        return totals
+
+    def query(self, metrics=None, seconds=None, buckets=60):
+        since = time.time() - seconds if seconds else None
+        result = self.series.downsample(metrics, since, buckets)
+        result["latest"] = self.series.latest()
+        result["processes"] = len(self._processes)
+        return result
+
+
+class SamplerHub:
+    """One thread that samples every attached ProcessSampler each interval.
+
+    Shared by all servers of a supervisor, so sampling costs one thread no matter how
+    many servers there are. With nothing attached the thread sleeps until add().
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._samplers = []
+        self._changed = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="sampler-hub", daemon=True)
+        self._thread.start()
+
+    def add(self, sampler):
+        with self._changed:
+            if sampler not in self._samplers:
+                self._samplers.append(sampler)
+            self._changed.notify()
+
+    def remove(self, sampler):
+        with self._changed:
+            if sampler in self._samplers:
+                self._samplers.remove(sampler)
+
+    def _run(self):
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._samplers)
+                samplers = list(self._samplers)
+            started = time.monotonic()
+            for sampler in samplers:
+                if sampler.sample() is None and sampler.root_pid is None:
+                    # The process tree is gone
+                    self.remove(sampler)
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
@@ -0,0 +1,494 @@
+import os
+import threading
+import time
+
+from async_engine import AsyncEngine
+
+from log_store import LogStore, format_record, DEFAULT_MAX_LINES, DEFAULT_MAX_BYTES, SOURCE_SERVER, SOURCE_MANAGER
+from log_spool import LogSpool, DEFAULT_SEGMENT_BYTES, DEFAULT_MAX_BYTES as DEFAULT_SPOOL_MAX_BYTES
+from output_reader import OutputReader
+from server_process import spawn_server_process
+from log_index import LogIndex
+from log_parser import LogParser
+from resource_metrics import ProcessSampler, SamplerHub
+from command_channel import CommandChannel
+from server_lifecycle import ServerLifecycle, STOPPED, STARTING, READY, STOPPING, CRASHED
+from startup_profiler import StartupProfiler
+from probes import ProbeScheduler, DEFAULT_PROBE_COMMANDS, DEFAULT_PROBE_INTERVAL
+from lag_correlator import LagCorrelator
+from gc_log import GcLog, GC_LOG_FILE, GC_LOG_OPTION
+from history_analyzer import HistoryAnalyzer
+from region_scanner import RegionScanner
+from log_dedup import (LogDeduplicator, DEDUP_COLLAPSE, DEDUP_OFF, DEFAULT_DEDUP_MODE, DEFAULT_DEDUP_WINDOW,
+                       DEFAULT_MIN_REPEATS)
+from instrumentation import Instruments
+from console_mirror import ConsoleMirror
+import jvm_tuning
+
+DEFAULT_EXTRA_ARGS = "-XX:+UseG1GC -XX:+ParallelRefProcEnabled -XX:MaxGCPauseMillis=200"
+# Directory (next to the settings file) holding the on-disk copy of all output, one subdirectory per server
+SPOOL_DIR = "log_spool"
+# Directory (next to the settings file) holding each server's startup timing history
+STARTUP_HISTORY_DIR = "startup_history"
+# Directory (next to the settings file) caching the per-file results of the history analysis
+HISTORY_CACHE_DIR = "history_cache"
+# Directory (next to the settings file) caching the per-region results of the region scan
+REGION_CACHE_DIR = "region_cache"
+
+
+class ServerInstance:
+    """Everything needed to run and observe one Minecraft server, without any GUI.
+
+    Owns the server's settings profile, the process (through the lifecycle engine), the
+    output pipeline (reader -> log store -> parser -> index), the stdin command channel
+    and the resource sampler. A Supervisor holds one ServerInstance per configured
+    server; the Qt window and the headless mode get notified through the output, state
+    and clear listeners.
+
+    engine is the event loop that runs the process and its pipes; sampler_hub,
+    spool_writer and console are the supervisor's shared threads and instruments its
+    pipeline metrics. Without them the instance creates its own.
+    """
+
+    def __init__(self, server_id="default", data_dir=".", sampler_hub=None, spool_writer=None, engine=None,
+                 instruments=None, console=None):
+        self.server_id = server_id
+        self.server_jar_file = ""
+        self.java_path = "java"
+        self.min_ram = "1G"
+        self.max_ram = "4G"
+        self.extra_args = DEFAULT_EXTRA_ARGS
+        self.nogui = True
+        # Have the JVM write a GC log (GC_LOG_FILE in the server directory) and analyse it
+        self.gc_logging = False
+        # Mirror every output line to the terminal (written by the console thread)
+        self.console_mirror = True
+        self.console = console or ConsoleMirror()
+        # Timings of the output pipeline stages and queue depths, see instrumentation.py
+        self.instruments = instruments or Instruments()
+        # Called by save_settings() to persist the settings (the supervisor writes the settings file)
+        self.save_callback = None
+        self.engine = engine or AsyncEngine().start()
+        self.server_process = None
+        self.output_reader = None
+        self.output_task = None
+        # Every output line is also written to disk, so history survives the ring buffer and restarts
+        self.log_spool = LogSpool(os.path.join(os.path.abspath(data_dir), SPOOL_DIR, server_id), writer=spool_writer)
+        # All output lines live here; the GUI and the MCP tools both read from it.
+        # Numbering continues after the spooled history so sequence numbers stay unique.
+        self.log_store = LogStore(first_seq=self.log_spool.last_seq + 1)
+        self.log_index = LogIndex(self.log_store)
+        self.log_parser = LogParser()
+        # Collapses repeated lines; summaries of the repeats come back as manager lines
+        self.log_dedup = LogDeduplicator(self.engine, lambda summaries: self.append_lines(summaries, SOURCE_MANAGER))
+        # Times each boot phase and compares it with earlier boots
+        self.startup_profiler = StartupProfiler(
+            os.path.join(os.path.abspath(data_dir), STARTUP_HISTORY_DIR, f"{server_id}.json"))
+        # All stdin writes go through here
+        self.command_channel = CommandChannel(self.log_store, self.engine)
+        # Asks the server for TPS/MSPT/player counts while it is ready
+        self.probes = ProbeScheduler(self.engine, self.command_channel, self.log_parser)
+        self.sampler = ProcessSampler()
+        # Explains lag warnings with the log signals and resource usage just before them
+        self.lag_correlator = LagCorrelator(self.log_parser, self.sampler, self.probes, engine=self.engine)
+        self.gc_log = GcLog(self.engine)
+        self.gc_log.add_listener(lambda timestamp, ms, line: self.lag_correlator.add_signal(timestamp, "gc", line))
+        # Old logs and crash reports in the server directory
+        self.history_analyzer = HistoryAnalyzer(
+            os.path.join(os.path.abspath(data_dir), HISTORY_CACHE_DIR, f"{server_id}.json"))
+        # Chunk sizes and entity counts from the world's region files
+        self.region_scanner = RegionScanner(
+            os.path.join(os.path.abspath(data_dir), REGION_CACHE_DIR, f"{server_id}.json"))
+        self.sampler_hub = sampler_hub or SamplerHub()
+        self._output_listeners = []
+        self._state_listeners = []
+        self._clear_listeners = []
+        self._settings_listeners = []
+        # Output arrives from the reader on the loop and from other threads (manager messages);
+        # one batch at a time keeps seqs in order through the store, spool, index and listeners
+        self._pipeline_lock = threading.RLock()
+        # Start/stop/restart run on the event loop, never on the caller's thread
+        self.lifecycle = ServerLifecycle(self.engine, self._spawn_server, self._send_stop, self._on_lifecycle_state)
+        self.log_parser.add_listener(self._on_log_event)
+        self.instruments.gauge(f"{server_id}.spool_pending_lines", self.log_spool.pending)
+        self.instruments.gauge(f"{server_id}.pipe_backlog_bytes",
+                               lambda: self.output_reader.backlog_bytes if self.output_reader else None)
+
+    # Listeners
+
+    def add_output_listener(self, callback):
+        """Call callback(records) for every batch of new output lines (on the producing thread)."""
+        self._output_listeners.append(callback)
+
+    def add_state_listener(self, callback):
+        """Call callback(state, detail) after every lifecycle transition (on the event loop thread)."""
+        self._state_listeners.append(callback)
+
+    def add_clear_listener(self, callback):
+        """Call callback() when the retained output has been cleared."""
+        self._clear_listeners.append(callback)
+
+    def add_settings_listener(self, callback):
+        """Call callback() after the settings were saved, e.g. when an MCP tool changed them."""
+        self._settings_listeners.append(callback)
+
+    # Settings
+
+    def apply_settings(self, settings):
+        self.server_jar_file = settings.get("server_jar_file", "")
+        self.java_path = settings.get("java_path", "java")
+        self.min_ram = settings.get("min_ram", "1G")
+        self.max_ram = settings.get("max_ram", "4G")
+        self.extra_args = settings.get("extra_args", DEFAULT_EXTRA_ARGS)
+        self.nogui = settings.get("nogui", True)
+        self.gc_logging = settings.get("gc_logging", False)
+        self.console_mirror = settings.get("console_mirror", True)
+        self.log_store.resize(settings.get("log_max_lines", DEFAULT_MAX_LINES),
+                              settings.get("log_max_bytes", DEFAULT_MAX_BYTES))
+        self.log_spool.configure(settings.get("spool_segment_bytes", DEFAULT_SEGMENT_BYTES),
+                                 settings.get("spool_max_bytes", DEFAULT_SPOOL_MAX_BYTES))
+        self.probes.configure(settings.get("probe_commands", list(DEFAULT_PROBE_COMMANDS)),
+                              settings.get("probe_interval", DEFAULT_PROBE_INTERVAL),
+                              settings.get("probes_enabled", True))
+        self.log_dedup.configure(settings.get("dedup_mode", DEFAULT_DEDUP_MODE),
+                                 settings.get("dedup_window", DEFAULT_DEDUP_WINDOW),
+                                 settings.get("dedup_min_repeats", DEFAULT_MIN_REPEATS))
+
+    def settings(self):
+        return {
+            "server_jar_file": self.server_jar_file,
+            "java_path": self.java_path,
+            "min_ram": self.min_ram,
+            "max_ram": self.max_ram,
+            "extra_args": self.extra_args,
+            "nogui": self.nogui,
+            "gc_logging": self.gc_logging,
+            "console_mirror": self.console_mirror,
+            "log_max_lines": self.log_store.max_lines,
+            "log_max_bytes": self.log_store.max_bytes,
+            "spool_segment_bytes": self.log_spool.segment_bytes,
+            "spool_max_bytes": self.log_spool.max_bytes,
+            "probe_commands": self.probes.commands,
+            "probe_interval": self.probes.interval,
+            "probes_enabled": self.probes.enabled,
+            "dedup_mode": self.log_dedup.mode,
+            "dedup_window": self.log_dedup.window,
+            "dedup_min_repeats": self.log_dedup.min_repeats
+        }
+
+    def save_settings(self):
+        """Save current settings to the settings file."""
+        if not self.save_callback:
+            return
+        try:
+            self.save_callback()
+            self.log_output("Settings saved.")
+        except IOError as e:
+            self.log_output(f"Error saving settings: {e}")
+        for callback in self._settings_listeners:
+            callback()
+
+    # Output pipeline
+
+    def log_output(self, message):
+        self.append_lines([message], SOURCE_MANAGER)
+
+    def append_lines(self, lines, source=SOURCE_SERVER):
+        """Store a batch of output lines, parse and index them and notify the listeners."""
+        started = time.perf_counter()
+        count = len(lines)
+        try:
+            with self._pipeline_lock:
+                self._append_lines(lines, source)
+        finally:
+            self.instruments.observe("pipeline", time.perf_counter() - started, count)
+
+    def _append_lines(self, lines, source):
+        repeats = ()
+        if source == SOURCE_SERVER and self.log_dedup.mode != DEDUP_OFF:
+            # Nothing is collapsed while booting or while a command collects its reply
+            repeats = self.log_dedup.classify(
+                lines, allow=not self.startup_profiler.active and not self.command_channel.busy())
+            if repeats and self.log_dedup.mode == DEDUP_COLLAPSE:
+                skip = set(repeats)
+                lines = [line for index, line in enumerate(lines) if index not in skip]
+                repeats = ()
+                if not lines:
+                    return
+        # Display mode: the repeats stay in the store, spool and index, marked hidden
+        records = self.log_store.extend(lines, source=source, hidden=repeats)
+        started = time.perf_counter()
+        parsed = self.log_parser.feed(records)
+        self.log_index.add(parsed)
+        self.instruments.observe("parse", time.perf_counter() - started, len(records))
+        if source == SOURCE_SERVER:
+            self.lag_correlator.feed(parsed)
+            if self.startup_profiler.active:
+                self.startup_profiler.feed(parsed)
+        # Replies to the tick probes are kept, but hidden too
+        replies = self.probes.feed(parsed) if source == SOURCE_SERVER else ()
+        if replies:
+            records = self.log_store.hide(records, replies)
+        self.log_spool.append(records)
+        if repeats or replies:
+            records = [record for record in records if not record.hidden]
+            lines = [record.text for record in records]
+            if not records:
+                return
+        if self.console_mirror:
+            self.console.write([f"[{self.server_id}] {line}" for line in lines])
+        started = time.perf_counter()
+        for callback in self._output_listeners:
+            callback(records)
+        self.instruments.observe("dispatch", time.perf_counter() - started, len(records))
+
+    def logs_after(self, cursor, max_lines=500):
+        """Return the lines after cursor (a sequence number; 0 for the beginning), oldest first.
+
+        Lines still in the log store come from memory; older ones are read from the spool,
+        so a client that fell behind gets everything it missed. next_cursor is the value
+        to pass on the next call.
+        """
+        max_lines = max(1, max_lines)
+        if cursor + 1 >= self.log_store.first_seq:
+            records = self.log_store.since(cursor, max_lines + 1)
+        else:
+            records, _ = self.log_spool.read(since_seq=cursor, limit=max_lines + 1)
+        more = len(records) > max_lines
+        records = records[:max_lines]
+        shown = [record for record in records if not record.hidden]
+        return {
+            "logs": "\n".join(format_record(record) for record in shown),
+            "lines": len(shown),
+            "next_cursor": records[-1].seq if records else max(cursor, 0),
+            "more": more,
+            # Lines between cursor and the first returned one are gone (spool retention)
+            "skipped": bool(records) and records[0].seq > cursor + 1,
+        }
+
+    def wait_for_logs(self, cursor, timeout=30.0, max_lines=500):
+        """Like logs_after, but block up to timeout seconds until there is a line after cursor."""
+        self.log_store.wait_for(cursor, max(0.0, timeout))
+        return self.logs_after(cursor, max_lines)
+
+    def clear_output(self):
+        with self._pipeline_lock:
+            self.log_store.clear()
+            self.log_index.clear()
+        for callback in self._clear_listeners:
+            callback()
+
+    async def read_server_output(self, process):
+        """Stream the process' stdout into the pipeline until EOF. Runs on the event loop."""
+        self.log_output("*** Server output reader started ***")
+        try:
+            self.output_reader = OutputReader(process.stdout, self.append_lines, backlog=process.stdout_backlog,
+                                              instruments=self.instruments)
+            await self.output_reader.run_async()
+        except Exception as e:
+            self.log_output(f"[ERROR] Output reader crashed: {e}")
+        self.log_output("*** Server output reader ended ***")
+
+    # Process control
+
+    def is_server_running(self):
+        process = self.server_process
+        return process is not None and process.returncode is None
+
+    def jar_file_valid(self):
+        return bool(self.server_jar_file and os.path.exists(self.server_jar_file))
+
+    def build_launch(self):
+        """Build the server command from the current settings."""
+        server_dir = os.path.dirname(self.server_jar_file)
+        jar_filename = os.path.basename(self.server_jar_file)
+        command = [
+            self.java_path,
+            f"-Xms{self.min_ram}",
+            f"-Xmx{self.max_ram}"
+        ]
+
+        # Add extra args if specified
+        if self.extra_args:
+            command.extend(self.extra_args.split())
+
+        if self.gc_logging:
+            command.append(GC_LOG_OPTION)
+
+        # Add jar and nogui if needed
+        command.extend(["-jar", jar_filename])
+        if self.nogui:
+            command.append("--nogui")
+        return {"command": command, "cwd": server_dir, "jar": self.server_jar_file,
+                "gc_log": os.path.join(server_dir, GC_LOG_FILE) if self.gc_logging else None}
+
+    def check_java_settings(self):
+        """Validate the Java settings before a launch, logging what is wrong.
+        Returns False if the JVM would refuse them, so no boot is wasted on it.
+        Runs java -version the first time, so don't call it on the event loop."""
+        extra_args = f"{self.extra_args} {GC_LOG_OPTION}" if self.gc_logging else self.extra_args
+        result = jvm_tuning.validate(self.java_path, self.min_ram, self.max_ram, extra_args)
+        for warning in result["warnings"]:
+            self.log_output(f"[WARNING] {warning}")
+        for error in result["errors"]:
+            self.log_output(f"[ERROR] {error}")
+        return not result["errors"]
+
+    def start(self):
+        """Ask the lifecycle engine to start the server. Returns True if a start was requested."""
+        if not self.jar_file_valid():
+            self.log_output("Please select a valid JAR file first!")
+            return False
+        if self.lifecycle.is_running():
+            self.log_output("Server is already running!")
+            return False
+        if not self.check_java_settings():
+            self.log_output("Not starting the server: fix the Java settings first.")
+            return False
+        # Clear output before starting
+        self.clear_output()
+        self.log_parser.reset()
+        self.lag_correlator.reset()
+        self.log_dedup.reset()
+        self.save_settings()
+        self.lifecycle.start(self.build_launch())
+        return True
+
+    def stop(self):
+        """Ask the lifecycle engine to stop the server. Returns True if a stop was requested."""
+        if self.lifecycle.state not in (STARTING, READY):
+            self.log_output("Server is not running!")
+            return False
+        self.lifecycle.stop()
+        return True
+
+    def restart(self):
+        """Stop the server if it is running and start it again once the process has exited."""
+        if not self.jar_file_valid():
+            self.log_output("Please select a valid JAR file first!")
+            return False
+        if not self.check_java_settings():
+            self.log_output("Not restarting the server: fix the Java settings first.")
+            return False
+        self.log_output("Restarting server...")
+        self.log_parser.reset()
+        self.lag_correlator.reset()
+        self.log_dedup.reset()
+        self.save_settings()
+        self.lifecycle.restart(self.build_launch())
+        return True
+
+    async def _spawn_server(self, launch):
+        """Start the server process. Runs on the event loop."""
+        command, server_dir = launch["command"], launch["cwd"]
+        self.log_output(f"Command: {' '.join(command)}")
+
+        # The working directory is passed to the process rather than set with os.chdir(), which
+        # would affect every other server in this process.
+        # Start the server process with asyncio pipes; OutputReader decodes and splits
+        # lines itself, which is much faster than readline() in text mode
+        launched_at = time.time()
+        if launch.get("gc_log"):
+            # Before the process exists, so the previous run's log can still be told apart
+            self.gc_log.begin(launch["gc_log"], launched_at, command[1:])
+        process = await spawn_server_process(command, server_dir)
+        self.server_process = process
+        self.command_channel.attach(process.stdin)
+        self.startup_profiler.begin(command, launch["jar"], launched_at)
+
+        self.log_output(f"Starting server: {launch['jar']}")
+        # Resource usage is recorded by the shared sampler thread until the process exits
+        self.sampler.series.clear()
+        self.sampler.attach(process.pid)
+        self.sampler_hub.add(self.sampler)
+        self.output_task = self.engine.loop.create_task(self.read_server_output(process))
+        return process
+
+    def _send_stop(self):
+        self.log_output("Sending 'stop' command to server...")
+        self.command_channel.write("stop")
+
+    def _on_log_event(self, event):
+        if event.kind == "done":
+            self.lifecycle.mark_ready()
+
+    def _on_lifecycle_state(self, state, detail):
+        """Lifecycle transition callback. Runs on the event loop."""
+        if detail:
+            self.log_output(detail)
+        if state in (STOPPED, CRASHED):
+            # A boot that never reached "Done" is recorded, but left out of comparisons
+            self.startup_profiler.finish("crashed" if state == CRASHED else "stopped")
+            self.probes.stop()
+            self.gc_log.stop()
+            self.log_dedup.stop()
+            self.command_channel.detach()
+            self.sampler_hub.remove(self.sampler)
+            self.sampler.detach()
+            self.server_process = None
+        elif state == READY:
+            self.log_output("Server is now running")
+            self.probes.start()
+            self.log_dedup.start()
+        elif state == STOPPING:
+            # Leave the console to the stop command
+            self.probes.stop()
+        for callback in self._state_listeners:
+            callback(state, detail)
+
+    # Commands
+
+    def send_command(self, command):
+        """Send a command to the running server"""
+        if not self.is_server_running():
+            self.log_output("Server is not running! Cannot send command.")
+            return False
+
+        try:
+            self.command_channel.write(command)
+            self.log_output(f"Sent command: {command}")
+            return True
+        except Exception as e:
+            self.log_output(f"Error sending command: {e}")
+            return False
+
+    def execute_command(self, command, quiet_period=0.5, timeout=5.0):
+        """Send a command and return the server output it produced (see CommandChannel.execute).
+        Blocks while collecting, so never call it on the event loop."""
+        if not self.is_server_running():
+            return {"command": command, "error": "Server is not running"}
+        try:
+            self.log_output(f"Executing command: {command}")
+            return self.command_channel.execute(command, quiet_period, timeout)
+        except Exception as e:
+            self.log_output(f"Error sending command: {e}")
+            return {"command": command, "error": str(e)}
+
+    def analyze_history(self, top=20):
+        """Analyse the logs and crash reports in the server directory (see HistoryAnalyzer).
+        Blocks while new files are read, so never call it on the event loop."""
+        if not self.jar_file_valid():
+            return {"error": "No valid server JAR selected, so the server directory is unknown"}
+        return self.history_analyzer.analyze(os.path.dirname(os.path.abspath(self.server_jar_file)), top)
+
+    def scan_regions(self, top=20, count_entities=False, dimension=None):
+        """Rank the chunks of the server's worlds by size (see RegionScanner). Only reads the
+        region files, so it is safe while the server runs; never call it on the event loop."""
+        if not self.jar_file_valid():
+            return {"error": "No valid server JAR selected, so the server directory is unknown"}
+        return self.region_scanner.scan(os.path.dirname(os.path.abspath(self.server_jar_file)), top,
+                                        count_entities, dimension)
+
+    def shutdown(self, timeout=60):
+        """Stop the server (if running) and wait for it to exit. Used when the manager exits."""
+        if self.lifecycle.state in (STARTING, READY):
+            generation = self.lifecycle.generation
+            self.lifecycle.stop()
+            self.lifecycle.wait_for_state((STOPPED, CRASHED), timeout, generation)
+        self.close()
+
+    def close(self):
+        """Write out everything still queued for the log spool."""
+        self.instruments.gauge(f"{self.server_id}.spool_pending_lines", None)
+        self.instruments.gauge(f"{self.server_id}.pipe_backlog_bytes", None)
+        self.log_spool.close()
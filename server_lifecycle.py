@@ -0,0 +1,193 @@
+import threading
+import time
+
+STOPPED = "Stopped"
+STARTING = "Starting"
+READY = "Ready"
+STOPPING = "Stopping"
+CRASHED = "Crashed"
+STATES = (STOPPED, STARTING, READY, STOPPING, CRASHED)
+RUNNING_STATES = (STARTING, READY, STOPPING)
+
+# How long a server gets after "stop" before it is terminated, and after that before it is killed
+GRACEFUL_STOP_TIMEOUT = 30.0
+TERMINATE_TIMEOUT = 10.0
+
+
+class ServerLifecycle:
+    """Start/stop/restart state machine for one server process.
+
+        Stopped -> Starting -> Ready -> Stopping -> Stopped
+                      |          |                   (or Crashed on an unexpected exit)
+
+    All transitions run on the AsyncEngine's event loop, so callers on the GUI or MCP
+    side never block. Exit is detected by a task awaiting process.wait(), which wakes
+    the moment the process ends, and stop escalation uses loop timers rather than sleeps.
+
+    spawn(launch) is a coroutine that starts the process described by launch and
+    returns the asyncio Process. send_stop() asks the running server to shut down
+    (normally by writing "stop"); it runs on the loop and must not block.
+    on_state(state, detail) is called on the loop after every transition.
+    """
+
+    def __init__(self, engine, spawn, send_stop, on_state=None):
+        self.engine = engine
+        self.spawn = spawn
+        self.send_stop = send_stop
+        self.on_state = on_state
+        self.state = STOPPED
+        self.process = None
+        self.exit_code = None
+        self.state_since = time.time()
+        self.generation = 0  # bumped on every transition, so waiters can ignore the current state
+        self._launch = None
+        self._restart_pending = False
+        self._escalation = None  # loop timer handle while a stop is in progress
+        self._changed = threading.Condition()
+
+    # Requests, safe to call from any thread. They return immediately.
+
+    def start(self, launch):
+        self.engine.call(self._on_start, launch)
+
+    def stop(self):
+        self.engine.call(self._on_stop)
+
+    def restart(self, launch):
+        self.engine.call(self._on_restart, launch)
+
+    def mark_ready(self):
+        """Called when the server reports that it finished starting."""
+        self.engine.call(self._on_ready)
+
+    def is_running(self):
+        return self.state in RUNNING_STATES
+
+    def wait_for_state(self, states, timeout=None, after_generation=None):
+        """Block until the state is one of states. Returns True if it got there before timeout.
+
+        With after_generation, only states entered after that generation count, which
+        lets a caller wait for the outcome of a request it has just made. Never call this
+        on the event loop thread: the transitions it waits for run there.
+        """
+        if isinstance(states, str):
+            states = (states,)
+        with self._changed:
+            return self._changed.wait_for(
+                lambda: self.state in states and (after_generation is None or self.generation > after_generation),
+                timeout)
+
+    def status(self):
+        return {
+            "state": self.state,
+            "since": self.state_since,
+            "pid": self.process.pid if self.process else None,
+            "exit_code": self.exit_code,
+            "restart_pending": self._restart_pending,
+        }
+
+    # Event loop side
+
+    def _set_state(self, state, detail=""):
+        with self._changed:
+            self.state = state
+            self.state_since = time.time()
+            self.generation += 1
+            self._changed.notify_all()
+        if self.on_state:
+            self.on_state(state, detail)
+
+    def _on_start(self, launch):
+        if self.state in RUNNING_STATES:
+            return
+        self._launch = launch
+        self.exit_code = None
+        self._set_state(STARTING)
+        self.engine.loop.create_task(self._spawn_and_wait(launch))
+
+    async def _spawn_and_wait(self, launch):
+        try:
+            process = await self.spawn(launch)
+        except Exception as e:
+            self.process = None
+            self._set_state(STOPPED, f"Failed to start server: {e}")
+            return
+        self.process = process
+        if self.state == STOPPING:
+            # A stop arrived while the process was being created
+            self._begin_stop(force=True)
+        await process.wait()
+        self._on_exited(process)
+
+    def _on_ready(self):
+        if self.state == STARTING:
+            self._set_state(READY)
+
+    def _on_stop(self):
+        self._restart_pending = False
+        self._begin_stop()
+
+    def _on_restart(self, launch):
+        self._launch = launch
+        if self.state in (STARTING, READY):
+            self._restart_pending = True
+            self._begin_stop()
+        elif self.state == STOPPING:
+            self._restart_pending = True
+        else:
+            self._on_start(launch)
+
+    def _begin_stop(self, force=False):
+        if self.state not in (STARTING, READY) and not force:
+            return
+        if self.state != STOPPING:
+            self._set_state(STOPPING)
+        if self.process is None:
+            return  # still spawning; _spawn_and_wait comes back here
+        try:
+            self.send_stop()
+            self._schedule_escalation(GRACEFUL_STOP_TIMEOUT, "terminate")
+        except Exception as e:
+            self._set_state(STOPPING, f"Graceful stop failed: {e}. Forcing termination...")
+            self._escalate("terminate")
+
+    def _schedule_escalation(self, delay, action):
+        self._cancel_escalation()
+        self._escalation = self.engine.loop.call_later(delay, self._escalate, action)
+
+    def _cancel_escalation(self):
+        if self._escalation:
+            self._escalation.cancel()
+            self._escalation = None
+
+    def _escalate(self, action):
+        """A stop deadline passed: terminate first, then kill."""
+        self._escalation = None
+        process = self.process
+        if process is None or process.returncode is not None:
+            return
+        try:
+            if action == "terminate":
+                self._set_state(STOPPING, "Server did not stop in time. Terminating...")
+                process.terminate()
+                self._schedule_escalation(TERMINATE_TIMEOUT, "kill")
+            elif action == "kill":
+                self._set_state(STOPPING, "Force killing server process...")
+                process.kill()
+        except ProcessLookupError:
+            pass  # exited in the meantime; the wait task reports it
+
+    def _on_exited(self, process):
+        if process is not self.process:
+            return
+        self.exit_code = process.returncode
+        self.process = None
+        self._cancel_escalation()
+        if self.state == STOPPING:
+            self._set_state(STOPPED, f"Server process has ended with exit code: {self.exit_code}")
+        else:
+            self._set_state(CRASHED, f"Server process has ended unexpectedly with exit code: {self.exit_code}")
+        if self._restart_pending:
+            self._restart_pending = False
+            self._on_start(self._launch)
+
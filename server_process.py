@@ -0,0 +1,157 @@
+import asyncio
+import os
+import subprocess
+
+from output_reader import pipe_backlog
+
+# Bytes the stdout StreamReader buffers before it stops reading the pipe
+STDOUT_BUFFER_LIMIT = 2 ** 16
+
+
+async def spawn_server_process(command, cwd):
+    """Start command with piped stdin and stdout (stderr merged into stdout). Runs on the event loop."""
+    loop = asyncio.get_running_loop()
+    _, protocol = await loop.subprocess_exec(
+        lambda: ServerProcessProtocol(loop),
+        *command,
+        cwd=cwd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        # Don't create a window on Windows
+        creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+    )
+    return ServerProcess(protocol)
+
+
+class ServerProcessProtocol(asyncio.SubprocessProtocol):
+    """Hands stdout to a StreamReader and tracks stdin flow control and the exit.
+
+    Like the protocol behind asyncio.create_subprocess_exec, but built on the public
+    loop.subprocess_exec, which also gives access to the pipe transports. The transport
+    is closed once the process has exited and both pipes are closed.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.transport = None
+        self.stdout = asyncio.StreamReader(limit=STDOUT_BUFFER_LIMIT, loop=loop)
+        self.exited = loop.create_future()
+        self._open_pipes = set()
+        self._paused = False
+        self._drain_waiters = []
+        self._stdin_error = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        stdout = transport.get_pipe_transport(1)
+        if stdout is not None:
+            # Lets the reader pause the pipe while its buffer is full
+            self.stdout.set_transport(stdout)
+            self._open_pipes.add(1)
+        if transport.get_pipe_transport(0) is not None:
+            self._open_pipes.add(0)
+
+    def pipe_data_received(self, fd, data):
+        if fd == 1:
+            self.stdout.feed_data(data)
+
+    def pipe_connection_lost(self, fd, exc):
+        if fd == 0:
+            self._stdin_error = exc or ConnectionResetError("Server stdin is closed")
+            self._wake_drain_waiters()
+        elif fd == 1:
+            if exc is None:
+                self.stdout.feed_eof()
+            else:
+                self.stdout.set_exception(exc)
+        self._open_pipes.discard(fd)
+        self._maybe_close()
+
+    def pause_writing(self):
+        self._paused = True
+
+    def resume_writing(self):
+        self._paused = False
+        self._wake_drain_waiters()
+
+    def _wake_drain_waiters(self):
+        waiters, self._drain_waiters = self._drain_waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def drain(self):
+        if self._stdin_error is not None:
+            raise self._stdin_error
+        if self._paused:
+            waiter = self.loop.create_future()
+            self._drain_waiters.append(waiter)
+            await waiter
+            if self._stdin_error is not None:
+                raise self._stdin_error
+
+    def process_exited(self):
+        if not self.exited.done():
+            self.exited.set_result(self.transport.get_returncode())
+        self._maybe_close()
+
+    def _maybe_close(self):
+        if not self._open_pipes and self.exited.done():
+            self.transport.close()
+
+
+class ServerStdin:
+    """The server's stdin with the part of the StreamWriter API CommandChannel uses."""
+
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.transport = protocol.transport.get_pipe_transport(0)
+
+    def write(self, data):
+        self.transport.write(data)
+
+    def is_closing(self):
+        return self.transport.is_closing()
+
+    async def drain(self):
+        await self.protocol.drain()
+
+
+class ServerProcess:
+    """A running server process: the part of asyncio.subprocess.Process the manager uses
+    (pid, returncode, stdin, stdout, wait, terminate, kill), plus stdout_backlog()."""
+
+    def __init__(self, protocol):
+        self._protocol = protocol
+        self._transport = protocol.transport
+        self.pid = self._transport.get_pid()
+        self.stdin = ServerStdin(protocol)
+        self.stdout = protocol.stdout
+        # The stdout pipe object: a file on POSIX, a PipeHandle on Windows
+        self._stdout_pipe = self._transport.get_pipe_transport(1).get_extra_info("pipe")
+
+    @property
+    def returncode(self):
+        return self._transport.get_returncode()
+
+    async def wait(self):
+        return await asyncio.shield(self._protocol.exited)
+
+    def terminate(self):
+        self._transport.terminate()
+
+    def kill(self):
+        self._transport.kill()
+
+    def stdout_backlog(self):
+        """Bytes the server has written to stdout that were not read yet, or None if unknown."""
+        pipe = self._stdout_pipe
+        if pipe is None:
+            return None
+        try:
+            if os.name == 'nt':
+                return pipe_backlog(handle=pipe.handle)
+            return pipe_backlog(pipe.fileno())
+        except (AttributeError, OSError, ValueError):
+            return None
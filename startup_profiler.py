@@ -0,0 +1,197 @@
+import json
+import os
+import re
+import statistics
+import threading
+import time
+
+# Boot milestones recognised in the log, in the order they normally appear. Each one
+# starts a phase that lasts until the next milestone; the first match of each wins.
+_MILESTONE_RE = re.compile(
+    r"(?P<modlauncher>ModLauncher running|Loading Minecraft \S+ with Fabric Loader|Loading \d+ mods)"
+    r"|(?P<mod_stage>(?:ModLoadingStage|[Ll]oading stage)[:\s]+(?P<stage>[A-Z_]+))"
+    r"|(?P<server_version>Starting minecraft server version)"
+    r"|(?P<properties>Loading properties)"
+    r"|(?P<network>Starting Minecraft server on)"
+    r"|(?P<level>Preparing level \")"
+    r"|(?P<dimension>Preparing start region for dimension (?P<dim>\S+))"
+    r"|(?P<spawn_progress>Preparing spawn area: (?P<percent>\d+)%)"
+    r"|(?P<done>Done \((?P<reported>\d+(?:[.,]\d+)?)s\)!)"
+)
+
+# Runs kept per server, and runs a comparison uses as its baseline by default
+HISTORY_LIMIT = 50
+DEFAULT_BASELINE_RUNS = 10
+
+
+class StartupProfiler:
+    """Times the boot phases of a server from its log and keeps a run-over-run history.
+
+    begin() is called when the process is spawned, feed() gets the parsed lines while
+    the server is starting and finish() records the outcome. Each run is stored with
+    its phase durations and the JVM arguments it was started with, so compare() can
+    show which phase of which run regressed against the median of earlier runs.
+    """
+
+    def __init__(self, history_file):
+        self.history_file = history_file
+        self.history = []
+        self.current = None
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.history_file, 'r') as f:
+                self.history = json.load(f)[-HISTORY_LIMIT:]
+        except (FileNotFoundError, json.JSONDecodeError, TypeError):
+            self.history = []
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+            with open(self.history_file, 'w') as f:
+                json.dump(self.history[-HISTORY_LIMIT:], f, indent=1)
+        except IOError:
+            pass
+
+    @property
+    def active(self):
+        return self.current is not None
+
+    def begin(self, command, jar, started=None):
+        """Start timing a boot. command is the full java command line."""
+        started = started or time.time()
+        jar_index = command.index("-jar") if "-jar" in command else len(command)
+        with self._lock:
+            self._seen = set()
+            self.current = {
+                "started_at": started,
+                "jar": jar,
+                "jar_mtime": os.path.getmtime(jar) if os.path.exists(jar) else None,
+                "java": command[0] if command else "",
+                "jvm_args": command[1:jar_index],
+                "milestones": [{"name": "jvm_launch", "offset": 0.0}],
+                "spawn_progress": [],
+                "reported_seconds": None,
+                "outcome": None,
+            }
+
+    def feed(self, lines):
+        """Look for milestones in a batch of ParsedLines. Returns True when the boot finished."""
+        with self._lock:
+            run = self.current
+            if run is None:
+                return False
+            for line in lines:
+                if "first_output" not in self._seen:
+                    self._mark(run, "first_output", line.timestamp)
+                match = _MILESTONE_RE.search(line.message)
+                if not match:
+                    continue
+                kind = match.lastgroup
+                if kind == "mod_stage":
+                    self._mark(run, f"mod_stage:{match.group('stage')}", line.timestamp)
+                elif kind == "dimension":
+                    self._mark(run, f"dimension:{match.group('dim')}", line.timestamp)
+                elif kind == "spawn_progress":
+                    run["spawn_progress"].append(
+                        [round(line.timestamp - run["started_at"], 3), int(match.group("percent"))])
+                elif kind == "done":
+                    run["reported_seconds"] = float(match.group("reported").replace(",", "."))
+                    self._mark(run, "done", line.timestamp)
+                    self._finish("done")
+                    return True
+                else:
+                    self._mark(run, kind, line.timestamp)
+        return False
+
+    def _mark(self, run, name, timestamp):
+        if name in self._seen:
+            return
+        self._seen.add(name)
+        run["milestones"].append({"name": name, "offset": round(timestamp - run["started_at"], 3)})
+
+    def finish(self, outcome):
+        """End the current boot without a Done line (stopped or crashed while starting)."""
+        with self._lock:
+            if self.current is not None:
+                self._finish(outcome)
+
+    def _finish(self, outcome):
+        run = self.current
+        self.current = None
+        run["outcome"] = outcome
+        milestones = run["milestones"]
+        run["total_seconds"] = milestones[-1]["offset"]
+        # Each phase runs from its milestone to the next one
+        run["phases"] = {
+            milestone["name"]: round(following["offset"] - milestone["offset"], 3)
+            for milestone, following in zip(milestones, milestones[1:])
+        }
+        self.history.append(run)
+        del self.history[:-HISTORY_LIMIT]
+        self._save()
+
+    def compare(self, baseline_runs=DEFAULT_BASELINE_RUNS):
+        """Compare the latest completed boot with the median of the baseline_runs before it."""
+        with self._lock:
+            completed = [run for run in self.history if run["outcome"] == "done"]
+            in_progress = dict(self.current) if self.current else None
+        if not completed:
+            return {"latest": None, "in_progress": in_progress, "message": "No completed startup recorded yet"}
+        latest = completed[-1]
+        baseline = completed[-1 - baseline_runs:-1]
+        result = {
+            "latest": {key: latest[key] for key in
+                       ("started_at", "jar", "jvm_args", "total_seconds", "reported_seconds", "phases", "spawn_progress")},
+            "baseline_runs": len(baseline),
+            "in_progress": in_progress,
+        }
+        if not baseline:
+            return result
+        total_median = statistics.median(run["total_seconds"] for run in baseline)
+        result["baseline_total_seconds"] = round(total_median, 3)
+        result["total_change_percent"] = percent_change(latest["total_seconds"], total_median)
+        phases = []
+        for name, seconds in latest["phases"].items():
+            values = [run["phases"][name] for run in baseline if name in run["phases"]]
+            median = statistics.median(values) if values else None
+            phases.append({
+                "phase": name,
+                "seconds": seconds,
+                "baseline_seconds": round(median, 3) if median is not None else None,
+                "change_seconds": round(seconds - median, 3) if median is not None else None,
+                "change_percent": percent_change(seconds, median),
+            })
+        # Biggest regressions first
+        phases.sort(key=lambda phase: -(phase["change_seconds"] or 0))
+        result["phases"] = phases
+        previous = baseline[-1]
+        result["changes_since_previous_run"] = {
+            "jar_changed": previous["jar"] != latest["jar"] or previous.get("jar_mtime") != latest.get("jar_mtime"),
+            "jvm_args_added": [arg for arg in latest["jvm_args"] if arg not in previous["jvm_args"]],
+            "jvm_args_removed": [arg for arg in previous["jvm_args"] if arg not in latest["jvm_args"]],
+        }
+        return result
+
+    def summary(self, baseline_runs=DEFAULT_BASELINE_RUNS):
+        """One line for the GUI: the last boot time and how it compares with the baseline."""
+        report = self.compare(baseline_runs)
+        latest = report["latest"]
+        if latest is None:
+            return "Last startup: -"
+        text = f"Last startup: {latest['total_seconds']:.1f} s"
+        if report.get("baseline_total_seconds") is not None:
+            change = report["total_change_percent"]
+            # No percentage against a median of 0 s
+            change_text = "n/a" if change is None else f"{change:+.0f}%"
+            text += f" (median {report['baseline_total_seconds']:.1f} s, {change_text})"
+        return text
+
+
+def percent_change(value, baseline):
+    if not baseline:
+        return None
+    return round((value - baseline) / baseline * 100, 1)
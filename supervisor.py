@@ -0,0 +1,155 @@
+import json
+import os
+import re
+import threading
+
+from async_engine import AsyncEngine
+from console_mirror import ConsoleMirror
+from instrumentation import Instruments, SamplingProfiler
+from jvm_tuning import recommend, parse_size
+from log_spool import SpoolWriter
+from resource_metrics import SamplerHub
+from server_instance import ServerInstance
+from server_lifecycle import STARTING, READY, STOPPED, CRASHED
+
+DEFAULT_SERVER_ID = "default"
+# Server ids end up in directory names and MCP resource URIs
+SERVER_ID_RE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class Supervisor:
+    """Runs any number of named ServerInstances from one process.
+
+    settings.json holds one settings profile per server:
+
+        {"default_server": "lobby", "servers": {"lobby": {...}, "survival": {...}}}
+
+    A flat single-server settings file from older versions is loaded as the profile of
+    a server called "default". Processes, pipes and lifecycles of all servers run on
+    one AsyncEngine event loop, and resource sampling and log spool writing each run on
+    one thread shared by all servers, so a server costs no threads of its own; so does
+    mirroring output to the terminal. instruments collects the timings of the manager's
+    own hot paths and profiler samples them on request (get_manager_diagnostics).
+    The caller runs the engine (engine.start() or engine.run()).
+    """
+
+    def __init__(self, settings_file="settings.json", engine=None):
+        self.settings_file = os.path.abspath(settings_file)
+        self.data_dir = os.path.dirname(self.settings_file)
+        self.servers = {}
+        self.engine = engine or AsyncEngine()
+        self.default_server = DEFAULT_SERVER_ID
+        self.sampler_hub = SamplerHub()
+        self.spool_writer = SpoolWriter()
+        self.console = ConsoleMirror()
+        self.instruments = Instruments()
+        self.instruments.gauge("console_pending_lines", self.console.pending)
+        self.profiler = SamplingProfiler()
+        self._lock = threading.RLock()
+
+    # Settings
+
+    def load_settings(self):
+        """Load the server profiles from the settings file, creating one server if there are none."""
+        settings = {}
+        error = None
+        try:
+            if os.path.exists(self.settings_file):
+                with open(self.settings_file, 'r') as f:
+                    settings = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            error = f"Could not load settings: {e}"
+        profiles = settings.get("servers")
+        if profiles is None:
+            # Flat settings from the single-server manager
+            profiles = {DEFAULT_SERVER_ID: settings} if settings else {}
+        for server_id, profile in profiles.items():
+            self.add_server(server_id, profile)
+        if not self.servers:
+            self.add_server(DEFAULT_SERVER_ID)
+        default = settings.get("default_server")
+        self.default_server = default if default in self.servers else next(iter(self.servers))
+        for server in self.servers.values():
+            server.log_output(error or "Settings loaded.")
+
+    def save_settings(self):
+        """Write every server's profile to the settings file. Raises IOError on failure."""
+        with self._lock:
+            settings = {
+                "default_server": self.default_server,
+                "servers": {server_id: server.settings() for server_id, server in self.servers.items()},
+            }
+            with open(self.settings_file, 'w') as f:
+                json.dump(settings, f, indent=4)
+
+    # Servers
+
+    def add_server(self, server_id, settings=None):
+        """Create a server with the given settings profile and return it."""
+        if not SERVER_ID_RE.match(server_id or ""):
+            raise ValueError(f"Invalid server id {server_id!r}: use letters, digits, '.', '_' or '-'")
+        with self._lock:
+            if server_id in self.servers:
+                raise ValueError(f"Server {server_id!r} already exists")
+            server = ServerInstance(server_id, self.data_dir, self.sampler_hub, self.spool_writer, self.engine,
+                                    self.instruments, self.console)
+            if settings:
+                server.apply_settings(settings)
+            server.save_callback = self.save_settings
+            self.servers[server_id] = server
+            return server
+
+    def remove_server(self, server_id):
+        """Forget a stopped server. Its spooled logs stay on disk."""
+        with self._lock:
+            server = self.get(server_id)
+            if server.lifecycle.is_running():
+                raise ValueError(f"Server {server_id!r} is running; stop it first")
+            if len(self.servers) == 1:
+                raise ValueError("Cannot remove the last server")
+            del self.servers[server.server_id]
+            if self.default_server == server.server_id:
+                self.default_server = next(iter(self.servers))
+        server.close()
+        self.save_settings()
+
+    def get(self, server_id=""):
+        """Return the server with the given id, or the default server for an empty id."""
+        server = self.servers.get(server_id or self.default_server)
+        if server is None:
+            raise ValueError(f"Unknown server {server_id!r}; known servers: {', '.join(self.servers)}")
+        return server
+
+    def recommend_java_settings(self, server_id=""):
+        """Heap size and JVM flags for a server (see jvm_tuning.recommend), leaving the
+        heaps of the other servers out of the memory it can have."""
+        server = self.get(server_id)
+        others = sum(parse_size(other.max_ram) or 0 for other in list(self.servers.values()) if other is not server)
+        return recommend(server.java_path, others)
+
+    def list_servers(self):
+        return [
+            {"server_id": server_id, "default": server_id == self.default_server,
+             "jar": server.server_jar_file, **server.lifecycle.status()}
+            for server_id, server in list(self.servers.items())
+        ]
+
+    # Shutdown
+
+    def shutdown(self, timeout=60):
+        """Stop every running server, wait for all of them to exit and close the spools.
+        Blocks, so call it from a thread other than the event loop."""
+        waits = []
+        for server in list(self.servers.values()):
+            if server.lifecycle.state in (STARTING, READY):
+                waits.append((server, server.lifecycle.generation))
+                server.lifecycle.stop()
+        # The stops run concurrently; this only waits for them
+        for server, generation in waits:
+            server.lifecycle.wait_for_state((STOPPED, CRASHED), timeout, generation)
+        self.close()
+
+    def close(self):
+        for server in list(self.servers.values()):
+            server.close()
+        self.console.flush()
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# The manager's modules live at the top of the repository, next to this directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+
+@pytest.fixture
+def supervisor(tmp_path):
+    """A Supervisor with one server ("default") and its engine running, closed afterwards."""
+    from supervisor import Supervisor
+    supervisor = Supervisor(str(tmp_path / "settings.json"))
+    supervisor.engine.start()
+    server = supervisor.add_server("default")
+    server.console_mirror = False
+    yield supervisor
+    supervisor.close()
+
+
+@pytest.fixture
+def server(supervisor):
+    return supervisor.get()
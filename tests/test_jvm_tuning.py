@@ -0,0 +1,80 @@
+import os
+import stat
+
+import pytest
+
+from jvm_tuning import format_size, java_version, parse_size, recommend, validate
+
+GB = 1024 ** 3
+HOST = {"total_memory": 32 * GB, "available_memory": 24 * GB, "physical_cores": 8, "logical_cores": 16}
+
+
+def fake_java(tmp_path, version):
+    """A script that answers -version like a JDK would."""
+    path = tmp_path / f"java-{version}"
+    path.write_text(f'#!/bin/sh\necho \'openjdk version "{version}" 2023-10-17\' >&2\n'
+                    f"echo 'OpenJDK 64-Bit Server VM (build {version}, mixed mode)' >&2\n")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+needs_sh = pytest.mark.skipif(os.name == "nt", reason="fake java is a shell script")
+
+
+def test_parse_and_format_size():
+    assert parse_size("4G") == 4 * GB
+    assert parse_size(" 2048m ") == 2 * GB
+    assert parse_size("512") == 512
+    assert parse_size("4GB") is None
+    assert parse_size("") is None and parse_size(None) is None
+    assert format_size(6 * GB) == "6G"
+    assert format_size(1536 * 1024 * 1024) == "1536M"
+
+
+def test_missing_java_is_an_error():
+    result = validate("/nonexistent/java", "2G", "4G", "", host=HOST)
+    assert result["errors"][0].startswith("Java not found")
+
+
+@needs_sh
+def test_java_version_parses_old_and_new_schemes(tmp_path):
+    assert java_version(fake_java(tmp_path, "17.0.9"))["major"] == 17
+    assert java_version(fake_java(tmp_path, "1.8.0_392"))["major"] == 8
+
+
+@needs_sh
+def test_validate_sizes(tmp_path):
+    java = fake_java(tmp_path, "17.0.9")
+    assert validate(java, "2G", "4G", "", host=HOST)["errors"] == []
+    errors = validate(java, "8G", "4G", "", host=HOST)["errors"]
+    assert any("larger than Max RAM" in error for error in errors)
+    errors = validate(java, "2g", "4 gigs", "", host=HOST)["errors"]
+    assert any("Max RAM '4 gigs'" in error for error in errors)
+    assert any("more than this machine has" in error for error in validate(java, "2G", "64G", "", host=HOST)["errors"])
+    assert any("swapping" in warning for warning in validate(java, "2G", "28G", "", host=HOST)["warnings"])
+
+
+@needs_sh
+def test_validate_extra_args(tmp_path):
+    java = fake_java(tmp_path, "17.0.9")
+    errors = validate(java, "2G", "4G", "-XX:+UseG1GC -XX:+UseZGC", host=HOST)["errors"]
+    assert any("More than one garbage collector" in error for error in errors)
+    errors = validate(java, "2G", "4G", "nogui -XX:Broken", host=HOST)["errors"]
+    assert any("does not start with '-'" in error for error in errors)
+    assert any("Malformed JVM option" in error for error in errors)
+    errors = validate(java, "2G", "4G", "-XX:+UseConcMarkSweepGC -XX:+ZGenerational", host=HOST)["errors"]
+    assert any("CMS was removed" in error for error in errors)
+    assert any("needs Java 21" in error for error in errors)
+    warnings = validate(java, "2G", "4G", "-Xmx8G", host=HOST)["warnings"]
+    assert any("overrides the Min/Max RAM" in warning for warning in warnings)
+
+
+@needs_sh
+def test_recommend_leaves_room_for_the_system(tmp_path):
+    result = recommend(fake_java(tmp_path, "17.0.9"), host=HOST)
+    assert result["min_ram"] == result["max_ram"]
+    assert parse_size(result["max_ram"]) <= HOST["total_memory"] * 0.8
+    assert result["gc"].startswith("G1")
+    result = recommend(fake_java(tmp_path, "21.0.1"), host=HOST)
+    assert result["gc"] == "ZGC (generational)"
+    assert "-XX:+ZGenerational" in result["extra_args"]
@@ -0,0 +1,67 @@
+from lag_correlator import LagCorrelator
+from log_parser import LogParser
+from log_store import LogRecord
+from resource_metrics import ProcessSampler
+
+LAG = "[12:00:00] [Server thread/WARN]: Can't keep up! Is the server overloaded? Running {}ms or {} ticks behind"
+SAVE = "[12:00:00] [Server thread/INFO]: Saving chunks for level 'world'/minecraft:overworld"
+
+
+def correlator():
+    parser = LogParser()
+    lag = LagCorrelator(parser, ProcessSampler())
+    reports = []
+    lag.add_listener(reports.append)
+    return lag, reports
+
+
+def feed(lag, lines):
+    """lines are (seq, timestamp, text)."""
+    lag.feed(lag.log_parser.feed([LogRecord(seq, timestamp, text) for seq, timestamp, text in lines]))
+
+
+def signal(report, kind):
+    return next((entry for entry in report["signals"] if entry["signal"] == kind), None)
+
+
+def test_explains_with_signals_before_the_warning():
+    lag, reports = correlator()
+    feed(lag, [(1, 95.0, SAVE), (2, 96.0, SAVE), (3, 100.0, LAG.format(2500, 50)), (4, 100.0, SAVE)])
+    assert len(reports) == 1
+    report = reports[0]
+    assert (report["behind_ms"], report["ticks"], report["seq"]) == (2500, 50, 3)
+    # The save after the warning is not counted
+    assert signal(report, "save")["count"] == 2
+    assert report["summary"].startswith("Lag of 2500 ms (50 ticks): 2 world save lines")
+
+
+def test_baseline_lowers_the_score_of_usual_signals():
+    lag, reports = correlator()
+    usual = [(seq, 100.0 + seq, SAVE) for seq in range(1, 101)]
+    feed(lag, usual + [(101, 201.0, LAG.format(2500, 50))])
+    assert signal(reports[0], "save")["expected"] > 1
+
+
+def test_late_signals_are_put_in_time_order():
+    lag, reports = correlator()
+    feed(lag, [(1, 50.0, SAVE), (2, 99.5, SAVE)])
+    lag.add_signal(98.0, "gc", "Pause Young (Normal) 350ms")
+    lag.add_signal(101.0, "gc", "Pause Young (Normal) 20ms")
+    assert [entry[0] for entry in lag.signals] == [50.0, 98.0, 99.5, 101.0]
+    feed(lag, [(3, 100.0, LAG.format(3000, 60))])
+    assert signal(reports[0], "gc")["count"] == 1
+    assert reports[0]["signals"][0]["signal"] == "gc"
+
+
+def test_repeated_warnings_count_towards_the_first():
+    lag, reports = correlator()
+    feed(lag, [(1, 100.0, LAG.format(2500, 50)), (2, 102.0, LAG.format(2600, 52)), (3, 120.0, LAG.format(2000, 40))])
+    assert len(reports) == 2
+    assert reports[0]["repeats"] == 1
+
+
+def test_quiet_server_has_no_signals():
+    lag, reports = correlator()
+    feed(lag, [(1, 100.0, LAG.format(2500, 50))])
+    assert reports[0]["signals"] == []
+    assert "no unusual log activity" in reports[0]["summary"]
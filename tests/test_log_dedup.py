@@ -0,0 +1,74 @@
+from log_dedup import LogDeduplicator, line_source, normalize_message
+
+SPAM = "[12:00:{:02d}] [Server thread/WARN] [net.minecraft.Entity/]: Entity {} moved wrongly at 1.{}, 64.0"
+
+
+def spam(count, start=0):
+    return [SPAM.format(second % 60, second, second) for second in range(start, start + count)]
+
+
+def deduplicator(**kwargs):
+    return LogDeduplicator(None, emit=None, window=10.0, min_repeats=3, **kwargs)
+
+
+def test_normalize_message_removes_what_varies():
+    text = "Player 069a79f4-44e9-4726-a5be-fca90e38aaf5 at 12.5, -3 (0x1f3a, Foo@7c3df2a1)"
+    assert normalize_message(text) == "Player <uuid> at #, # (#, Foo#)"
+
+
+def test_line_source_prefers_the_logger():
+    assert line_source(SPAM.format(0, 1, 1)) == "net.minecraft.Entity"
+    assert line_source("[12:00:00] [Chunk worker 12/INFO]: hello") == "Chunk worker #"
+
+
+def test_repeats_after_min_repeats_are_collapsed():
+    dedup = deduplicator()
+    assert dedup.classify(spam(5), now=100.0) == [3, 4]
+    assert dedup.classify(spam(2, start=5), now=101.0) == [0, 1]
+    assert dedup.stats()["lines_collapsed"] == 4
+
+
+def test_run_ends_after_the_window():
+    dedup = deduplicator()
+    dedup.classify(spam(5), now=100.0)
+    # Quiet for longer than the window: the next occurrences are shown again
+    assert dedup.classify(spam(3, start=5), now=120.0) == []
+
+
+def test_stack_frames_follow_their_line():
+    dedup = deduplicator()
+    lines = []
+    for second in range(4):
+        lines += [SPAM.format(second, second, second), "\tat net.minecraft.Entity.move(Entity.java:1)",
+                  "Caused by: java.lang.IllegalStateException"]
+    assert dedup.classify(lines, now=100.0) == [9, 10, 11]
+
+
+def test_lines_the_manager_acts_on_are_never_collapsed():
+    dedup = deduplicator()
+    lines = [f"[12:00:{second:02d}] [Server thread/WARN]: Can't keep up! Is the server overloaded? "
+             f"Running {second}ms or 1 ticks behind" for second in range(6)]
+    assert dedup.classify(lines, now=100.0) == []
+
+
+def test_classify_without_allow_only_counts():
+    dedup = deduplicator()
+    assert dedup.classify(spam(6), now=100.0, allow=False) == []
+    assert dedup.top_spammers()[0]["count"] == 6
+
+
+def test_flush_reports_a_summary_per_run():
+    dedup = deduplicator()
+    dedup.classify(spam(7), now=100.0)
+    assert dedup.flush(now=105.0) == []
+    summaries = dedup.flush(now=111.0)
+    assert len(summaries) == 1
+    assert summaries[0].startswith("Repeated 4 more times (")
+    assert dedup.flush(now=200.0, everything=True) == []
+
+
+def test_top_spammers_by_source():
+    dedup = deduplicator()
+    dedup.classify(spam(4) + ["[12:00:00] [Server thread/INFO] [net.minecraft.Entity/]: other"], now=100.0)
+    top = dedup.top_spammers(by="source")
+    assert top == [dict(top[0], source="net.minecraft.Entity", count=5, messages=2, collapsed=1)]
@@ -0,0 +1,59 @@
+from log_index import LogIndex, compile_matcher, tokenize
+from log_parser import LogParser
+from log_store import LogStore
+
+
+def make_index(lines, max_lines=1000):
+    store = LogStore(max_lines=max_lines)
+    index = LogIndex(store)
+    index.add(LogParser().feed(store.extend(lines)))
+    return store, index
+
+
+LINES = [
+    "[12:00:00] [Server thread/INFO]: Preparing spawn area",
+    "[12:00:01] [Server thread/WARN]: Fetching addPacket for removed entity",
+    "[12:00:02] [Worker-Main-1/INFO]: Generated 12 chunks",
+    "[12:00:03] [Server thread/ERROR]: Exception ticking entity",
+    "[12:00:04] [Server thread/WARN]: Can't keep up!",
+]
+
+
+def texts(result):
+    return [match["text"] for match in result["matches"]]
+
+
+def test_tokenize_and_matcher():
+    assert tokenize("Fetching addPacket a1 for") == {"fetching", "addpacket", "for"}
+    assert compile_matcher("ENTITY")("removed entity")
+    assert not compile_matcher("ENTITY", case_sensitive=True)("removed entity")
+    assert compile_matcher(r"ticks? behind", regex=True)("2 ticks behind")
+
+
+def test_search_is_newest_first():
+    _, index = make_index(LINES)
+    assert texts(index.search("entity")) == [LINES[3], LINES[1]]
+
+
+def test_search_filters():
+    _, index = make_index(LINES)
+    assert texts(index.search(level="WARN")) == [LINES[4], LINES[1]]
+    assert texts(index.search(level="WARN,ERROR", thread="server")) == [LINES[4], LINES[3], LINES[1]]
+    assert texts(index.search(thread="Worker")) == [LINES[2]]
+    assert texts(index.search(r"Generated \d+", regex=True)) == [LINES[2]]
+    assert texts(index.search("keep up", level="INFO")) == []
+
+
+def test_search_limit_and_context():
+    _, index = make_index(LINES)
+    result = index.search("Server thread", limit=2, context=1)
+    assert result["truncated"] and len(result["matches"]) == 2
+    assert result["matches"][0]["before"] == [LINES[3]] and result["matches"][0]["after"] == []
+
+
+def test_evicted_lines_are_not_found():
+    store, index = make_index(LINES, max_lines=2)
+    assert texts(index.search("entity")) == [LINES[3]]
+    index.clear()
+    store.clear()
+    assert texts(index.search("entity")) == []
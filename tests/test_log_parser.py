@@ -0,0 +1,68 @@
+from log_parser import LogParser, parse_header
+from log_store import LogStore
+
+
+def feed(parser, store, lines):
+    return parser.feed(store.extend(lines))
+
+
+def test_parse_header_layouts():
+    assert parse_header("[12:34:56] [Server thread/INFO]: hello") == ("Server thread", "INFO")
+    assert parse_header("[12:34:56] [Server thread/WARN] [minecraft/DedicatedServer]: hi") == ("Server thread", "WARN")
+    assert parse_header("[17Oct2026 12:34:56.789] [main/ERROR] [net.minecraft.server.Main/]: x") == ("main", "ERROR")
+    assert parse_header("[12:34:56 INFO]: paper") == (None, "INFO")
+    assert parse_header("\tat some.Frame") == (None, None)
+
+
+def test_parsed_fields():
+    line = feed(LogParser(), LogStore(), ["[12:34:56] [Server thread/INFO] [minecraft/MinecraftServer]: msg"])[0]
+    assert (line.seq, line.time, line.thread, line.level, line.logger, line.message) == \
+        (1, "12:34:56", "Server thread", "INFO", "minecraft/MinecraftServer", "msg")
+    plain = feed(LogParser(), LogStore(), ["no header here"])[0]
+    assert plain.thread is None and plain.message == "no header here"
+
+
+def test_lag_join_leave_and_done_events():
+    parser, store = LogParser(), LogStore()
+    events = []
+    parser.add_listener(events.append)
+    feed(parser, store, [
+        "[12:00:00] [Server thread/INFO]: Done (12,5s)! For help, type \"help\"",
+        "[12:00:01] [Server thread/INFO]: Alex[/127.0.0.1:5555] joined the game",
+        "[12:00:02] [Server thread/INFO]: Steve joined the game",
+        "[12:00:03] [Server thread/WARN]: Can't keep up! Is the server overloaded? Running 2500ms or 50 ticks behind",
+        "[12:00:04] [Server thread/INFO]: Steve left the game",
+    ])
+    assert [event.kind for event in events] == ["done", "join", "join", "lag", "leave"]
+    assert parser.last_done.data == {"seconds": 12.5}
+    assert parser.last_lag.data == {"behind_ms": 2500, "ticks": 50}
+    assert parser.players_online == {"Alex"}
+    assert parser.counters["join"] == 2
+    assert [event["kind"] for event in parser.recent_events(kind="join")] == ["join", "join"]
+
+
+def test_exception_collects_its_stack_frames():
+    parser, store = LogParser(), LogStore()
+    feed(parser, store, [
+        "[12:00:00] [Server thread/ERROR]: java.lang.IllegalStateException: broken",
+        "\tat net.minecraft.Foo.bar(Foo.java:10)",
+        "Caused by: java.io.IOException: disk",
+        "\tat net.minecraft.Foo.baz(Foo.java:20)",
+        "[12:00:01] [Server thread/INFO]: next line",
+    ])
+    events = parser.recent_events(kind="exception")
+    assert len(events) == 1
+    data = events[0]
+    assert data["exception"] == "java.lang.IllegalStateException"
+    assert data["message"] == "broken"
+    assert data["thread"] == "Server thread"
+    assert data["frames"] == ["at net.minecraft.Foo.bar(Foo.java:10)", "at net.minecraft.Foo.baz(Foo.java:20)"]
+    assert data["caused_by"] == ["java.io.IOException"]
+
+
+def test_reset_forgets_players():
+    parser, store = LogParser(), LogStore()
+    feed(parser, store, ["[12:00:01] [Server thread/INFO]: Alex joined the game"])
+    parser.reset()
+    assert parser.players_online == set()
+    assert parser.counters["join"] == 1
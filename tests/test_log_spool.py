@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+import log_spool
+from log_spool import LogSpool, decode_lines, encode_records
+from log_store import LogRecord, SOURCE_MANAGER
+
+
+class IdleWriter:
+    """Stands in for SpoolWriter so the tests decide when a spool is flushed."""
+
+    def add(self, spool):
+        pass
+
+    def remove(self, spool):
+        pass
+
+    def wake(self):
+        pass
+
+
+def records(first, count, timestamp=1000.0, step=1.0):
+    return [LogRecord(seq, timestamp + (seq - first) * step, f"line {seq}")
+            for seq in range(first, first + count)]
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = LogSpool(str(tmp_path / "spool"), writer=IdleWriter())
+    yield spool
+    spool.close()
+
+
+def test_encode_decode_round_trip():
+    batch = [LogRecord(1, 5.5, "tab\tin text"), LogRecord(2, 5.5, "manager", SOURCE_MANAGER),
+             LogRecord(3, 6.0, "probe reply", hidden=True)]
+    assert decode_lines(b"".join(encode_records(batch))) == batch
+
+
+def test_decode_skips_a_torn_line():
+    data = b"".join(encode_records(records(1, 2)))
+    assert [record.seq for record in decode_lines(data + b"3\t10")] == [1, 2]
+
+
+def test_read_by_seq_and_time(spool):
+    spool.append(records(1, 100))
+    result, more = spool.read(since_seq=90)
+    assert [record.seq for record in result] == list(range(91, 101))
+    assert not more
+    result, more = spool.read(since=1010.0, until=1014.0)
+    assert [record.seq for record in result] == [11, 12, 13, 14, 15]
+    result, more = spool.read(limit=10)
+    assert len(result) == 10 and more
+    assert spool.last_seq == 100
+
+
+def test_rotates_and_compresses_segments(spool):
+    spool.configure(segment_bytes=4096)
+    spool.append(records(1, 2000))
+    spool.flush()
+    stats = spool.stats()
+    assert stats["segments"] > 1
+    assert stats["lines_written"] == 2000
+    names = os.listdir(spool.directory)
+    assert any(name.endswith(log_spool.SEGMENT_SUFFIX) for name in names)
+    result, _ = spool.read(since_seq=1500, limit=10)
+    assert [record.seq for record in result] == list(range(1501, 1511))
+    result, _ = spool.read(limit=5000)
+    assert [record.seq for record in result] == list(range(1, 2001))
+
+
+def test_drops_oldest_segments_over_max_bytes(spool):
+    spool.configure(segment_bytes=4096, max_bytes=8192)
+    spool.append(records(1, 5000))
+    spool.flush()
+    assert spool.stats()["first_seq"] > 1
+    assert spool.last_seq == 5000
+
+
+def test_reopen_keeps_records_and_hidden_flags(tmp_path):
+    directory = str(tmp_path / "spool")
+    spool = LogSpool(directory, writer=IdleWriter())
+    batch = records(1, 10)
+    batch[4] = batch[4]._replace(hidden=True)
+    spool.append(batch)
+    spool.flush()
+    # No close(): the active segment is left behind as after a crash
+    reopened = LogSpool(directory, writer=IdleWriter())
+    result, _ = reopened.read()
+    assert result == batch
+    assert reopened.last_seq == 10
+    reopened.close()
+
+
+def test_failed_write_is_counted_and_the_next_batch_written(spool, monkeypatch):
+    spool.append(records(1, 5))
+    spool.flush()
+
+    def fail(batch):
+        raise OSError("disk full")
+    monkeypatch.setattr(spool, "_write", fail)
+    spool.append(records(6, 5))
+    spool.flush()
+    stats = spool.stats()
+    assert stats["lines_dropped"] == 5
+    assert stats["write_errors"] == 1
+    assert stats["last_error"] == "OSError: disk full"
+    monkeypatch.undo()
+    spool.append(records(11, 5))
+    result, _ = spool.read(since_seq=10)
+    assert [record.seq for record in result] == list(range(11, 16))
+
+
+def test_pending_lines_are_capped(spool, monkeypatch):
+    monkeypatch.setattr(log_spool, "MAX_PENDING_LINES", 10)
+    spool.append(records(1, 8))
+    spool.append(records(9, 8))
+    assert spool.pending() == 10
+    assert spool.stats()["lines_dropped"] == 6
+    spool.flush()
+    result, _ = spool.read()
+    assert result[0].seq == 7
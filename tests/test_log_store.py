@@ -0,0 +1,80 @@
+import threading
+
+from log_store import LogStore, RECORD_OVERHEAD, SOURCE_MANAGER, SOURCE_SERVER
+
+
+def test_sequence_numbers_keep_counting():
+    store = LogStore(max_lines=10)
+    first = store.extend(["a", "b"])
+    second = store.append("c", source=SOURCE_MANAGER)
+    assert [record.seq for record in first] == [1, 2]
+    assert second.seq == 3 and second.source == SOURCE_MANAGER
+    assert first[0].source == SOURCE_SERVER
+    store.clear()
+    assert store.append("d").seq == 4
+    assert store.first_seq == 4 and store.last_seq == 4
+
+
+def test_first_seq_continues_an_earlier_run():
+    store = LogStore(first_seq=100)
+    assert store.append("a").seq == 100
+    assert store.first_seq == 100
+
+
+def test_evicts_oldest_lines_over_the_line_budget():
+    store = LogStore(max_lines=3)
+    store.extend(["1", "2", "3", "4", "5"])
+    assert [record.text for record in store.snapshot()] == ["3", "4", "5"]
+    assert store.first_seq == 3 and store.last_seq == 5
+    assert store.get(2) is None and store.get(4).text == "4"
+    assert store.stats()["evicted"] == 2
+
+
+def test_evicts_oldest_lines_over_the_byte_budget():
+    store = LogStore(max_lines=100, max_bytes=2 * (RECORD_OVERHEAD + 10))
+    store.extend(["x" * 10] * 5)
+    assert store.stats()["lines"] == 2
+    assert store.stats()["bytes"] <= store.max_bytes
+
+
+def test_since_and_get_many():
+    store = LogStore(max_lines=4)
+    store.extend(["1", "2", "3", "4", "5", "6"])
+    assert [record.text for record in store.since(0)] == ["3", "4", "5", "6"]
+    assert [record.text for record in store.since(4, limit=1)] == ["5"]
+    assert [record and record.text for record in store.get_many([1, 3, 6, 7])] == [None, "3", "6", None]
+
+
+def test_resize_keeps_the_newest_lines():
+    store = LogStore(max_lines=5)
+    store.extend(["1", "2", "3", "4", "5"])
+    store.resize(max_lines=2)
+    assert [record.text for record in store.snapshot()] == ["4", "5"]
+    assert store.append("6").seq == 6
+
+
+def test_hidden_lines_are_kept_but_not_in_text():
+    store = LogStore()
+    records = store.extend(["shown", "repeat", "reply"], hidden=[1])
+    assert [record.hidden for record in records] == [False, True, False]
+    records = store.hide(records, {records[2].seq})
+    assert [record.hidden for record in records] == [False, True, True]
+    assert [record.hidden for record in store.snapshot()] == [False, True, True]
+    assert store.stats()["lines"] == 3
+    assert store.text().endswith("shown")
+    assert "repeat" not in store.text() and "reply" not in store.text()
+
+
+def test_hide_skips_evicted_records():
+    store = LogStore(max_lines=2)
+    old = store.extend(["old"])
+    store.extend(["a", "b"])
+    assert store.hide(old, {old[0].seq})[0].hidden
+    assert not any(record.hidden for record in store.snapshot())
+
+
+def test_wait_for_wakes_up_on_new_lines():
+    store = LogStore()
+    threading.Timer(0.05, store.append, ["late"]).start()
+    assert store.wait_for(0, timeout=5) == 1
+    assert store.wait_for(1, timeout=0.01) == 1
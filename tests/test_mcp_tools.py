@@ -0,0 +1,37 @@
+import json
+import time
+
+import pytest
+
+from log_dedup import DEDUP_DISPLAY
+from mcp_tools import MCP_AVAILABLE, create_mcp_server
+
+pytestmark = pytest.mark.skipif(not MCP_AVAILABLE, reason="the mcp package is not installed")
+
+SPAM = "[12:00:00] [Server thread/WARN]: Entity {} moved wrongly"
+
+
+@pytest.fixture
+def spammed(supervisor, server):
+    """An MCP server for a server that wrote ten repeats, seven of them hidden."""
+    server.log_dedup.configure(DEDUP_DISPLAY, 60, 3)
+    server.append_lines([SPAM.format(number) for number in range(10)])
+    return create_mcp_server(supervisor)
+
+
+def call(supervisor, mcp, tool, **arguments):
+    content = supervisor.engine.wait(mcp.call_tool(tool, arguments), timeout=30)
+    return json.loads(content[0].text)
+
+
+def test_get_server_logs_leaves_out_hidden_lines(supervisor, spammed):
+    assert call(supervisor, spammed, "get_server_logs")["logs"].count("moved wrongly") == 3
+    result = call(supervisor, spammed, "get_server_logs", cursor=0)
+    assert result["lines"] == 3 and result["next_cursor"] == 10
+    result = call(supervisor, spammed, "get_server_logs", since=time.time() - 60)
+    assert result["lines"] == 3
+
+
+def test_latest_logs_resource_leaves_out_hidden_lines(supervisor, spammed):
+    contents = supervisor.engine.wait(spammed.read_resource("minecraft://default/logs/latest"), timeout=30)
+    assert contents[0].content.count("moved wrongly") == 3
@@ -0,0 +1,67 @@
+import asyncio
+import os
+
+import pytest
+
+from output_reader import OutputReader, pipe_backlog
+
+
+def read_all(chunks, **kwargs):
+    """Run an OutputReader over a StreamReader fed with chunks; returns the batches and the reader."""
+    batches = []
+
+    async def run():
+        stream = asyncio.StreamReader()
+        for chunk in chunks:
+            stream.feed_data(chunk)
+        stream.feed_eof()
+        reader = OutputReader(stream, batches.append, encoding="utf-8", **kwargs)
+        await reader.run_async()
+        return reader
+    return batches, asyncio.run(run())
+
+
+def test_lines_split_across_chunks_are_joined():
+    batches, reader = read_all([b"first\r\nsec", b"ond\n\nthi", b"rd\n"], chunk_size=4)
+    assert [line for batch in batches for line in batch] == ["first", "second", "third"]
+    assert reader.stats()["lines_read"] == 3
+    assert reader.stats()["bytes_read"] == 21
+
+
+def test_multibyte_character_split_between_chunks():
+    data = "Grüße €\n".encode("utf-8")
+    reader = OutputReader(None, None, encoding="utf-8")
+    lines = []
+    for index in range(len(data)):
+        lines += reader.feed(data[index:index + 1])
+    assert lines == ["Grüße €"]
+
+
+def test_last_line_without_newline_is_counted_at_eof():
+    batches, reader = read_all([b"one\ntwo"])
+    assert batches[-1] == ["two"]
+    assert reader.stats()["lines_read"] == 2
+
+
+def test_backlog_is_sampled_per_chunk():
+    samples = iter([100, 300, 200])
+    batches, reader = read_all([b"ab\n"], chunk_size=1, backlog=lambda: next(samples))
+    stats = reader.stats()
+    assert stats["backlog_bytes"] == 200
+    assert stats["max_backlog_bytes"] == 300
+    _, reader = read_all([b"a\n"])
+    assert reader.stats()["backlog_bytes"] is None
+
+
+@pytest.mark.skipif(os.name == "nt", reason="FIONREAD on a pipe")
+def test_pipe_backlog_counts_unread_bytes():
+    read_fd, write_fd = os.pipe()
+    try:
+        os.write(write_fd, b"x" * 1000)
+        assert pipe_backlog(read_fd) == 1000
+        os.read(read_fd, 400)
+        assert pipe_backlog(read_fd) == 600
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+    assert pipe_backlog(read_fd) is None
@@ -0,0 +1,72 @@
+from log_parser import LogParser
+from log_store import LogStore
+from probes import ProbeScheduler
+
+
+def reply(command, lines):
+    """Feed lines to a scheduler whose reply window for command is open."""
+    store = LogStore()
+    probes = ProbeScheduler(None, None, LogParser())
+    probes._pending = command
+    hidden = probes.feed(probes.log_parser.feed(store.extend(lines)))
+    return probes, sorted(hidden)
+
+
+def test_forge_old_reply():
+    probes, hidden = reply("forge tps", [
+        "[12:00:00] [Server thread/INFO]: Dim minecraft:overworld (minecraft:overworld): "
+        "Mean tick time: 0.542 ms. Mean TPS: 20.000",
+        "[12:00:00] [Server thread/INFO]: Overall : Mean tick time: 12.500 ms. Mean TPS: 19.500",
+        "[12:00:00] [Server thread/INFO]: Alex joined the game",
+    ])
+    assert hidden == [1, 2]
+    assert probes.latest() == {"minecraft:overworld.tps": 20.0, "minecraft:overworld.mspt": 0.542,
+                               "overall.tps": 19.5, "overall.mspt": 12.5}
+
+
+def test_forge_new_reply():
+    probes, hidden = reply("forge tps", [
+        "[12:00:00] [Server thread/INFO]: minecraft:the_nether: 20.000 TPS (1.250 ms/tick)",
+        "[12:00:00] [Server thread/INFO]: Overall: 18.000 TPS (55.000 ms/tick)",
+    ])
+    assert hidden == [1, 2]
+    assert probes.latest()["minecraft:the_nether.mspt"] == 1.25
+    assert probes.latest()["overall.tps"] == 18.0
+    assert probes.is_lagging()
+
+
+def test_paper_replies_with_colour_codes():
+    probes, hidden = reply("tps", ["[12:00:00 INFO]: §6TPS from last 1m, 5m, 15m: §a*20.0, §a20.0, §a20.0"])
+    assert hidden == [1]
+    assert probes.latest() == {"overall.tps": 20.0}
+    probes, hidden = reply("mspt", [
+        "[12:00:00 INFO]: §6Server tick times §e(§7avg§e/§7min§e/§7max§e)§6 from last 5s§7,§6 10s§7,§6 1m§e:",
+        "[12:00:00 INFO]: §6◴ §a1.2§7/§a0.5§7/§a3.4§e, §a1.1§7/§a0.4§7/§a3.9§e, §a1.0§7/§a0.4§7/§a4.0",
+    ])
+    assert hidden == [1, 2]
+    assert probes.latest() == {"overall.mspt": 1.2}
+
+
+def test_vanilla_and_list_replies():
+    probes, hidden = reply("mspt", ["[12:00:00] [Server thread/INFO]: Average time per tick: 3.2ms (Target: 50.0ms)"])
+    assert probes.latest() == {"overall.mspt": 3.2}
+    probes, hidden = reply("list", ["[12:00:00] [Server thread/INFO]: There are 3 of a max of 20 players online: a, b, c"])
+    assert hidden == [1]
+    assert probes.latest() == {"players.online": 3.0, "players.max": 20.0}
+
+
+def test_unknown_command_is_not_sent_again():
+    probes, hidden = reply("forge tps", [
+        "[12:00:00] [Server thread/INFO]: Unknown or incomplete command, see below for error",
+        "[12:00:00] [Server thread/INFO]: forge tps<--[HERE]",
+    ])
+    assert hidden == [1, 2]
+    assert probes.unsupported == {"forge tps"}
+
+
+def test_nothing_is_hidden_without_an_open_probe():
+    store = LogStore()
+    probes = ProbeScheduler(None, None, LogParser())
+    lines = probes.log_parser.feed(store.extend(["[12:00:00 INFO]: TPS from last 1m, 5m, 15m: 20.0, 20.0, 20.0"]))
+    assert not probes.feed(lines)
+    assert probes.latest() == {}
@@ -0,0 +1,65 @@
+import threading
+
+from log_dedup import DEDUP_COLLAPSE, DEDUP_DISPLAY, DEDUP_OFF
+
+SPAM = "[12:00:00] [Server thread/WARN]: Entity {} moved wrongly"
+
+
+def listen(server):
+    shown = []
+    server.add_output_listener(shown.extend)
+    return shown
+
+
+def test_concurrent_batches_keep_seq_order(server):
+    server.log_dedup.configure(DEDUP_OFF, 60, 3)
+    shown = listen(server)
+
+    def write(prefix):
+        for batch in range(50):
+            server.append_lines([f"[12:00:00] [{prefix}/INFO]: line {batch} {index}" for index in range(20)])
+    threads = [threading.Thread(target=write, args=(f"writer {number}",)) for number in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seqs = [record.seq for record in shown]
+    assert seqs == list(range(1, 4001))
+    records, _ = server.log_spool.read(limit=5000)
+    assert [record.seq for record in records] == seqs
+
+
+def test_display_mode_hides_repeats_but_keeps_them(server):
+    server.log_dedup.configure(DEDUP_DISPLAY, 60, 3)
+    shown = listen(server)
+    server.append_lines([SPAM.format(number) for number in range(10)])
+    assert len(shown) == 3
+    assert server.log_store.last_seq == 10
+    result = server.logs_after(0)
+    assert result["lines"] == 3 and result["next_cursor"] == 10
+    assert server.log_store.text().count("\n") == 2
+    records, _ = server.log_spool.read()
+    assert [record.hidden for record in records] == [False] * 3 + [True] * 7
+    assert len(server.log_index.search("moved wrongly", limit=100)["matches"]) == 10
+
+
+def test_collapse_mode_drops_repeats(server):
+    server.log_dedup.configure(DEDUP_COLLAPSE, 60, 3)
+    shown = listen(server)
+    server.append_lines([SPAM.format(number) for number in range(10)])
+    assert len(shown) == 3
+    assert server.log_store.last_seq == 3
+    records, _ = server.log_spool.read()
+    assert [record.seq for record in records] == [1, 2, 3]
+
+
+def test_probe_replies_are_hidden(server):
+    server.log_dedup.configure(DEDUP_OFF, 60, 3)
+    shown = listen(server)
+    server.probes._pending = "list"
+    server.append_lines(["[12:00:00] [Server thread/INFO]: There are 0 of a max of 20 players online: ",
+                         "[12:00:00] [Server thread/INFO]: Alex joined the game"])
+    assert [record.seq for record in shown] == [2]
+    assert server.probes.latest()["players.max"] == 20.0
+    assert server.logs_after(0)["lines"] == 1
+    assert server.log_store.get(1).hidden
@@ -0,0 +1,29 @@
+from server_load import compare, metric, percentiles
+
+
+def test_percentiles():
+    result = percentiles([float(value) for value in range(1, 101)])
+    assert (result["count"], result["p50"], result["p99"], result["max"]) == (100, 51.0, 100.0, 100.0)
+    assert percentiles([]) == {"count": 0}
+
+
+def test_metric_only_returns_numbers():
+    results = {"ingest": {"lines_per_second": 1000, "skipped": None},
+               "latency": {"display_ms": {"skipped": "no display"}}, "flag": True}
+    assert metric(results, "ingest.lines_per_second") == 1000
+    assert metric(results, "ingest.skipped") is None
+    assert metric(results, "latency.display_ms.p50") is None
+    assert metric(results, "flag") is None
+    assert metric(results, "missing.path") is None
+
+
+def test_compare_flags_regressions_beyond_the_threshold():
+    baseline = {"ingest": {"lines_per_second": 1000}, "lifecycle": {"start_s": 2.0, "stop_s": 1.0},
+                "latency": {"display_ms": {"p50": 5.0}}}
+    results = {"ingest": {"lines_per_second": 850}, "lifecycle": {"start_s": 2.1, "stop_s": None},
+               "latency": {"display_ms": {"skipped": "no display"}}}
+    changes = {change["metric"]: change for change in compare(results, baseline, threshold=10.0)}
+    assert set(changes) == {"ingest.lines_per_second", "lifecycle.start_s"}
+    assert changes["ingest.lines_per_second"]["regression"]
+    assert changes["ingest.lines_per_second"]["change_percent"] == -15.0
+    assert not changes["lifecycle.start_s"]["regression"]
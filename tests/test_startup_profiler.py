@@ -0,0 +1,51 @@
+from collections import namedtuple
+
+from startup_profiler import StartupProfiler
+
+Line = namedtuple("Line", "timestamp message")
+
+BOOT = [(0.5, "ModLauncher running: args [--launchTarget, forgeserver]"),
+        (2.0, "Starting minecraft server version 1.20.1"),
+        (3.0, "Preparing level \"world\""),
+        (4.0, "Preparing spawn area: 50%"),
+        (5.0, "Done (4.321s)! For help, type \"help\"")]
+
+
+def boot(profiler, scale=1.0, started=1000.0):
+    profiler.begin(["java", "-Xmx4G", "-jar", "server.jar", "nogui"], "server.jar", started=started)
+    return profiler.feed([Line(started + offset * scale, message) for offset, message in BOOT])
+
+
+def test_phases_of_a_boot(tmp_path):
+    profiler = StartupProfiler(str(tmp_path / "startup.json"))
+    assert boot(profiler)
+    run = profiler.history[-1]
+    assert run["outcome"] == "done" and run["reported_seconds"] == 4.321
+    assert run["jvm_args"] == ["-Xmx4G"]
+    assert run["phases"] == {"jvm_launch": 0.5, "first_output": 0.0, "modlauncher": 1.5,
+                             "server_version": 1.0, "level": 2.0}
+    assert run["spawn_progress"] == [[4.0, 50]]
+    # Reloaded from the history file
+    assert StartupProfiler(profiler.history_file).history == profiler.history
+
+
+def test_compare_with_earlier_runs(tmp_path):
+    profiler = StartupProfiler(str(tmp_path / "startup.json"))
+    for _ in range(3):
+        boot(profiler)
+    boot(profiler, scale=2.0)
+    report = profiler.compare()
+    assert report["baseline_runs"] == 3
+    assert report["total_change_percent"] == 100.0
+    assert report["phases"][0]["phase"] == "level"
+    assert profiler.summary() == "Last startup: 10.0 s (median 5.0 s, +100%)"
+
+
+def test_summary_without_a_usable_baseline(tmp_path):
+    profiler = StartupProfiler(str(tmp_path / "startup.json"))
+    assert profiler.summary() == "Last startup: -"
+    profiler.begin(["java", "-jar", "server.jar"], "server.jar", started=1000.0)
+    profiler.finish("stopped")
+    boot(profiler, scale=0.0)
+    boot(profiler)
+    assert profiler.summary() == "Last startup: 5.0 s (median 0.0 s, n/a)"